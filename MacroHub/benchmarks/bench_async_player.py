@@ -0,0 +1,117 @@
+"""
+播放引擎比較：執行緒版 MacroPlayer 與 asyncio 版 AsyncPlaybackEngine
+同時播放 1 / 10 / 100 個巨集，量測每個輸入實際送出時間相對排程時間的延遲、
+總耗時、CPU 時間與執行緒數量
+
+按鍵不會真的送到系統：控制器換成只記錄時間的物件
+（執行緒版播放時會建立 pynput 的停止鍵監聽，需要安裝 pynput）
+
+    python benchmarks/bench_async_player.py --events 40 --delay 0.01
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class TimingKeyboard:
+    """記錄每個按鍵送出時間的鍵盤控制器（按鍵名稱對應到巨集）"""
+
+    def __init__(self):
+        self.times = {}
+        self._lock = threading.Lock()
+
+    def press(self, key):
+        now = time.perf_counter()
+        with self._lock:
+            self.times.setdefault(key, []).append(now)
+
+    def release(self, key):
+        self.press(key)
+
+
+def make_macro(index: int, events: int, delay: float):
+    from core.recorder import Macro, MacroEvent, EventType
+    key = f"m{index}"
+    kinds = [EventType.KEY_PRESS, EventType.KEY_RELEASE]
+    return Macro(key, [MacroEvent(kinds[i % 2], 0, delay=delay, key=key) for i in range(events)])
+
+
+def lateness(keyboard: TimingKeyboard, macros, starts):
+    """每個輸入相對「開始時間 + 累計延遲」的延遲"""
+    result = []
+    for macro, start in zip(macros, starts):
+        times = keyboard.times.get(macro.name, [])
+        scheduled = start
+        for event, sent in zip(macro.events, times):
+            scheduled += event.delay
+            result.append(sent - scheduled)
+    return result
+
+
+def run_threaded(macros):
+    from core.player import MacroPlayer
+    keyboard = TimingKeyboard()
+    players = []
+    for _ in macros:
+        player = MacroPlayer()
+        player._keyboard = keyboard
+        players.append(player)
+    threads_before = threading.active_count()
+    starts = []
+    for player, macro in zip(players, macros):
+        starts.append(time.perf_counter())
+        player.play(macro)
+    peak_threads = threading.active_count() - threads_before
+    for player in players:
+        player.join()
+    return keyboard, starts, peak_threads
+
+
+def run_async(macros):
+    from core.player import MacroPlayer
+    from core.async_player import ThreadedPlaybackEngine
+    keyboard = TimingKeyboard()
+    backend = MacroPlayer()
+    backend._keyboard = keyboard
+    threads_before = threading.active_count()
+    runner = ThreadedPlaybackEngine(backend)
+    starts = []
+    for macro in macros:
+        starts.append(time.perf_counter())
+        runner.play(macro)
+    peak_threads = threading.active_count() - threads_before
+    runner.wait_all()
+    runner.close()
+    return keyboard, starts, peak_threads
+
+
+def main():
+    parser = argparse.ArgumentParser(description="播放引擎比較")
+    parser.add_argument("--events", type=int, default=40, help="每個巨集的事件數（預設 40）")
+    parser.add_argument("--delay", type=float, default=0.01, help="每個事件的延遲秒數（預設 0.01）")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 100],
+                        help="同時播放的巨集數（預設 1 10 100）")
+    args = parser.parse_args()
+
+    ideal = args.events * args.delay
+    print(f"每個巨集 {args.events} 個事件，排程長度 {ideal * 1000:.0f} ms")
+    for count in args.concurrency:
+        macros = [make_macro(i, args.events, args.delay) for i in range(count)]
+        for name, run in (("threaded", run_threaded), ("asyncio", run_async)):
+            cpu, wall = time.process_time(), time.perf_counter()
+            keyboard, starts, threads = run(macros)
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            late = sorted(lateness(keyboard, macros, starts))
+            p95 = late[min(len(late) - 1, int(len(late) * 0.95))]
+            print(f"{count:4d} 個  {name:8s}  延遲 中位數 {statistics.median(late) * 1000:7.2f} ms"
+                  f"  p95 {p95 * 1000:7.2f} ms  最大 {late[-1] * 1000:7.2f} ms"
+                  f"  | 總耗時 {wall * 1000:7.0f} ms  CPU {cpu * 1000:6.0f} ms  執行緒 +{threads}")
+
+
+if __name__ == "__main__":
+    main()
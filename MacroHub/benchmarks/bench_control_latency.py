@@ -0,0 +1,101 @@
+"""
+控制介面延遲測試
+量測從送出 play 請求到播放器送出第一個按鍵所需的時間（請求 -> 第一個輸入），
+以及 status 請求的來回時間；TCP 與 Unix socket（支援時）各測一次
+
+按鍵不會真的送到系統：播放器的鍵盤控制器換成只記錄時間的物件
+（播放時仍會建立 pynput 的停止鍵監聽，需要安裝 pynput）
+
+    python benchmarks/bench_control_latency.py -n 200
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class TimingKeyboard:
+    """記錄第一個按鍵時間的鍵盤控制器"""
+
+    def __init__(self):
+        self.pressed = threading.Event()
+        self.first_press = 0.0
+
+    def press(self, key):
+        if not self.pressed.is_set():
+            self.first_press = time.perf_counter()
+            self.pressed.set()
+
+    def release(self, key):
+        pass
+
+
+def summarize(name: str, samples):
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"{name:24s} 中位數 {statistics.median(samples) * 1e6:8.0f} µs  "
+          f"最小 {samples[0] * 1e6:8.0f} µs  p95 {p95 * 1e6:8.0f} µs")
+
+
+def bench(address: str, rounds: int):
+    from core.recorder import Macro, MacroEvent, EventType
+    from core.manager import MacroManager
+    from core.player import MacroPlayer
+    from core.control_server import ControlServer, ControlClient
+
+    macros_dir = tempfile.mkdtemp()
+    manager = MacroManager(macros_dir)
+    manager.save_macro(Macro("bench", [MacroEvent(EventType.KEY_PRESS, 0, delay=0.0, key="a"),
+                                       MacroEvent(EventType.KEY_RELEASE, 0, delay=0.0, key="a")]))
+    player = MacroPlayer()
+    server = ControlServer(manager, player, address)
+    bound = server.start()
+    print(f"[{bound}]")
+
+    try:
+        with ControlClient(bound) as client:
+            status = []
+            for _ in range(rounds):
+                start = time.perf_counter()
+                client.request("status")
+                status.append(time.perf_counter() - start)
+
+            first_input = []
+            for _ in range(rounds):
+                keyboard = TimingKeyboard()
+                player._keyboard = keyboard
+                start = time.perf_counter()
+                reply = client.request("play", name="bench")
+                if not reply.get("ok"):
+                    sys.exit(f"play 失敗: {reply.get('error')}")
+                if not keyboard.pressed.wait(5):
+                    sys.exit("逾時：沒有收到按鍵")
+                first_input.append(keyboard.first_press - start)
+                player.join(5)
+
+        summarize("status 來回", status)
+        summarize("play -> 第一個輸入", first_input)
+    finally:
+        server.stop()
+        manager.close()
+        shutil.rmtree(macros_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="控制介面延遲測試")
+    parser.add_argument("-n", "--rounds", type=int, default=200, help="每種請求的次數（預設 200）")
+    args = parser.parse_args()
+
+    bench("127.0.0.1:0", args.rounds)
+    if hasattr(__import__("socket"), "AF_UNIX"):
+        bench(f"unix:{os.path.join(tempfile.gettempdir(), f'macrohub-bench-{os.getpid()}.sock')}", args.rounds)
+
+
+if __name__ == "__main__":
+    main()
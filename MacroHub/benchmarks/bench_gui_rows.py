@@ -0,0 +1,150 @@
+"""
+GUI 列建立效能測試
+比較三種做法建立/重繪 N 列事件所需的時間：
+  legacy   每列一個 CTkFrame + CTkLabel，且每列重新建立 CTkFont 與圖示表（舊版做法）
+  cached   每列一個 CTkFrame + CTkLabel，但使用 gui.styles 的共用字型與格式化
+  virtual  VirtualListView（只繪製可見的列）
+
+沒有顯示器時（CI/伺服器）可在虛擬顯示器下執行：
+    xvfb-run -a python benchmarks/bench_gui_rows.py
+或安裝 pyvirtualdisplay，本程式會自動啟動 Xvfb
+
+完全無法使用 X 伺服器時，--headless 只測量每列在 Python 端的工作
+（圖示表與列文字；virtual 只格式化可見的列），不含建立元件與字型的成本：
+    python benchmarks/bench_gui_rows.py --headless
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _ensure_display():
+    """Linux 沒有 DISPLAY 時嘗試啟動虛擬顯示器"""
+    if sys.platform.startswith("linux") and not os.environ.get("DISPLAY"):
+        try:
+            from pyvirtualdisplay import Display
+        except ImportError:
+            sys.exit("沒有顯示器：請用 xvfb-run 執行，或安裝 pyvirtualdisplay")
+        display = Display(visible=False, size=(1280, 800))
+        display.start()
+        return display
+    return None
+
+
+def make_events(count: int):
+    from core.recorder import MacroEvent, EventType
+    kinds = [EventType.KEY_PRESS, EventType.KEY_RELEASE, EventType.MOUSE_CLICK, EventType.DELAY]
+    events = []
+    for i in range(count):
+        kind = kinds[i % len(kinds)]
+        events.append(MacroEvent(kind, i * 0.01, delay=0.01, key="a" if "KEY" in kind.name else None,
+                                 button="left" if kind == EventType.MOUSE_CLICK else None, x=i, y=i))
+    return events
+
+
+def legacy_row_text(i: int, event) -> str:
+    """舊版的列文字：每列重新建立圖示表"""
+    from core.recorder import EventType
+    icons = {EventType.KEY_PRESS: "⌨️↓", EventType.KEY_RELEASE: "⌨️↑", EventType.MOUSE_CLICK: "🖱️↓",
+             EventType.MOUSE_RELEASE: "🖱️↑", EventType.MOUSE_MOVE: "🖱️→", EventType.MOUSE_SCROLL: "🖱️⟳",
+             EventType.DELAY: "⏱️"}
+    icon = icons.get(event.event_type, "❓")
+    return f"[{i+1:03d}] {icon} {event.key or event.button}"
+
+
+def bench_legacy(parent, events):
+    import customtkinter as ctk
+    for i, event in enumerate(events):
+        item = ctk.CTkFrame(parent, fg_color="#000000", corner_radius=0, height=34)
+        item.pack(fill="x", pady=1)
+        ctk.CTkLabel(item, text=legacy_row_text(i, event),
+                     font=ctk.CTkFont(family="Consolas", size=11), anchor="w").pack(side="left", padx=10)
+
+
+def bench_cached(parent, events):
+    import customtkinter as ctk
+    from gui import styles
+    font = styles.font(11, family="Consolas")
+    for i, event in enumerate(events):
+        item = ctk.CTkFrame(parent, fg_color="#000000", corner_radius=0, height=34)
+        item.pack(fill="x", pady=1)
+        ctk.CTkLabel(item, text=styles.event_row_text(i, event), font=font, anchor="w").pack(side="left", padx=10)
+
+
+def bench_virtual(parent, events):
+    from gui import styles
+    from gui.virtual_list import VirtualListView, RowContent
+    view = VirtualListView(parent, render_row=lambda i: RowContent(styles.event_row_text(i, events[i])),
+                           font=styles.font(11, family="Consolas"))
+    view.pack(fill="both", expand=True)
+    parent.update_idletasks()
+    view.set_row_count(len(events))
+    view.refresh()
+
+
+def run_headless(rows: int, virtual_rows: int, view_height: int = 600, row_height: int = 34):
+    """只測量 Python 端的列文字成本（不需要顯示器）"""
+    from gui import styles
+    visible = view_height // row_height + 2  # 與 VirtualListView.refresh 繪製的列數相同
+    cases = [
+        ("legacy", rows, lambda events: [legacy_row_text(i, e) for i, e in enumerate(events)]),
+        ("cached", rows, lambda events: [styles.event_row_text(i, e) for i, e in enumerate(events)]),
+        ("virtual", virtual_rows, lambda events: [styles.event_row_text(i, events[i]) for i in range(visible)]),
+    ]
+    for name, count, func in cases:
+        events = make_events(count)
+        best = float("inf")
+        for _ in range(20):
+            start = time.perf_counter()
+            func(events)
+            best = min(best, time.perf_counter() - start)
+        print(f"{name:8s} {count:7d} 列  {best * 1000:9.3f} ms  ({best / count * 1e6:8.3f} µs/列)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GUI 列建立效能測試")
+    parser.add_argument("-n", "--rows", type=int, default=500, help="列數（預設 500）")
+    parser.add_argument("--virtual-rows", type=int, default=100000, help="虛擬清單的列數（預設 100000）")
+    parser.add_argument("--headless", action="store_true", help="只測量列文字（不建立視窗）")
+    args = parser.parse_args()
+
+    if args.headless:
+        run_headless(args.rows, args.virtual_rows)
+        return
+
+    display = _ensure_display()
+    try:
+        import customtkinter as ctk
+        root = ctk.CTk()
+        root.geometry("800x600")
+        root.update()
+
+        cases = [("legacy", bench_legacy, args.rows), ("cached", bench_cached, args.rows),
+                 ("virtual", bench_virtual, args.virtual_rows)]
+        results = {}
+        for name, func, rows in cases:
+            frame = ctk.CTkFrame(root)
+            frame.pack(fill="both", expand=True)
+            events = make_events(rows)
+            start = time.perf_counter()
+            func(frame, events)
+            root.update()
+            elapsed = time.perf_counter() - start
+            results[name] = elapsed
+            print(f"{name:8s} {rows:7d} 列  {elapsed * 1000:9.1f} ms  ({elapsed / rows * 1e6:8.1f} µs/列)")
+            frame.destroy()
+            root.update()
+
+        if results["cached"] > 0:
+            print(f"共用字型/格式：每列快 {results['legacy'] / results['cached']:.2f} 倍")
+        root.destroy()
+    finally:
+        if display is not None:
+            display.stop()
+
+
+if __name__ == "__main__":
+    main()
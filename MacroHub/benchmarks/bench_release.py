@@ -0,0 +1,62 @@
+"""
+釋放按鍵測試：按住若干按鍵後停止，計算停止時送出的放開事件數與耗時，
+並確認再次停止不會送出任何輸入
+
+按鍵不會真的送到系統：控制器換成只計數的物件（需要安裝 pynput）
+
+    python benchmarks/bench_release.py --held 3
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class CountingController:
+    """只計算放開次數的鍵盤/滑鼠控制器"""
+
+    def __init__(self):
+        self.releases = 0
+
+    def press(self, key):
+        pass
+
+    def release(self, key):
+        self.releases += 1
+
+
+def main():
+    from core.recorder import MacroEvent, EventType
+    from core.player import MacroPlayer
+
+    parser = argparse.ArgumentParser(description="釋放按鍵測試")
+    parser.add_argument("--held", type=int, default=3, help="停止時按住的按鍵數（預設 3）")
+    parser.add_argument("--rounds", type=int, default=10000, help="重複次數（預設 10000）")
+    args = parser.parse_args()
+
+    keys = "abcdefghijklmnopqrstuvwxyz0123456789"[:args.held]
+    player = MacroPlayer()
+    player._keyboard = CountingController()
+    player._mouse = CountingController()
+    presses = [MacroEvent(EventType.KEY_PRESS, 0, key=k) for k in keys]
+
+    first = second = 0.0
+    for _ in range(args.rounds):
+        for event in presses:
+            player.send_event(event)
+        start = time.perf_counter()
+        player.release_all_keys()
+        middle = time.perf_counter()
+        player.release_all_keys()
+        first += middle - start
+        second += time.perf_counter() - middle
+
+    per_stop = player._keyboard.releases / args.rounds
+    print(f"按住 {len(keys)} 個按鍵：每次停止送出 {per_stop:.0f} 個放開事件")
+    print(f"第一次停止 {first / args.rounds * 1e6:6.2f} µs  再次停止 {second / args.rounds * 1e6:6.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
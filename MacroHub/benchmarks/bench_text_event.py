@@ -0,0 +1,74 @@
+"""
+文字事件測試：同一段文字以逐鍵事件（每字按下+放開）與單一文字事件播放，
+比較播放耗時（沒有任何延遲，耗時全是引擎本身的開銷）與 JSON 大小
+
+按鍵不會真的送到系統：控制器換成只計數的物件
+（播放時會建立 pynput 的停止鍵監聽，需要安裝 pynput）
+
+    python benchmarks/bench_text_event.py --chars 200
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class CountingKeyboard:
+    """只計算送出字元數的鍵盤控制器"""
+
+    def __init__(self):
+        self.count = 0
+
+    def press(self, key):
+        self.count += 1
+
+    def release(self, key):
+        pass
+
+    def type(self, text):
+        self.count += len(text)
+
+
+def per_key_events(text: str):
+    from core.recorder import MacroEvent, EventType
+    events = []
+    for char in text:
+        events.append(MacroEvent(EventType.KEY_PRESS, 0, key=char))
+        events.append(MacroEvent(EventType.KEY_RELEASE, 0, key=char))
+    return events
+
+
+def text_events(text: str):
+    from core.recorder import MacroEvent, EventType
+    return [MacroEvent(EventType.TEXT, 0, text=text)]
+
+
+def play(events) -> float:
+    from core.recorder import Macro
+    from core.player import MacroPlayer
+    player = MacroPlayer()
+    player._keyboard = CountingKeyboard()
+    start = time.perf_counter()
+    player.play(Macro("bench", events))
+    player.join()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="文字事件測試")
+    parser.add_argument("--chars", type=int, default=200, help="文字長度（預設 200）")
+    args = parser.parse_args()
+
+    text = ("The quick brown fox jumps over the lazy dog. " * (args.chars // 45 + 1))[:args.chars]
+    for name, build in (("逐鍵事件", per_key_events), ("文字事件", text_events)):
+        events = build(text)
+        size = sum(len(json.dumps(e.to_dict(), ensure_ascii=False)) for e in events)
+        elapsed = play(events)
+        print(f"{name}  {len(events):4d} 個事件  {size / 1024:6.1f} KB  播放 {elapsed * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
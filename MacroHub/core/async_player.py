@@ -0,0 +1,303 @@
+"""
+asyncio 播放引擎 - 單一事件迴圈同時播放多個巨集
+每個播放中的巨集是一個 task，事件依「開始時間 + 累計延遲」的絕對截止時間排程，
+不會因輸入呼叫本身的耗時而逐漸落後；停止以取消 task 實作，
+送出輸入的阻塞呼叫全部交給單一 I/O 執行緒依序執行
+"""
+import asyncio
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .recorder import Macro, MacroEvent, EventType, match_blocks
+from .player import MacroPlayer, SETTLE_TIME
+from .input_state import InputState
+
+
+@dataclass(eq=False)
+class Playback:
+    """一個播放中的巨集（進度欄位只由事件迴圈寫入）"""
+    id: int
+    macro: Macro
+    speed: float = 1.0
+    index: int = -1  # 最後送出的事件索引（-1 表示本輪尚未開始）
+    loop: int = 0  # 已完成的循環次數
+    task: Optional[asyncio.Task] = None
+    held: InputState = field(default_factory=InputState)  # 這個播放按住的按鍵/按鈕（backend.key_table 的位元）
+    calls: Dict[str, Sequence[MacroEvent]] = field(default_factory=dict)  # 被呼叫巨集 id -> 展開後的事件
+    _resume: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def __post_init__(self):
+        self._resume.set()
+
+    @property
+    def is_paused(self) -> bool:
+        return not self._resume.is_set()
+
+    @property
+    def done(self) -> bool:
+        return self.task is not None and self.task.done()
+
+
+class AsyncPlaybackEngine:
+    """
+    asyncio 播放引擎（所有方法都必須在事件迴圈的執行緒呼叫；
+    從其他執行緒使用請透過 ThreadedPlaybackEngine）
+    backend 負責實際送出輸入，預設為 MacroPlayer（共用按鍵解析、控制器與按住狀態）
+    """
+
+    def __init__(self, backend: Optional[MacroPlayer] = None):
+        self.backend = backend or MacroPlayer()
+        self.speed_multiplier: float = 1.0
+        self.ignore_delays: bool = False
+        self.playbacks: Dict[int, Playback] = {}
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="macro-io")
+        self._ids = itertools.count(1)
+
+        # 回調函數（在事件迴圈執行緒呼叫）
+        self.on_play_started: Optional[Callable[[Playback], None]] = None
+        self.on_play_stopped: Optional[Callable[[Playback], None]] = None
+
+    # ---- 控制 ----
+
+    def play(self, macro: Macro, speed: Optional[float] = None) -> Playback:
+        """
+        開始播放（不會停止其他播放中的巨集）
+        呼叫事件以 backend.plan_provider 解析，無法解析時拋出 CompileError
+        """
+        calls = self.backend.plan_provider(macro) if self.backend.plan_provider else {}
+        playback = Playback(next(self._ids), macro, speed or self.speed_multiplier, calls=calls)
+        playback.task = asyncio.get_running_loop().create_task(self._run(playback))
+        self.playbacks[playback.id] = playback
+        if self.on_play_started:
+            self.on_play_started(playback)
+        return playback
+
+    def stop(self, playback: Playback):
+        """停止一個播放（取消 task，結束時會釋放它按住的按鍵）"""
+        if playback.task is not None:
+            playback.task.cancel()
+
+    def stop_all(self):
+        for playback in list(self.playbacks.values()):
+            self.stop(playback)
+
+    def pause(self, playback: Playback):
+        playback._resume.clear()
+
+    def resume(self, playback: Playback):
+        playback._resume.set()
+
+    async def wait(self, playback: Playback):
+        """等待播放結束（被停止也算結束）"""
+        if playback.task is not None:
+            await asyncio.wait([playback.task])
+
+    async def wait_all(self):
+        tasks = [p.task for p in self.playbacks.values() if p.task is not None]
+        if tasks:
+            await asyncio.wait(tasks)
+
+    async def aclose(self):
+        """停止所有播放、等待按鍵釋放完成並結束 I/O 執行緒"""
+        self.stop_all()
+        await self.wait_all()
+        self._io.shutdown(wait=True)
+
+    # ---- 播放 ----
+
+    async def _send(self, event: MacroEvent):
+        """在 I/O 執行緒送出輸入"""
+        await asyncio.get_running_loop().run_in_executor(self._io, self.backend.send_event, event)
+
+    async def _wait_until(self, playback: Playback, deadline: float) -> float:
+        """
+        等到截止時間，返回暫停造成的位移（秒）
+        暫停期間截止時間一起往後移，恢復後維持原本的事件間隔
+        """
+        loop = asyncio.get_running_loop()
+        shift = 0.0
+        while True:
+            if playback.is_paused:
+                paused_at = loop.time()
+                await playback._resume.wait()
+                shift += loop.time() - paused_at
+            remaining = deadline + shift - loop.time()
+            if remaining <= 0:
+                return shift
+            await asyncio.sleep(remaining)
+            if not playback.is_paused:
+                return shift
+
+    async def _run(self, playback: Playback):
+        loop = asyncio.get_running_loop()
+        macro = playback.macro
+        speed = playback.speed
+        plans = {callee: (plan, match_blocks(plan)) for callee, plan in playback.calls.items()}
+        deadline = loop.time()
+        ready = deadline  # 上一個輸入的辨識等待結束時間
+        try:
+            while macro.events and (macro.loop_count == 0 or playback.loop < macro.loop_count):
+                playback.index = -1
+                events = list(macro.events)
+                deadline, ready = await self._play_range(playback, plans, events, match_blocks(events),
+                                                         0, len(events), deadline, ready, track=True)
+
+                playback.loop += 1
+                if macro.loop_count == 0 or playback.loop < macro.loop_count:
+                    deadline += macro.loop_delay / speed
+                await asyncio.sleep(0)  # 全部沒有延遲的無限循環也要讓出事件迴圈
+        finally:
+            # 被取消或播放完畢：釋放這個播放按住的按鍵（取消中仍需等待送出完成）
+            releases = self._releases(playback)
+            if releases:
+                await asyncio.shield(self._release(releases))
+            self.playbacks.pop(playback.id, None)
+            if self.on_play_stopped:
+                self.on_play_stopped(playback)
+
+    async def _play_range(self, playback: Playback, plans: Dict[str, Tuple[Sequence[MacroEvent], Dict[int, int]]],
+                          events: Sequence[MacroEvent], blocks: Dict[int, int], start: int, end: int,
+                          deadline: float, ready: float, track: bool = False) -> Tuple[float, float]:
+        """
+        播放 events[start:end]，返回 (截止時間, 辨識等待結束時間)
+        重複區塊與被呼叫巨集的事件都接續同一條截止時間，不展開成副本；
+        track 為 True 時更新進度（被呼叫巨集內的進度停在呼叫事件上）
+        """
+        i = start
+        while i < end:
+            event = events[i]
+            deadline, ready = await self._step(playback, event, deadline, ready)
+            if event.event_type == EventType.REPEAT:
+                if track:
+                    playback.index = i
+                block_end = min(blocks[i] + 1, end)  # 包含結束標記（它的延遲屬於每一輪）
+                for n in range(event.count):
+                    if n and not self.ignore_delays:
+                        deadline += event.gap / playback.speed
+                    deadline, ready = await self._play_range(playback, plans, events, blocks, i + 1, block_end,
+                                                             deadline, ready, track)
+                    await asyncio.sleep(0)  # 沒有輸入的區塊重複很多次時也要讓出事件迴圈
+                i = block_end
+                continue
+            if event.event_type == EventType.CALL and event.call_id in plans:
+                plan, plan_blocks = plans[event.call_id]
+                for _ in range(event.count):
+                    deadline, ready = await self._play_range(playback, plans, plan, plan_blocks, 0, len(plan),
+                                                             deadline, ready)
+            if track:
+                playback.index = i
+            i += 1
+        return deadline, ready
+
+    async def _step(self, playback: Playback, event: MacroEvent, deadline: float,
+                    ready: float) -> Tuple[float, float]:
+        """等到事件的截止時間並送出，返回新的 (截止時間, 辨識等待結束時間)"""
+        loop = asyncio.get_running_loop()
+        if not self.ignore_delays:
+            deadline += event.delay / playback.speed
+        deadline += await self._wait_until(playback, max(deadline, ready))
+
+        if event.event_type == EventType.TEXT and event.text and event.char_delay > 0:
+            # 有字元間隔的文字逐字排程，字元之間同樣使用絕對截止時間
+            deadline = await self._type(playback, event, deadline)
+            ready = loop.time() + SETTLE_TIME[EventType.TEXT]
+        elif event.event_type in SETTLE_TIME:
+            # 先記錄按住狀態再送出；送出不受取消影響，停止時的釋放一定排在它之後
+            self._track(playback, event)
+            try:
+                await asyncio.shield(self._send(event))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"執行事件時發生錯誤: {e}")
+            ready = loop.time() + SETTLE_TIME[event.event_type]
+        return deadline, ready
+
+    async def _type(self, playback: Playback, event: MacroEvent, deadline: float) -> float:
+        """逐字送出文字事件，返回最後一個字元的截止時間"""
+        step = 0.0 if self.ignore_delays else event.char_delay / playback.speed
+        for i, char in enumerate(event.text):
+            if i:
+                deadline += step
+                deadline += await self._wait_until(playback, deadline)
+            try:
+                await asyncio.shield(self._send(MacroEvent(EventType.TEXT, 0, text=char)))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"執行事件時發生錯誤: {e}")
+        return deadline
+
+    def _track(self, playback: Playback, event: MacroEvent):
+        table = self.backend.key_table
+        if event.event_type == EventType.KEY_PRESS:
+            playback.held.press(table.key_slot(event.key))
+        elif event.event_type == EventType.KEY_RELEASE:
+            playback.held.release(table.key_slot(event.key))
+        elif event.event_type == EventType.MOUSE_CLICK:
+            playback.held.press(table.button_slot(event.button))
+        elif event.event_type == EventType.MOUSE_RELEASE:
+            playback.held.release(table.button_slot(event.button))
+
+    @staticmethod
+    def _releases(playback: Playback) -> List[int]:
+        return playback.held.take()
+
+    async def _release(self, slots: List[int]):
+        # 已被其他播放或緊急停止放開的按鍵不會再送出
+        loop = asyncio.get_running_loop()
+        for slot in slots:
+            try:
+                await loop.run_in_executor(self._io, self.backend.release_held, slot)
+            except Exception as e:
+                print(f"釋放按鍵時發生錯誤: {e}")
+
+
+class ThreadedPlaybackEngine:
+    """
+    在背景執行緒執行事件迴圈的播放引擎，提供給 GUI、熱鍵與控制介面等執行緒呼叫
+    """
+
+    def __init__(self, backend: Optional[MacroPlayer] = None):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="macro-loop", daemon=True)
+        self._thread.start()
+        self.engine: AsyncPlaybackEngine = self._call(lambda: AsyncPlaybackEngine(backend))
+
+    def _call(self, func: Callable, timeout: Optional[float] = 5.0):
+        """在事件迴圈執行緒執行 func 並返回結果"""
+        async def run():
+            return func()
+        return asyncio.run_coroutine_threadsafe(run(), self._loop).result(timeout)
+
+    def play(self, macro: Macro, speed: Optional[float] = None) -> Playback:
+        return self._call(lambda: self.engine.play(macro, speed))
+
+    def stop(self, playback: Playback):
+        self._loop.call_soon_threadsafe(self.engine.stop, playback)
+
+    def stop_all(self):
+        self._loop.call_soon_threadsafe(self.engine.stop_all)
+
+    def pause(self, playback: Playback):
+        self._loop.call_soon_threadsafe(self.engine.pause, playback)
+
+    def resume(self, playback: Playback):
+        self._loop.call_soon_threadsafe(self.engine.resume, playback)
+
+    def wait(self, playback: Playback, timeout: Optional[float] = None):
+        asyncio.run_coroutine_threadsafe(self.engine.wait(playback), self._loop).result(timeout)
+
+    def wait_all(self, timeout: Optional[float] = None):
+        asyncio.run_coroutine_threadsafe(self.engine.wait_all(), self._loop).result(timeout)
+
+    def close(self, timeout: float = 5.0):
+        """停止所有播放、等待按鍵釋放完成並結束事件迴圈"""
+        try:
+            asyncio.run_coroutine_threadsafe(self.engine.aclose(), self._loop).result(timeout)
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout)
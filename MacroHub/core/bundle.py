@@ -0,0 +1,123 @@
+"""
+巨集包 - 把多個巨集打包成單一 zip 檔案
+結構：manifest.json + macros/NNNNN.json（緊湊串流格式，zip 內以 deflate 壓縮）
+"""
+import io
+import json
+import zipfile
+from typing import BinaryIO, List, Optional, Set, TYPE_CHECKING
+
+from .recorder import Macro, MacroEvent, new_macro_id
+from .persistence import atomic_write
+from .macro_io import MacroStreamReader, ProgressCallback, write_macro_stream
+
+if TYPE_CHECKING:
+    from .manager import MacroManager
+
+
+BUNDLE_FORMAT = "macrohub-bundle"
+BUNDLE_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+BUNDLE_FILE_TYPES = [("MacroHub 巨集包", "*.mhz"), ("ZIP", "*.zip")]
+
+IMPORT_BATCH_SIZE = 100  # 每批寫入的巨集數（SQLite 上每批是一個交易）
+
+
+def export_bundle(manager: 'MacroManager', names: List[str], filepath: str,
+                  progress: Optional[ProgressCallback] = None) -> int:
+    """
+    匯出多個巨集到巨集包（單次串流寫出，原子寫入）
+    progress(已完成, 總數) 以巨集為單位回報；返回匯出數量
+    """
+    entries = []
+
+    def write(raw: BinaryIO):
+        with zipfile.ZipFile(raw, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+            for i, name in enumerate(names):
+                macro = manager.get_macro(name)
+                if macro is None:
+                    continue
+                entry = f"macros/{len(entries):05d}.json"
+                with zf.open(entry, 'w', force_zip64=True) as f:
+                    text = io.TextIOWrapper(f, encoding='utf-8')
+                    write_macro_stream(text, macro)
+                    text.flush()
+                    text.detach()
+                entries.append({
+                    "name": macro.name,
+                    "entry": entry,
+                    "event_count": macro.event_count,
+                    "trigger_key": macro.trigger_key,
+                })
+                if progress:
+                    progress(i + 1, len(names))
+
+            manifest = {"format": BUNDLE_FORMAT, "version": BUNDLE_VERSION, "macros": entries}
+            zf.writestr(MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=2))
+
+    atomic_write(filepath, write)
+    return len(entries)
+
+
+def read_manifest(filepath: str) -> dict:
+    """讀取巨集包的清單（不解壓縮巨集內容）"""
+    with zipfile.ZipFile(filepath) as zf:
+        manifest = json.loads(zf.read(MANIFEST_NAME).decode('utf-8'))
+    if manifest.get("format") != BUNDLE_FORMAT:
+        raise ValueError("不是 MacroHub 巨集包")
+    if manifest.get("version", 0) > BUNDLE_VERSION:
+        raise ValueError(f"不支援的巨集包版本: {manifest.get('version')}")
+    return manifest
+
+
+def import_bundle(manager: 'MacroManager', filepath: str,
+                  progress: Optional[ProgressCallback] = None) -> List[Macro]:
+    """
+    從巨集包匯入所有巨集
+    名稱衝突依清單一次性處理，每個巨集逐一串流解析後分批交給 manager.import_macros 寫入
+    """
+    manifest = read_manifest(filepath)
+    items = manifest["macros"]
+    new_names = manager.unique_names([item["name"] for item in items])
+
+    imported: List[Macro] = []
+    batch: List[Macro] = []
+    batch_ids: Set[str] = set()  # 尚未寫入的巨集 id（同一包內重複的 id 也要換新）
+
+    def flush():
+        try:
+            imported.extend(manager.import_macros(batch))
+        except Exception as e:
+            # 整批失敗時改為逐一儲存，只略過有問題的巨集
+            print(f"批次匯入失敗，改為逐一儲存: {e}")
+            imported.extend(macro for macro in batch if manager.save_macro(macro))
+        batch.clear()
+        batch_ids.clear()
+
+    with zipfile.ZipFile(filepath) as zf:
+        for i, (item, name) in enumerate(zip(items, new_names)):
+            try:
+                events: List[MacroEvent] = []
+                with zf.open(item["entry"]) as f:
+                    reader = MacroStreamReader(io.TextIOWrapper(f, encoding='utf-8'))
+                    header = reader.read(events.extend)
+                header["events"] = []
+                macro = Macro.from_dict(header)
+                macro.events = events
+                macro.name = name
+                macro.id = manager.unique_id(macro.id)
+                if macro.id in batch_ids:
+                    macro.id = new_macro_id()
+                batch_ids.add(macro.id)
+                batch.append(macro)
+            except Exception as e:
+                print(f"匯入 {item.get('name')} 失敗: {e}")
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                flush()
+            if progress:
+                progress(i + 1, len(items))
+        if batch:
+            flush()
+
+    return imported
@@ -0,0 +1,156 @@
+"""
+播放計畫編譯 - 解析巨集中的呼叫事件
+被呼叫的巨集只儲存一份，播放前才把呼叫展開為它的事件（巢狀呼叫一併展開）；
+編譯結果依巨集 id 快取，並記錄反向相依（被呼叫者 -> 呼叫者），
+任何巨集變更時只讓它與直接或間接呼叫它的巨集失效
+"""
+import threading
+from typing import Dict, List, Set, Tuple, TYPE_CHECKING
+
+from .recorder import Macro, MacroEvent, EventType
+
+if TYPE_CHECKING:
+    from .manager import MacroManager
+
+
+# 編譯後的事件序列（不含呼叫事件；事件物件與原巨集共用）
+Plan = Tuple[MacroEvent, ...]
+
+
+class CompileError(Exception):
+    """無法編譯播放計畫（循環呼叫或找不到被呼叫的巨集）"""
+
+
+def callees_of(events: List[MacroEvent]) -> List[str]:
+    """事件中呼叫的巨集 id（依首次出現順序、不重複）"""
+    return list(dict.fromkeys(e.call_id for e in events if e.event_type == EventType.CALL and e.call_id))
+
+
+class PlanCompiler:
+    """
+    播放計畫編譯器（可從多個執行緒使用）
+    巨集在記憶體中被修改或被外部變更時，由擁有者呼叫 invalidate(巨集 id)
+    """
+
+    def __init__(self, manager: 'MacroManager'):
+        self.manager = manager
+        self._plans: Dict[str, Plan] = {}
+        self._sources: Dict[str, Macro] = {}  # id -> 編譯時使用的巨集物件
+        self._dependents: Dict[str, Set[str]] = {}  # 被呼叫者 id -> 呼叫者 id
+        self._lock = threading.RLock()
+
+    # ---- 編譯 ----
+
+    def link(self, macro: Macro) -> Dict[str, Plan]:
+        """
+        解析巨集直接呼叫的所有巨集，返回 {被呼叫者 id: 編譯後的事件}
+        巨集本身的事件不展開（播放進度仍對應到巨集的事件位置）；
+        巨集可以是尚未儲存的編輯中版本，呼叫到自己也視為循環
+        """
+        with self._lock:
+            return {callee: self._compile(callee, [macro.id]) for callee in callees_of(macro.events)}
+
+    def resolve(self, macro_id: str) -> Plan:
+        """依 id 取得巨集編譯後的事件（呼叫全部展開）"""
+        with self._lock:
+            return self._compile(macro_id, [])
+
+    def _compile(self, macro_id: str, stack: List[str]) -> Plan:
+        if macro_id in stack:
+            cycle = stack[stack.index(macro_id):] + [macro_id]
+            raise CompileError(f"循環呼叫：{' → '.join(self._name_of(i) for i in cycle)}")
+
+        macro = self.manager.get_macro_by_id(macro_id)
+        if macro is None:
+            raise CompileError(f"找不到被呼叫的巨集（id {macro_id}）")
+        plan = self._plans.get(macro_id)
+        if plan is not None and self._sources.get(macro_id) is macro:
+            return plan
+        if plan is not None:
+            # 巨集已被重新載入（例如外部修改），舊結果與相依者都不能再用
+            self.invalidate(macro_id)
+
+        stack.append(macro_id)
+        try:
+            events: List[MacroEvent] = []
+            for event in macro.events:
+                if event.event_type != EventType.CALL:
+                    events.append(event)
+                    continue
+                if event.call_id:
+                    inner = self._compile(event.call_id, stack)
+                    self._dependents.setdefault(event.call_id, set()).add(macro_id)
+                else:
+                    inner = ()
+                events.extend(expand_call(event, inner))
+        finally:
+            stack.pop()
+
+        plan = tuple(_balance_blocks(events))
+        self._plans[macro_id] = plan
+        self._sources[macro_id] = macro
+        return plan
+
+    def _name_of(self, macro_id: str) -> str:
+        return self.manager.find_name_by_id(macro_id) or macro_id
+
+    # ---- 失效 ----
+
+    def invalidate(self, macro_id: str):
+        """巨集已變更：移除它與所有直接或間接呼叫它的巨集的編譯結果"""
+        with self._lock:
+            pending = [macro_id]
+            seen: Set[str] = set()
+            while pending:
+                current = pending.pop()
+                if current in seen:
+                    continue
+                seen.add(current)
+                self._plans.pop(current, None)
+                self._sources.pop(current, None)
+                pending.extend(self._dependents.pop(current, ()))
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+            self._sources.clear()
+            self._dependents.clear()
+
+
+def _balance_blocks(events: List[MacroEvent]) -> List[MacroEvent]:
+    """
+    讓重複區塊在巨集內自行配對：多出的結束標記移除，沒有結束的區塊在結尾補上
+    （展開到呼叫者中時，區塊範圍才不會延伸到被呼叫巨集之外）
+    """
+    depth = 0
+    result: List[MacroEvent] = []
+    for event in events:
+        if event.event_type == EventType.REPEAT:
+            depth += 1
+        elif event.event_type == EventType.REPEAT_END:
+            if not depth:
+                if event.delay > 0:
+                    result.append(MacroEvent(EventType.DELAY, event.timestamp, delay=event.delay))
+                continue
+            depth -= 1
+        result.append(event)
+    result.extend(MacroEvent(EventType.REPEAT_END, 0) for _ in range(depth))
+    return result
+
+
+def expand_call(call: MacroEvent, plan: Plan) -> List[MacroEvent]:
+    """
+    呼叫事件展開後的事件：呼叫本身的延遲以延遲事件保留，
+    重複多次時以重複區塊包住被呼叫的事件（大小與次數無關）
+    （被呼叫巨集的循環次數與循環間隔不套用）
+    """
+    events: List[MacroEvent] = []
+    if call.delay > 0:
+        events.append(MacroEvent(EventType.DELAY, call.timestamp, delay=call.delay))
+    if call.count == 1:
+        events.extend(plan)
+    elif call.count > 1 and plan:
+        events.append(MacroEvent(EventType.REPEAT, call.timestamp, count=call.count))
+        events.extend(plan)
+        events.append(MacroEvent(EventType.REPEAT_END, call.timestamp))
+    return events
@@ -0,0 +1,320 @@
+"""
+本機控制介面 - 讓其他程式直接觸發與監看巨集，不需要模擬熱鍵
+協定：每行一個 JSON 物件（UTF-8，以換行結尾），請求可帶 id，回應會原樣帶回
+
+    {"id": 1, "cmd": "play", "name": "補血"}   ->  {"id": 1, "ok": true}
+    {"cmd": "status"}                          ->  {"ok": true, "playing": true, "macro": "補血", ...}
+    {"cmd": "watch"}                           ->  {"ok": true} 之後持續推送
+                                                   {"event": "progress", "macro": ..., "index": ..., "loop": ...}
+
+指令：play(name[, speed]) / stop / pause / resume / status / list / watch([interval]) / ping
+watch 會持續推送播放進度，直到同一連線送出下一個請求或斷線
+位址："127.0.0.1:8765"、"8765"（只綁定本機）或 "unix:/tmp/macrohub.sock"
+"""
+import os
+import json
+import time
+import select
+import socket
+import socketserver
+import threading
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from .player import MacroPlayer
+from .compiler import CompileError
+from .manager import MacroManager
+
+
+DEFAULT_WATCH_INTERVAL = 0.033  # 與 GUI 進度更新頻率相同
+MAX_LINE = 64 * 1024
+
+
+def parse_address(address: str) -> Tuple[str, Any]:
+    """解析位址字串，返回 ("tcp", (host, port)) 或 ("unix", path)"""
+    if address.startswith("unix:"):
+        return "unix", address[5:]
+    if os.sep in address or address.endswith(".sock"):
+        return "unix", address
+    host, sep, port = address.rpartition(":")
+    if not sep:
+        host = "127.0.0.1"
+    return "tcp", (host or "127.0.0.1", int(port))
+
+
+def format_address(kind: str, address: Any) -> str:
+    if kind == "unix":
+        return f"unix:{address}"
+    return f"{address[0]}:{address[1]}"
+
+
+class LineSocket:
+    """以換行分隔訊息的 socket（自行管理讀取緩衝，才能判斷是否還有待處理的請求）"""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self._buffer = bytearray()
+
+    def send(self, message: Dict):
+        self.sock.sendall(json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n")
+
+    def has_pending(self, timeout: float = 0.0) -> bool:
+        """緩衝區或 socket 有資料（含對方關閉連線）"""
+        if b"\n" in self._buffer:
+            return True
+        readable, _, _ = select.select([self.sock], [], [], timeout)
+        return bool(readable)
+
+    def read(self) -> Optional[Dict]:
+        """讀取下一個訊息，連線關閉時返回 None"""
+        while True:
+            end = self._buffer.find(b"\n")
+            if end >= 0:
+                line = bytes(self._buffer[:end])
+                del self._buffer[:end + 1]
+                if line.strip():
+                    return json.loads(line)
+                continue
+            if len(self._buffer) > MAX_LINE:
+                self._buffer.clear()
+                raise ValueError("請求過長")
+            chunk = self.sock.recv(4096)
+            if not chunk:
+                return None
+            self._buffer += chunk
+
+
+class ControlError(Exception):
+    """請求無法執行（回傳給用戶端的錯誤訊息）"""
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        control: ControlServer = self.server.control
+        if control.kind == "tcp":
+            self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # 回應不等待合併封包
+        conn = LineSocket(self.request)
+        while True:
+            try:
+                request = conn.read()
+            except ValueError as e:
+                conn.send({"ok": False, "error": f"無效的請求: {e}"})
+                continue
+            except OSError:
+                return
+            if request is None:
+                return
+            if not isinstance(request, dict):
+                conn.send({"ok": False, "error": "請求必須是 JSON 物件"})
+                continue
+            try:
+                if request.get("cmd") == "watch":
+                    conn.send(self._reply(request, {}))
+                    control.stream_progress(conn, float(request.get("interval", DEFAULT_WATCH_INTERVAL)))
+                    continue
+                result = control.dispatch(request)
+                conn.send(self._reply(request, result))
+            except ControlError as e:
+                conn.send(self._reply(request, {"ok": False, "error": str(e)}))
+            except OSError:
+                return
+            except Exception as e:
+                print(f"控制指令執行失敗: {e}")
+                conn.send(self._reply(request, {"ok": False, "error": str(e)}))
+
+    @staticmethod
+    def _reply(request: Dict, result: Dict) -> Dict:
+        reply = {"ok": True}
+        if "id" in request:
+            reply["id"] = request["id"]
+        reply.update(result)
+        return reply
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class _UnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+else:  # Windows 只支援 TCP
+    _UnixServer = None
+
+
+class ControlServer:
+    """
+    本機控制伺服器
+    每個連線一個執行緒；play 直接呼叫播放器，不經過鍵盤鉤子
+    """
+
+    def __init__(self, manager: MacroManager, player: MacroPlayer, address: str = "127.0.0.1:0"):
+        self.manager = manager
+        self.player = player
+        self.kind, self._bind = parse_address(address)
+        self._server: Optional[socketserver.BaseServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._play_lock = threading.Lock()
+
+    @property
+    def address(self) -> str:
+        """實際綁定的位址（TCP 埠號為 0 時會是系統指派的埠號）"""
+        if self._server is None:
+            return format_address(self.kind, self._bind)
+        return format_address(self.kind, self._server.server_address)
+
+    def start(self) -> str:
+        """開始接受連線，返回位址"""
+        if self._server is not None:
+            return self.address
+        if self.kind == "unix":
+            if _UnixServer is None:
+                raise OSError("此平台不支援 Unix socket，請改用 TCP 位址")
+            if os.path.exists(self._bind):
+                os.unlink(self._bind)  # 上次未正常結束留下的 socket 檔
+            self._server = _UnixServer(self._bind, _Handler)
+            os.chmod(self._bind, 0o600)  # 只有目前使用者可以控制
+        else:
+            self._server = _TCPServer(self._bind, _Handler)
+        self._server.control = self
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.2},
+                                        daemon=True)
+        self._thread.start()
+        return self.address
+
+    def stop(self):
+        """停止接受連線"""
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        if self.kind == "unix":
+            try:
+                os.unlink(self._bind)
+            except OSError:
+                pass
+        self._server = None
+
+    # ---- 指令 ----
+
+    def dispatch(self, request: Dict) -> Dict:
+        """執行一個請求（watch 以外），返回回應欄位"""
+        handler = getattr(self, f"_cmd_{request.get('cmd')}", None)
+        if handler is None:
+            raise ControlError(f"未知的指令: {request.get('cmd')}")
+        return handler(request) or {}
+
+    def _cmd_ping(self, request: Dict):
+        return {"time": time.time()}
+
+    def _cmd_play(self, request: Dict):
+        name = request.get("name")
+        if not name:
+            raise ControlError("缺少巨集名稱")
+        macro = self.manager.get_macro(name)
+        if macro is None:
+            raise ControlError(f"找不到巨集: {name}")
+        with self._play_lock:
+            if self.player.is_playing:
+                raise ControlError("正在播放其他巨集")
+            if "speed" in request:
+                speed = float(request["speed"])
+                if speed <= 0:
+                    raise ControlError("速度必須大於 0")
+                self.player.speed_multiplier = speed
+            try:
+                self.player.play(macro)
+            except CompileError as e:
+                raise ControlError(str(e))
+
+    def _cmd_stop(self, request: Dict):
+        self.player.stop()
+
+    def _cmd_pause(self, request: Dict):
+        self.player.pause()
+
+    def _cmd_resume(self, request: Dict):
+        self.player.resume()
+
+    def _cmd_status(self, request: Dict):
+        return self.status()
+
+    def _cmd_list(self, request: Dict):
+        return {"macros": [{
+            "name": info.name,
+            "trigger_key": info.trigger_key,
+            "event_count": info.event_count,
+            "duration": info.total_duration,
+            "loop_count": info.loop_count,
+        } for info in self.manager.get_all_infos()]}
+
+    def status(self) -> Dict:
+        player = self.player
+        macro = player.current_macro
+        return {
+            "playing": player.is_playing,
+            "paused": player.is_paused,
+            "macro": macro.name if macro is not None and player.is_playing else None,
+            "index": player.current_index,
+            "loop": player.current_loop,
+            "events": len(macro.events) if macro is not None and player.is_playing else 0,
+        }
+
+    def stream_progress(self, conn: LineSocket, interval: float):
+        """推送播放進度（狀態有變化時才送出），直到用戶端送出下一個請求或斷線"""
+        interval = max(interval, 0.005)
+        last = None
+        while not conn.has_pending(interval):
+            status = self.status()
+            state = tuple(status.values())
+            if state != last:
+                last = state
+                status["event"] = "progress"
+                conn.send(status)
+
+
+class ControlClient:
+    """控制介面用戶端（給腳本與效能測試使用）"""
+
+    def __init__(self, address: str, timeout: Optional[float] = 5.0):
+        kind, target = parse_address(address)
+        family = socket.AF_UNIX if kind == "unix" else socket.AF_INET
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(target)
+        if kind == "tcp":
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._conn = LineSocket(self.sock)
+        self._next_id = 0
+
+    def request(self, cmd: str, **params) -> Dict:
+        """送出請求並等待回應"""
+        self._next_id += 1
+        self._conn.send({"id": self._next_id, "cmd": cmd, **params})
+        while True:
+            reply = self._conn.read()
+            if reply is None:
+                raise ConnectionError("連線已關閉")
+            if "event" not in reply:  # 略過結束訂閱前已送出的進度
+                return reply
+
+    def watch(self, interval: float = DEFAULT_WATCH_INTERVAL) -> Iterator[Dict]:
+        """訂閱播放進度（之後這個連線只能接收進度，直到送出其他請求）"""
+        reply = self.request("watch", interval=interval)
+        if not reply.get("ok"):
+            raise ConnectionError(reply.get("error"))
+        self.sock.settimeout(None)  # 沒有播放時可能很久沒有訊息
+        while True:
+            message = self._conn.read()
+            if message is None:
+                return
+            yield message
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,148 @@
+"""
+無介面常駐模式 - 只執行巨集庫、全域熱鍵與播放器，不載入任何 GUI 套件
+收到 SIGINT/SIGTERM 時停止播放、釋放所有按住的按鍵後才結束
+"""
+import signal
+import threading
+from typing import Optional
+
+from .recorder import Macro
+from .player import MacroPlayer
+from .compiler import CompileError, PlanCompiler
+from .manager import LibraryChange
+from .storage import default_base_path, open_macro_manager
+from .hotkey_manager import HotkeyManager
+from .library_watcher import LibraryWatcher
+from .startup import StartupTimer
+
+
+class MacroDaemon:
+    """
+    常駐程式
+    熱鍵只依巨集摘要註冊，觸發時才取得巨集（SQLite 後端不會在啟動時載入事件）
+    """
+
+    EMERGENCY_KEY = "escape"
+
+    def __init__(self, base_path: Optional[str] = None, backend: Optional[str] = None,
+                 watch: bool = True, control: Optional[str] = None,
+                 startup: Optional[StartupTimer] = None):
+        self._startup = startup or StartupTimer()
+        self.manager = open_macro_manager(base_path or default_base_path(), backend)
+        self._startup.mark("載入巨集庫")
+
+        self.player = MacroPlayer()
+        self.compiler = PlanCompiler(self.manager)
+        self.player.plan_provider = self.compiler.link
+        self.hotkey_manager = HotkeyManager()
+        self.library_watcher: Optional[LibraryWatcher] = None
+        if watch:
+            self.library_watcher = LibraryWatcher(self.manager, on_change=self._apply_library_change)
+        self.control_server = None
+        if control:
+            from .control_server import ControlServer
+            self.control_server = ControlServer(self.manager, self.player, control)
+
+        self._stopped = threading.Event()
+        self._closed = False
+
+    # ---- 熱鍵 ----
+
+    def _register(self, trigger_key: str, name: str):
+        self.hotkey_manager.register_hotkey(trigger_key, lambda: self.trigger(name))
+
+    def _setup_hotkeys(self):
+        for info in self.manager.get_all_infos():
+            if info.trigger_key:
+                self._register(info.trigger_key, info.name)
+        self.hotkey_manager.register_hotkey(self.EMERGENCY_KEY, self.player.emergency_stop)
+
+    def _apply_library_change(self, change: LibraryChange):
+        """外部修改巨集庫時只重新註冊受影響的熱鍵（監看執行緒）"""
+        for macro in change.removed + [m for pair in change.changed for m in pair]:
+            self.compiler.invalidate(macro.id)
+        for macro in change.removed + [old for old, _ in change.changed]:
+            if macro.trigger_key:
+                self.hotkey_manager.unregister_hotkey(macro.trigger_key)
+        for macro in change.added + [new for _, new in change.changed]:
+            if macro.trigger_key:
+                self._register(macro.trigger_key, macro.name)
+
+    def trigger(self, name: str):
+        """熱鍵觸發：符合目標視窗且沒有正在播放時開始播放"""
+        macro = self.manager.get_macro(name)
+        if macro is None or self.player.is_playing:
+            return
+        if macro.target_window and not self._window_matches(macro):
+            return
+        try:
+            self.player.play(macro)
+        except CompileError as e:
+            print(f"無法播放「{name}」: {e}")
+
+    @staticmethod
+    def _window_matches(macro: Macro) -> bool:
+        from . import window_utils
+        return macro.target_window.lower() in window_utils.get_active_window_title().lower()
+
+    # ---- 生命週期 ----
+
+    def start(self):
+        """註冊熱鍵並開始監看巨集目錄"""
+        self._setup_hotkeys()
+        self.hotkey_manager.start()
+        self._startup.mark("啟動熱鍵")
+        if self.library_watcher:
+            self.library_watcher.start()
+        if self.control_server:
+            print(f"控制介面：{self.control_server.start()}")
+
+    def request_stop(self, *_):
+        """要求結束（可作為訊號處理函式）"""
+        self._stopped.set()
+
+    def install_signal_handlers(self):
+        """SIGINT/SIGTERM（Windows 另有 SIGBREAK）觸發正常結束"""
+        for name in ("SIGINT", "SIGTERM", "SIGBREAK"):
+            sig = getattr(signal, name, None)
+            if sig is not None:
+                try:
+                    signal.signal(sig, self.request_stop)
+                except (ValueError, OSError):  # 非主執行緒或平台不支援
+                    pass
+
+    def run(self):
+        """啟動並阻塞到收到結束訊號，結束前一定會釋放按鍵"""
+        self.install_signal_handlers()
+        try:
+            self.start()
+            print(self._startup.report())
+            print(f"MacroHub 常駐模式：{len(self.manager.get_all_infos())} 個巨集，按 Ctrl+C 結束")
+            # 以逾時等待，讓 Windows 上的 Ctrl+C 也能及時處理
+            while not self._stopped.wait(0.5):
+                pass
+        finally:
+            self.shutdown()
+
+    def shutdown(self, timeout: float = 2.0):
+        """停止熱鍵與播放、釋放所有按鍵並關閉巨集庫"""
+        if self._closed:
+            return
+        self._closed = True
+        self.hotkey_manager.stop()  # 先停熱鍵與控制介面，避免關閉中又觸發播放
+        if self.control_server:
+            self.control_server.stop()
+        if self.library_watcher:
+            self.library_watcher.stop()
+        self.player.stop()
+        if not self.player.join(timeout):
+            print("播放執行緒未在時限內結束")
+        self.player.release_all_keys()  # 播放執行緒最後一個事件可能又按下了按鍵
+        self.manager.close()
+
+
+def run_daemon(base_path: Optional[str] = None, backend: Optional[str] = None,
+               watch: bool = True, control: Optional[str] = None,
+               startup: Optional[StartupTimer] = None):
+    """建立並執行常駐程式"""
+    MacroDaemon(base_path, backend, watch=watch, control=control, startup=startup).run()
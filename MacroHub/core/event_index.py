@@ -0,0 +1,172 @@
+"""
+巨集內事件索引 - 依按鍵/按鈕/類型尋找事件，以及依時間定位事件
+倒排索引（詞 -> 事件位置）與累計延遲都從第一個被修改的位置起延後重算，
+編輯只需標記 dirty 位置，成本與修改點之後的事件數成正比
+"""
+import re
+import bisect
+from typing import Dict, List, Optional, Tuple
+
+from .recorder import EventType, MacroEvent, RepeatFrame, advance_time, finish_time
+from .search_index import key_terms
+
+
+_QUERY = re.compile(r"^(?P<term>.*?)(?:\s*#(?P<nth>\d+))?$")
+
+
+def button_terms(button: str) -> List[str]:
+    """按鈕的查詢詞：錄製的名稱為 "Button.left"，另外索引去掉前綴的名稱（left）"""
+    term = button.lower()
+    if term.startswith("button.") and len(term) > 7:
+        return [term, term[7:]]
+    return [term]
+
+
+def event_terms(event: MacroEvent) -> List[str]:
+    """事件可被搜尋的詞"""
+    terms = [f"type:{event.event_type.value}"]
+    if event.event_type in (EventType.KEY_PRESS, EventType.KEY_TAP) and event.key:
+        terms.extend(f"key:{term}" for term in key_terms(event.key))
+    elif event.event_type == EventType.MOUSE_CLICK and event.button:
+        terms.extend(f"button:{term}" for term in button_terms(event.button))
+    return terms
+
+
+def parse_event_query(text: str) -> Tuple[Optional[str], Optional[int]]:
+    """
+    解析搜尋字串，返回 (詞, 第幾個)
+      f / key:f       按下 f（特殊鍵可省略 "Key."）
+      button:left     滑鼠左鍵按下
+      type:delay      指定類型（類型名稱也可直接輸入）
+      f #12           第 12 次按下 f
+    """
+    match = _QUERY.match(text.strip())
+    term, nth = match.group("term").strip().lower(), match.group("nth")
+    if not term:
+        return None, None
+    if ":" not in term:
+        types = {t.value for t in EventType}
+        term = f"type:{term}" if term in types else f"key:{term}"
+    return term, int(nth) if nth else None
+
+
+class EventIndex:
+    """
+    單一巨集的事件索引（直接參照巨集的事件清單）
+    編輯後呼叫 invalidate(起始位置)，下次查詢時才重算該位置之後的部分
+    """
+
+    def __init__(self, events: List[MacroEvent]):
+        self.events = events
+        self._postings: Dict[str, List[int]] = {}
+        self._offsets: List[float] = []  # 第 i 個事件執行時間（含自身延遲的累計延遲；重複區塊內為第一輪）
+        self._ends: List[float] = []  # 第 i 個事件結束後的時間
+        self._frames: List[Tuple[RepeatFrame, ...]] = []  # 第 i 個事件之後仍未結束的重複區塊
+        self._valid = 0  # [0, _valid) 的索引資料是最新的
+
+    def invalidate(self, start: int = 0):
+        """標記 start 之後的事件已變動"""
+        self._valid = min(self._valid, max(start, 0))
+
+    def _ensure(self):
+        """補算 dirty 位置之後的索引"""
+        events = self.events
+        valid = min(self._valid, len(events), len(self._offsets))
+        if valid == len(events) == len(self._offsets):
+            return
+
+        # 截掉失效的部分（位置清單已排序，用二分搜尋切斷）
+        for term in list(self._postings):
+            positions = self._postings[term]
+            cut = bisect.bisect_left(positions, valid)
+            if cut == 0:
+                del self._postings[term]
+            else:
+                del positions[cut:]
+        del self._offsets[valid:]
+        del self._ends[valid:]
+        del self._frames[valid:]
+
+        time, frames = (self._ends[-1], self._frames[-1]) if self._ends else (0.0, ())
+        postings = self._postings
+        offsets, ends, frame_list = self._offsets, self._ends, self._frames
+        for i in range(valid, len(events)):
+            event = events[i]
+            at, time, frames = advance_time(event, time, frames)
+            offsets.append(at)
+            ends.append(time)
+            frame_list.append(frames)
+            for term in event_terms(event):
+                postings.setdefault(term, []).append(i)
+        self._valid = len(events)
+
+    # ---- 依詞尋找 ----
+
+    def positions(self, term: str) -> List[int]:
+        """符合詞的所有事件位置（已排序，請勿修改）"""
+        self._ensure()
+        return self._postings.get(term, [])
+
+    def count(self, term: str) -> int:
+        return len(self.positions(term))
+
+    def nth(self, term: str, n: int) -> Optional[int]:
+        """第 n 個（從 1 開始）符合的事件位置"""
+        positions = self.positions(term)
+        if 1 <= n <= len(positions):
+            return positions[n - 1]
+        return None
+
+    def find_next(self, term: str, after: Optional[int] = None, backwards: bool = False,
+                  wrap: bool = True) -> Optional[int]:
+        """從 after 之後（backwards 時為之前）尋找下一個符合的事件"""
+        positions = self.positions(term)
+        if not positions:
+            return None
+        if backwards:
+            start = len(self.events) if after is None else after
+            k = bisect.bisect_left(positions, start) - 1
+            if k >= 0:
+                return positions[k]
+            return positions[-1] if wrap else None
+        start = -1 if after is None else after
+        k = bisect.bisect_right(positions, start)
+        if k < len(positions):
+            return positions[k]
+        return positions[0] if wrap else None
+
+    def occurrence(self, term: str, index: int) -> int:
+        """index 位置是第幾個符合詞的事件（從 1 開始；不符合時返回 0）"""
+        positions = self.positions(term)
+        k = bisect.bisect_left(positions, index)
+        return k + 1 if k < len(positions) and positions[k] == index else 0
+
+    # ---- 依時間定位 ----
+
+    def time_of(self, index: int) -> float:
+        """第 index 個事件的執行時間（秒，從巨集開始起算）"""
+        self._ensure()
+        if not self._offsets:
+            return 0.0
+        return self._offsets[max(0, min(index, len(self._offsets) - 1))]
+
+    def index_at_time(self, seconds: float) -> Optional[int]:
+        """指定時間點正在（或最後）執行的事件：執行時間不晚於該時間的最後一個事件"""
+        self._ensure()
+        if not self._offsets:
+            return None
+        index = bisect.bisect_right(self._offsets, seconds) - 1
+        return max(index, 0)
+
+    @property
+    def total_duration(self) -> float:
+        self._ensure()
+        return finish_time(self._ends[-1], self._frames[-1]) if self._ends else 0.0
+
+    def depth(self, index: int) -> int:
+        """事件所在的重複區塊層數（區塊的開始與結束標記算在外層）"""
+        self._ensure()
+        if not 0 <= index < len(self._frames):
+            return 0
+        depth = len(self._frames[index - 1]) if index > 0 else 0
+        return depth - 1 if self.events[index].event_type == EventType.REPEAT_END and depth else depth
@@ -0,0 +1,267 @@
+"""
+編輯歷史 - 巨集編輯器的復原/重做
+每一步只記錄操作差異（刪除/插入的區段、被取代的事件），不保存整份巨集快照；
+事件物件不可變，歷史紀錄與巨集共用同一批物件
+"""
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple
+
+from .recorder import Macro, MacroEvent
+
+
+# 粗估一個 MacroEvent（物件本身加屬性字典）佔用的位元組數
+EVENT_SIZE_ESTIMATE = 400
+# 一個索引或物件參考佔用的位元組數
+REF_SIZE = 8
+
+
+def _compact_indices(indices) -> Sequence[int]:
+    """排序去重；連續的索引以 range 表示（記憶體用量固定）"""
+    ordered = sorted(set(indices))
+    if ordered and ordered[-1] - ordered[0] + 1 == len(ordered):
+        return range(ordered[0], ordered[-1] + 1)
+    return ordered
+
+
+def _indices_cost(indices: Sequence[int]) -> int:
+    return 48 if isinstance(indices, range) else REF_SIZE * len(indices)
+
+
+class EditOp(ABC):
+    """
+    編輯操作
+    apply/revert 返回操作後應選取的事件索引
+    """
+
+    @abstractmethod
+    def apply(self, macro: Macro) -> List[int]:
+        ...
+
+    @abstractmethod
+    def revert(self, macro: Macro) -> List[int]:
+        ...
+
+    @abstractmethod
+    def span(self) -> Tuple[int, Optional[int]]:
+        """受影響的列範圍 [start, end)，end 為 None 表示到清單尾端"""
+
+    @abstractmethod
+    def cost(self) -> int:
+        """此操作在歷史中額外佔用的記憶體（估計值）"""
+
+
+@dataclass
+class RemoveEvents(EditOp):
+    """刪除一組事件"""
+    indices: Sequence[int]
+    events: List[MacroEvent] = field(default_factory=list)  # 執行時填入被刪除的事件
+
+    def __post_init__(self):
+        self.indices = _compact_indices(self.indices)
+
+    def apply(self, macro: Macro) -> List[int]:
+        self.events = macro.remove_events(self.indices)
+        return []
+
+    def revert(self, macro: Macro) -> List[int]:
+        macro.restore_events(self.indices, self.events)
+        return list(self.indices)
+
+    def span(self) -> Tuple[int, Optional[int]]:
+        return (self.indices[0] if self.indices else 0), None
+
+    def cost(self) -> int:
+        # 被刪除的事件只剩歷史紀錄參考它們
+        return _indices_cost(self.indices) + len(self.events) * (EVENT_SIZE_ESTIMATE + REF_SIZE)
+
+
+@dataclass
+class InsertEvents(EditOp):
+    """在指定位置插入一組事件"""
+    index: int
+    events: Sequence[MacroEvent]
+
+    def apply(self, macro: Macro) -> List[int]:
+        self.index = max(0, min(self.index, macro.event_count))
+        macro.insert_events(self.index, self.events)
+        return list(range(self.index, self.index + len(self.events)))
+
+    def revert(self, macro: Macro) -> List[int]:
+        macro.remove_events(range(self.index, self.index + len(self.events)))
+        return []
+
+    def span(self) -> Tuple[int, Optional[int]]:
+        return self.index, None
+
+    def cost(self) -> int:
+        # 插入的事件仍在巨集中，這裡只持有參考
+        return len(self.events) * REF_SIZE
+
+
+@dataclass
+class MoveEvents(EditOp):
+    """把一組事件當作區塊移到目標事件之前/之後（見 Macro.move_events）"""
+    indices: Sequence[int]
+    target: int
+    after: bool = False
+    new_pos: int = 0  # 執行時填入區塊的新起始位置
+
+    def __post_init__(self):
+        self.indices = _compact_indices(self.indices)
+
+    def apply(self, macro: Macro) -> List[int]:
+        self.new_pos = macro.move_events(self.indices, self.target, self.after)
+        return list(range(self.new_pos, self.new_pos + len(self.indices)))
+
+    def revert(self, macro: Macro) -> List[int]:
+        moved = macro.remove_events(range(self.new_pos, self.new_pos + len(self.indices)))
+        macro.restore_events(self.indices, moved)
+        return list(self.indices)
+
+    def span(self) -> Tuple[int, Optional[int]]:
+        if not self.indices:
+            return self.new_pos, self.new_pos
+        start = min(self.indices[0], self.new_pos)
+        end = max(self.indices[-1], self.new_pos + len(self.indices) - 1) + 1
+        return start, end
+
+    def cost(self) -> int:
+        return _indices_cost(self.indices)
+
+
+@dataclass
+class ReplaceEvent(EditOp):
+    """以新事件取代單一事件（欄位修改）"""
+    index: int
+    new: MacroEvent
+    old: Optional[MacroEvent] = None  # 執行時填入被取代的事件
+
+    def apply(self, macro: Macro) -> List[int]:
+        self.old = macro.events[self.index]
+        macro.events[self.index] = self.new
+        return [self.index]
+
+    def revert(self, macro: Macro) -> List[int]:
+        macro.events[self.index] = self.old
+        return [self.index]
+
+    def span(self) -> Tuple[int, Optional[int]]:
+        return self.index, self.index + 1
+
+    def cost(self) -> int:
+        return EVENT_SIZE_ESTIMATE + REF_SIZE
+
+
+@dataclass
+class ReplaceRange(EditOp):
+    """以一組新事件取代連續區段 [start, end)（例如套用最佳化結果）"""
+    start: int
+    end: int
+    events: Sequence[MacroEvent]
+    old: List[MacroEvent] = field(default_factory=list)  # 執行時填入被取代的事件
+
+    @classmethod
+    def between(cls, old: Sequence[MacroEvent], new: Sequence[MacroEvent]) -> "ReplaceRange":
+        """由新舊事件清單建立操作，只取代頭尾相同物件以外的區段"""
+        limit = min(len(old), len(new))
+        prefix = 0
+        while prefix < limit and old[prefix] is new[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < limit - prefix and old[-1 - suffix] is new[-1 - suffix]:
+            suffix += 1
+        return cls(prefix, len(old) - suffix, list(new[prefix:len(new) - suffix]))
+
+    def apply(self, macro: Macro) -> List[int]:
+        self.old = macro.events[self.start:self.end]
+        macro.events[self.start:self.end] = self.events
+        return []
+
+    def revert(self, macro: Macro) -> List[int]:
+        macro.events[self.start:self.start + len(self.events)] = self.old
+        return []
+
+    def span(self) -> Tuple[int, Optional[int]]:
+        if len(self.events) == self.end - self.start:
+            return self.start, self.end
+        return self.start, None
+
+    def cost(self) -> int:
+        # 只有被取代且不再出現在巨集中的事件由歷史獨佔
+        kept = {id(e) for e in self.events}
+        dropped = sum(1 for e in self.old if id(e) not in kept)
+        return (len(self.old) + len(self.events)) * REF_SIZE + dropped * EVENT_SIZE_ESTIMATE
+
+
+class EditHistory:
+    """
+    復原/重做堆疊
+    超過記憶體預算或步數上限時丟棄最舊的紀錄（至少保留最新一步）
+    """
+
+    def __init__(self, memory_budget: int = 32 * 1024 * 1024, max_steps: int = 500):
+        self.memory_budget = memory_budget
+        self.max_steps = max_steps
+        self._undo: List[Tuple[EditOp, int]] = []  # (操作, 估計成本)
+        self._redo: List[Tuple[EditOp, int]] = []
+        self._usage = 0
+
+    @property
+    def memory_usage(self) -> int:
+        """目前歷史紀錄的估計記憶體用量"""
+        return self._usage
+
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+        self._usage = 0
+
+    def apply(self, macro: Macro, op: EditOp) -> List[int]:
+        """執行操作並記錄；返回應選取的事件索引"""
+        selection = op.apply(macro)
+        self._clear_redo()
+        cost = op.cost()
+        self._undo.append((op, cost))
+        self._usage += cost
+        self._evict()
+        return selection
+
+    def undo(self, macro: Macro) -> Optional[Tuple[EditOp, List[int]]]:
+        """復原最近一步，返回 (操作, 應選取的索引)；沒有可復原時返回 None"""
+        if not self._undo:
+            return None
+        op, cost = self._undo.pop()
+        selection = op.revert(macro)
+        self._redo.append((op, cost))
+        return op, selection
+
+    def redo(self, macro: Macro) -> Optional[Tuple[EditOp, List[int]]]:
+        """重做最近一次復原的操作"""
+        if not self._redo:
+            return None
+        op, cost = self._redo.pop()
+        selection = op.apply(macro)
+        self._undo.append((op, cost))
+        return op, selection
+
+    def _clear_redo(self):
+        for _, cost in self._redo:
+            self._usage -= cost
+        self._redo.clear()
+
+    def _evict(self):
+        """丟棄最舊的紀錄直到符合預算"""
+        drop = 0
+        while len(self._undo) - drop > 1 and (
+                self._usage > self.memory_budget or len(self._undo) - drop > self.max_steps):
+            self._usage -= self._undo[drop][1]
+            drop += 1
+        if drop:
+            del self._undo[:drop]
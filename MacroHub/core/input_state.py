@@ -0,0 +1,90 @@
+"""
+輸入狀態 - 記錄播放器實際按住的按鍵與滑鼠按鈕
+按鍵字串只解析一次：KeyTable 把解析後的按鍵物件對應到固定的位元編號，
+InputState 以一個整數當位元集合記錄按住狀態；寫法不同但解析結果相同的按鍵
+（例如 "A" 與 "a"）共用同一個位元，釋放時只送出真正按住的項目
+"""
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+
+def iter_bits(bits: int) -> Iterator[int]:
+    """位元集合中的位元編號（由低到高，成本與設定的位元數成正比）"""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+class KeyTable:
+    """
+    按鍵/按鈕字串 -> 位元編號
+    parse_key 與 parse_button 把事件中的字串解析為控制器使用的物件
+    """
+
+    def __init__(self, parse_key: Callable[[str], Any], parse_button: Callable[[str], Any]):
+        self._parsers = {False: parse_key, True: parse_button}
+        self._names: Dict[Tuple[bool, str], int] = {}  # (是否為按鈕, 字串) -> 位元
+        self._slots: Dict[Tuple[bool, Any], int] = {}  # (是否為按鈕, 解析後的物件) -> 位元
+        self.entries: List[Tuple[bool, Any]] = []  # 位元 -> (是否為按鈕, 解析後的物件)
+        self._lock = threading.Lock()
+
+    def _slot(self, is_button: bool, name: str) -> int:
+        slot = self._names.get((is_button, name))
+        if slot is not None:
+            return slot
+        resolved = self._parsers[is_button](name)
+        with self._lock:
+            slot = self._slots.setdefault((is_button, resolved), len(self.entries))
+            if slot == len(self.entries):
+                self.entries.append((is_button, resolved))
+            self._names[(is_button, name)] = slot
+        return slot
+
+    def key_slot(self, key: str) -> int:
+        return self._slot(False, key)
+
+    def button_slot(self, button: str) -> int:
+        return self._slot(True, button)
+
+    def resolved(self, slot: int) -> Any:
+        return self.entries[slot][1]
+
+    def is_button(self, slot: int) -> bool:
+        return self.entries[slot][0]
+
+
+class InputState:
+    """按住狀態的位元集合（可從多個執行緒使用）"""
+
+    def __init__(self):
+        self.bits = 0
+        self._lock = threading.Lock()
+
+    def press(self, slot: int):
+        with self._lock:
+            self.bits |= 1 << slot
+
+    def release(self, slot: int) -> bool:
+        """清除按住狀態，返回原本是否按住"""
+        mask = 1 << slot
+        with self._lock:
+            held = bool(self.bits & mask)
+            self.bits &= ~mask
+        return held
+
+    def is_held(self, slot: int) -> bool:
+        return bool(self.bits >> slot & 1)
+
+    def held(self) -> List[int]:
+        """目前按住的位元編號"""
+        return list(iter_bits(self.bits))
+
+    def take(self) -> List[int]:
+        """取出並清空所有按住的位元（同一批按鍵只會被取出一次）"""
+        with self._lock:
+            bits, self.bits = self.bits, 0
+        return list(iter_bits(bits))
+
+    def __bool__(self) -> bool:
+        return self.bits != 0
@@ -0,0 +1,103 @@
+"""
+巨集目錄監看器 - 偵測外部新增/修改/刪除的巨集檔案並增量重新載入
+有安裝 watchdog 時使用系統檔案通知（inotify/ReadDirectoryChangesW），
+否則退回定時輪詢
+"""
+import threading
+from typing import Callable, Optional
+
+from .manager import MacroManager, LibraryChange
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # watchdog 是選用相依套件
+    Observer = None
+    FileSystemEventHandler = object
+
+
+class _ChangeHandler(FileSystemEventHandler):
+    """把任何檔案系統事件轉成喚醒訊號"""
+
+    def __init__(self, wake: threading.Event):
+        super().__init__()
+        self._wake = wake
+
+    def on_any_event(self, event):
+        self._wake.set()
+
+
+class LibraryWatcher:
+    """巨集目錄監看器"""
+
+    def __init__(self, manager: MacroManager,
+                 on_change: Optional[Callable[[LibraryChange], None]] = None,
+                 poll_interval: float = 2.0, settle_delay: float = 0.2):
+        self.manager = manager
+        self.on_change = on_change
+        self.poll_interval = poll_interval  # 輪詢間隔（有通知時作為保底檢查）
+        self.settle_delay = settle_delay  # 收到通知後等待檔案寫完的時間
+
+        self._wake = threading.Event()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self._observer = None
+
+    @property
+    def uses_notifications(self) -> bool:
+        """是否使用系統檔案通知（否則為輪詢）"""
+        return self._observer is not None
+
+    def start(self):
+        """開始監看"""
+        if self._running:
+            return
+        self._running = True
+
+        if Observer is not None:
+            try:
+                self._observer = Observer()
+                self._observer.schedule(_ChangeHandler(self._wake), self.manager.macros_dir, recursive=False)
+                self._observer.start()
+            except Exception as e:
+                print(f"檔案通知無法啟用，改用輪詢: {e}")
+                self._observer = None
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止監看"""
+        self._running = False
+        self._wake.set()
+        if self._observer is not None:
+            try:
+                self._observer.stop()
+            except Exception:
+                pass
+            self._observer = None
+
+    def trigger(self):
+        """要求立即重新掃描"""
+        self._wake.set()
+
+    def _run(self):
+        while self._running:
+            notified = self._wake.wait(self.poll_interval)
+            if not self._running:
+                break
+
+            if notified:
+                # 合併短時間內的連續通知
+                self._wake.clear()
+                while self._wake.wait(self.settle_delay) and self._running:
+                    self._wake.clear()
+
+            try:
+                change = self.manager.rescan()
+            except Exception as e:
+                print(f"重新掃描巨集目錄失敗: {e}")
+                continue
+
+            if change and self.on_change:
+                self.on_change(change)
@@ -0,0 +1,242 @@
+"""
+巨集檔案讀寫 - 支援 gzip/lzma 壓縮與大型檔案的串流解析
+"""
+import io
+import os
+import re
+import gzip
+import json
+import lzma
+from typing import BinaryIO, Callable, Dict, IO, List, Optional
+
+from .recorder import Macro, MacroEvent
+from .persistence import atomic_write
+
+
+GZIP_MAGIC = b"\x1f\x8b"
+XZ_MAGIC = b"\xfd7zXZ\x00"
+
+# 可匯入/匯出的副檔名（供檔案對話框使用）
+MACRO_FILE_TYPES = [
+    ("巨集檔案", "*.json *.json.gz *.json.xz"),
+    ("JSON", "*.json"),
+    ("壓縮巨集 (gzip)", "*.json.gz"),
+    ("壓縮巨集 (xz)", "*.json.xz"),
+]
+
+ProgressCallback = Callable[[int, int], None]  # (已讀位元組, 總位元組)
+
+
+def compression_for_path(filepath: str) -> Optional[str]:
+    """依副檔名決定壓縮格式"""
+    lower = filepath.lower()
+    if lower.endswith(".gz"):
+        return "gzip"
+    if lower.endswith(".xz") or lower.endswith(".lzma"):
+        return "xz"
+    return None
+
+
+def _sniff_compression(raw: BinaryIO) -> Optional[str]:
+    """依檔案開頭的 magic bytes 判斷壓縮格式"""
+    head = raw.read(len(XZ_MAGIC))
+    raw.seek(0)
+    if head.startswith(GZIP_MAGIC):
+        return "gzip"
+    if head.startswith(XZ_MAGIC):
+        return "xz"
+    return None
+
+
+def _wrap_compression(raw: BinaryIO, compression: Optional[str], mode: str) -> BinaryIO:
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=raw, mode=mode)
+    if compression == "xz":
+        return lzma.LZMAFile(raw, mode=mode)
+    return raw
+
+
+def write_macro_stream(f: IO[str], macro: Macro):
+    """
+    以緊湊格式寫出巨集：事件一行一個，不需先組出整份 JSON 字串
+    輸出仍是合法的 JSON，可被 json.load 讀取
+    """
+    header = macro.to_dict()
+    del header["events"]
+    f.write('{"name": ')
+    f.write(json.dumps(header.pop("name"), ensure_ascii=False))
+    for key, value in header.items():
+        f.write(f', {json.dumps(key)}: {json.dumps(value, ensure_ascii=False)}')
+    f.write(', "events": [')
+    for i, event in enumerate(macro.events):
+        f.write(",\n" if i else "\n")
+        f.write(json.dumps(event.to_dict(), ensure_ascii=False, separators=(",", ":")))
+    f.write("\n]}\n")
+
+
+def write_macro_file(filepath: str, macro: Macro):
+    """寫出巨集檔案（依副檔名壓縮，原子寫入）"""
+    compression = compression_for_path(filepath)
+
+    def write(raw: BinaryIO):
+        stream = _wrap_compression(raw, compression, "wb")
+        text = io.TextIOWrapper(stream, encoding='utf-8')
+        write_macro_stream(text, macro)
+        text.flush()
+        text.detach()
+        if stream is not raw:
+            stream.close()  # 寫出壓縮結尾，不會關閉底層檔案
+
+    atomic_write(filepath, write)
+
+
+class MacroStreamReader:
+    """
+    巨集 JSON 串流解析器
+    逐塊讀取檔案，事件陣列中的元素逐一解碼並分批交給 on_events，
+    記憶體用量只與區塊大小及批次大小有關，與檔案大小無關
+    """
+
+    _WHITESPACE = re.compile(r"\s*")
+    _NUMBER_START = "-0123456789"
+    _NUMBER_TAIL = re.compile(r"[0-9eE.+-]*")
+
+    def __init__(self, text: IO[str], chunk_size: int = 1 << 16):
+        self._text = text
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        """讀入下一塊資料，並丟棄已解析的部分"""
+        if self._eof:
+            return False
+        chunk = self._text.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        """跳過空白並返回下一個字元（檔案結束時返回空字串）"""
+        while True:
+            self._pos = self._WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, char: str):
+        found = self._peek()
+        if found != char:
+            raise ValueError(f"巨集檔案格式錯誤：預期 {char!r}，實際為 {found!r}")
+        self._pos += 1
+
+    def _value(self):
+        """解碼一個完整的 JSON 值，不足時繼續讀入"""
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+                # 數字延伸到緩衝區尾端時可能被區塊邊界截斷（例如 "12." 會被解成 12），需再讀一塊重新解碼
+                if self._eof or self._buf[self._pos] not in self._NUMBER_START \
+                        or self._NUMBER_TAIL.match(self._buf, end).end() < len(self._buf):
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            if not self._fill():
+                if self._eof and self._pos >= len(self._buf):
+                    raise ValueError("巨集檔案意外結束")
+
+    def read(self, on_events: Callable[[List[MacroEvent]], None], batch_size: int = 1000,
+             on_batch: Optional[Callable[[], None]] = None) -> Dict:
+        """
+        解析整份巨集
+        返回不含事件的其他欄位；事件每 batch_size 個交給 on_events 一次
+        """
+        header: Dict = {}
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return header
+
+        while True:
+            key = self._value()
+            self._expect(":")
+            if key == "events":
+                self._read_events(on_events, batch_size, on_batch)
+            else:
+                header[key] = self._value()
+
+            char = self._peek()
+            self._pos += 1
+            if char == "}":
+                return header
+            if char != ",":
+                raise ValueError(f"巨集檔案格式錯誤：預期 ',' 或 '}}'，實際為 {char!r}")
+
+    def _read_events(self, on_events: Callable[[List[MacroEvent]], None], batch_size: int,
+                     on_batch: Optional[Callable[[], None]]):
+        self._expect("[")
+        if self._peek() == "]":
+            self._pos += 1
+            return
+
+        batch: List[MacroEvent] = []
+        while True:
+            batch.append(MacroEvent.from_dict(self._value()))
+            if len(batch) >= batch_size:
+                on_events(batch)
+                batch = []
+                if on_batch:
+                    on_batch()
+
+            char = self._peek()
+            self._pos += 1
+            if char == "]":
+                break
+            if char != ",":
+                raise ValueError(f"巨集檔案格式錯誤：預期 ',' 或 ']'，實際為 {char!r}")
+
+        if batch:
+            on_events(batch)
+            if on_batch:
+                on_batch()
+
+
+def read_macro_file(filepath: str, on_events: Callable[[List[MacroEvent]], None],
+                    progress: Optional[ProgressCallback] = None, batch_size: int = 1000) -> Dict:
+    """
+    串流讀取巨集檔案（自動辨識 gzip/xz 壓縮）
+    返回不含事件的欄位；progress(已讀, 總量) 以壓縮前的檔案位元組計算
+    """
+    total = os.path.getsize(filepath)
+    with open(filepath, 'rb') as raw:
+        stream = _wrap_compression(raw, _sniff_compression(raw), "rb")
+        text = io.TextIOWrapper(stream, encoding='utf-8')
+        reader = MacroStreamReader(text)
+
+        def report():
+            if progress:
+                progress(raw.tell(), total)
+
+        header = reader.read(on_events, batch_size, on_batch=report)
+        if progress:
+            progress(total, total)
+    return header
+
+
+def load_macro_file(filepath: str, progress: Optional[ProgressCallback] = None) -> Macro:
+    """串流讀取並建立完整的巨集物件"""
+    events: List[MacroEvent] = []
+    header = read_macro_file(filepath, events.extend, progress)
+    header["events"] = []
+    macro = Macro.from_dict(header)
+    macro.events = events
+    return macro
@@ -3,44 +3,173 @@
 """
 import os
 import json
-from typing import Dict, List, Optional
-from .recorder import Macro
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+from .recorder import Macro, MacroInfo, new_macro_id
+from .persistence import PersistenceWorker, atomic_write_json
+from .macro_io import ProgressCallback, load_macro_file, write_macro_file
+from .bundle import export_bundle, import_bundle
+
+
+# 檔案快照：(mtime_ns, size, inode)
+FileSnapshot = Tuple[int, int, int]
+
+
+@dataclass
+class LibraryChange:
+    """增量重新掃描的結果"""
+    added: List[Macro] = field(default_factory=list)
+    changed: List[Tuple[Macro, Macro]] = field(default_factory=list)  # (舊, 新)
+    removed: List[Macro] = field(default_factory=list)
+    
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
 
 
 class MacroManager:
     """巨集管理器"""
     
-    def __init__(self, macros_dir: str = "macros"):
+    def __init__(self, macros_dir: str = "macros", load: bool = True):
+        """load=False 時不在建構時讀取巨集檔（稍後呼叫 ensure_loaded，例如在背景執行緒）"""
         self.macros_dir = macros_dir
         self.macros: Dict[str, Macro] = {}
         
+        # 目錄快照（用於增量重新掃描）
+        self._lock = threading.RLock()
+        self._snapshots: Dict[str, FileSnapshot] = {}
+        self._file_macros: Dict[str, str] = {}  # 檔名 -> 巨集名稱
+        self._failed_files: Dict[str, FileSnapshot] = {}
+        self._loaded = False
+        
+        # 背景儲存佇列（合併重複儲存、原子寫入）
+        self._persistence = PersistenceWorker()
+        
         # 確保目錄存在
         os.makedirs(self.macros_dir, exist_ok=True)
         
         # 載入所有巨集
-        self.load_all()
+        if load:
+            self.load_all()
     
-    def save_macro(self, macro: Macro) -> bool:
-        """儲存巨集到檔案"""
-        try:
-            # 清理檔名
-            safe_name = self._sanitize_filename(macro.name)
-            filepath = os.path.join(self.macros_dir, f"{safe_name}.json")
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(macro.to_dict(), f, ensure_ascii=False, indent=2)
-            
+    def _macro_path(self, name: str) -> str:
+        """巨集名稱對應的檔案路徑"""
+        safe_name = self._sanitize_filename(name)
+        return os.path.join(self.macros_dir, f"{safe_name}.json")
+    
+    def _write_macro(self, data: dict, filepath: str, old_filepath: Optional[str] = None):
+        """
+        寫入巨集檔案（交易式）
+        先原子寫入新檔案，成功後才移除舊檔案，任何一步失敗都不會遺失資料
+        """
+        with self._lock:
+            atomic_write_json(filepath, data)
+            self._record_file(filepath, data["name"])
+            if old_filepath and os.path.normcase(old_filepath) != os.path.normcase(filepath):
+                self._remove_file(old_filepath)
+    
+    def _remove_stale_file(self, old_name: str, filepath: str):
+        """移除改名前的檔案；這段期間又有巨集使用舊名稱時保留"""
+        with self._lock:
+            if old_name not in self.macros:
+                self._remove_file(filepath)
+    
+    def _remove_file(self, filepath: str):
+        """移除巨集檔案（改名前的舊檔案）"""
+        with self._lock:
+            if os.path.exists(filepath):
+                os.remove(filepath)
+            self._forget_file(filepath)
+    
+    def _record_file(self, filepath: str, name: str):
+        """記錄自己寫入的檔案快照，避免重新掃描時把它當成外部變更"""
+        filename = os.path.basename(filepath)
+        self._snapshots[filename] = self._stat_snapshot(os.stat(filepath))
+        self._file_macros[filename] = name
+    
+    def _forget_file(self, filepath: str):
+        filename = os.path.basename(filepath)
+        self._snapshots.pop(filename, None)
+        self._file_macros.pop(filename, None)
+    
+    def _rekey_macro(self, macro: Macro, old_name: Optional[str]):
+        """更新記憶體中的名稱索引"""
+        with self._lock:
+            if old_name and old_name != macro.name and self.macros.get(old_name) is macro:
+                del self.macros[old_name]
             self.macros[macro.name] = macro
+    
+    def save_macro(self, macro: Macro, old_name: Optional[str] = None) -> bool:
+        """
+        儲存巨集到檔案（同步）
+        old_name: 若巨集已改名，傳入舊名稱以在同一個操作中移除舊檔案
+        """
+        try:
+            if old_name and old_name != macro.name:
+                conflict = self.name_conflict(macro, macro.name)
+                if conflict is not None:
+                    raise ValueError(f"巨集名稱已存在: {conflict}")
+            filepath = self._macro_path(macro.name)
+            old_filepath = self._macro_path(old_name) if old_name else None
+            self._write_macro(macro.to_dict(), filepath, old_filepath)
+            self._rekey_macro(macro, old_name)
             return True
         
         except Exception as e:
             print(f"儲存巨集失敗: {e}")
             return False
     
+    def save_macro_async(self, macro: Macro, old_name: Optional[str] = None,
+                         callback: Optional[Callable[[bool], None]] = None) -> bool:
+        """
+        在背景儲存巨集
+        記憶體中的資料立即更新；檔案寫入交給儲存佇列，同一巨集的連續儲存會被合併。
+        callback(success) 會在背景執行緒中呼叫，GUI 需自行轉回主執行緒。
+        改名的目標已屬於其他巨集時不做任何變更並返回 False（不會呼叫 callback）
+        """
+        if old_name and old_name != macro.name:
+            conflict = self.name_conflict(macro, macro.name)
+            if conflict is not None:
+                print(f"儲存巨集失敗: 巨集名稱已存在: {conflict}")
+                return False
+        filepath = self._macro_path(macro.name)
+        old_filepath = self._macro_path(old_name) if old_name else None
+        # 在呼叫端執行緒取得快照，避免背景寫入時資料被編輯
+        data = macro.to_dict()
+        self._rekey_macro(macro, old_name)
+        # 佇列的鍵使用 normcase 後的路徑：不分大小寫的檔案系統上只差大小寫的名稱是同一個檔案
+        self._persistence.submit(os.path.normcase(filepath), lambda: self._write_macro(data, filepath),
+                                 callback=callback,
+                                 replaces=os.path.normcase(old_filepath) if old_filepath else None,
+                                 remove_old=lambda: self._remove_stale_file(old_name, old_filepath))
+        return True
+    
+    def name_conflict(self, macro: Macro, name: str) -> Optional[str]:
+        """
+        其他巨集是否已使用此名稱（或名稱對應到同一個檔案），返回該巨集的名稱
+        改名前用來確認不會覆寫其他巨集
+        """
+        path = os.path.normcase(self._macro_path(name))
+        with self._lock:
+            other = self.macros.get(name)
+            if other is not None and other is not macro:
+                return name
+            for other_name, other in self.macros.items():
+                if other is not macro and os.path.normcase(self._macro_path(other_name)) == path:
+                    return other_name
+        return None
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待所有背景儲存完成"""
+        return self._persistence.flush(timeout)
+    
+    def close(self):
+        """寫入剩餘資料並停止背景儲存"""
+        self._persistence.stop()
+    
     def load_macro(self, name: str) -> Optional[Macro]:
         """載入指定巨集"""
-        safe_name = self._sanitize_filename(name)
-        filepath = os.path.join(self.macros_dir, f"{safe_name}.json")
+        filepath = self._macro_path(name)
         
         try:
             with open(filepath, 'r', encoding='utf-8') as f:
@@ -58,36 +187,137 @@ class MacroManager:
             return None
     
     def load_all(self) -> List[Macro]:
-        """載入所有巨集"""
-        self.macros.clear()
+        """載入所有巨集（完成後一次替換，讀取端不會看到空的巨集庫）"""
+        with self._lock:
+            snapshots = self._scan_directory()
+            macros: Dict[str, Macro] = {}
+            file_macros: Dict[str, str] = {}
+            
+            for filename in list(snapshots):
+                try:
+                    macro = self._read_macro_file(filename)
+                except Exception as e:
+                    print(f"載入 {filename} 失敗: {e}")
+                    self._failed_files[filename] = snapshots.pop(filename)
+                    continue
+                macros[macro.name] = macro
+                file_macros[filename] = macro.name
+            
+            self.macros = macros
+            self._snapshots = snapshots
+            self._file_macros = file_macros
+            self._loaded = True
         
-        if not os.path.exists(self.macros_dir):
-            return []
+        return list(macros.values())
+    
+    def ensure_loaded(self):
+        """尚未載入時載入所有巨集"""
+        if not self._loaded:
+            self.load_all()
+    
+    def rescan(self) -> LibraryChange:
+        """
+        增量重新掃描巨集目錄
+        只重新載入 mtime/size/inode 有變化的檔案，結果一次替換到 self.macros
+        """
+        change = LibraryChange()
         
-        for filename in os.listdir(self.macros_dir):
-            if filename.endswith('.json'):
-                filepath = os.path.join(self.macros_dir, filename)
+        with self._lock:
+            current = self._scan_directory()
+            macros = dict(self.macros)
+            file_macros = dict(self._file_macros)
+            
+            # 已被移除的檔案
+            for filename in self._snapshots.keys() - current.keys():
+                name = file_macros.pop(filename, None)
+                if name is not None and name in macros:
+                    change.removed.append(macros.pop(name))
+            
+            # 新增或修改的檔案
+            for filename, snapshot in list(current.items()):
+                if self._snapshots.get(filename) == snapshot:
+                    continue
+                if self._failed_files.get(filename) == snapshot:
+                    # 上次載入失敗且檔案沒變，不重複嘗試
+                    del current[filename]
+                    continue
+                
                 try:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                    macro = Macro.from_dict(data)
-                    self.macros[macro.name] = macro
+                    macro = self._read_macro_file(filename)
                 except Exception as e:
+                    # 可能是外部工具尚未寫完，保留舊快照以便下次重試
                     print(f"載入 {filename} 失敗: {e}")
+                    self._failed_files[filename] = snapshot
+                    if filename in self._snapshots:
+                        current[filename] = self._snapshots[filename]
+                    else:
+                        del current[filename]
+                    continue
+                self._failed_files.pop(filename, None)
+                
+                old_name = file_macros.get(filename)
+                old = macros.pop(old_name, None) if old_name is not None else None
+                macros[macro.name] = macro
+                file_macros[filename] = macro.name
+                if old is not None:
+                    change.changed.append((old, macro))
+                else:
+                    change.added.append(macro)
+            
+            if change:
+                self.macros = macros
+            self._snapshots = current
+            self._file_macros = file_macros
         
-        return list(self.macros.values())
+        return change
+    
+    def _scan_directory(self) -> Dict[str, FileSnapshot]:
+        """取得目錄中所有巨集檔案的快照"""
+        snapshots: Dict[str, FileSnapshot] = {}
+        try:
+            entries = os.scandir(self.macros_dir)
+        except FileNotFoundError:
+            return snapshots
+        
+        with entries:
+            for entry in entries:
+                if entry.name.endswith('.json') and entry.is_file():
+                    try:
+                        snapshots[entry.name] = self._stat_snapshot(entry.stat())
+                    except OSError:
+                        pass
+        return snapshots
+    
+    @staticmethod
+    def _stat_snapshot(st: os.stat_result) -> FileSnapshot:
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+    
+    def _read_macro_file(self, filename: str) -> Macro:
+        filepath = os.path.join(self.macros_dir, filename)
+        with open(filepath, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return Macro.from_dict(data)
     
     def delete_macro(self, name: str) -> bool:
         """刪除巨集"""
         try:
-            safe_name = self._sanitize_filename(name)
-            filepath = os.path.join(self.macros_dir, f"{safe_name}.json")
+            filepath = self._macro_path(name)
             
-            if os.path.exists(filepath):
-                os.remove(filepath)
+            with self._lock:
+                if name in self.macros:
+                    del self.macros[name]
+            
+            def remove():
+                with self._lock:
+                    if os.path.exists(filepath):
+                        os.remove(filepath)
+                    self._forget_file(filepath)
             
-            if name in self.macros:
-                del self.macros[name]
+            if self._persistence.has_pending():
+                # 排在尚未完成的儲存之後，避免被舊的寫入重新建立
+                self._persistence.submit(os.path.normcase(filepath), remove, delay=0)
+            else:
+                remove()
             
             return True
         
@@ -106,11 +336,11 @@ class MacroManager:
         macro = self.macros[old_name]
         macro.name = new_name
         
-        # 刪除舊檔案
-        self.delete_macro(old_name)
-        
-        # 儲存新檔案
-        return self.save_macro(macro)
+        # 寫入新檔案後才移除舊檔案
+        if not self.save_macro(macro, old_name=old_name):
+            macro.name = old_name
+            return False
+        return True
     
     def get_macro(self, name: str) -> Optional[Macro]:
         """獲取巨集"""
@@ -120,6 +350,39 @@ class MacroManager:
         """獲取所有巨集"""
         return list(self.macros.values())
     
+    def find_name_by_id(self, macro_id: str) -> Optional[str]:
+        """依 id 尋找巨集名稱"""
+        for macro in list(self.macros.values()):
+            if macro.id == macro_id:
+                return macro.name
+        return None
+    
+    def get_macro_by_id(self, macro_id: str) -> Optional[Macro]:
+        """依 id 獲取巨集（呼叫事件的參照不隨改名失效）"""
+        name = self.find_name_by_id(macro_id)
+        return self.get_macro(name) if name is not None else None
+    
+    def unique_id(self, macro_id: str) -> str:
+        """id 已被其他巨集使用時（例如重複匯入同一個檔案）改用新的 id"""
+        return new_macro_id() if self.find_name_by_id(macro_id) is not None else macro_id
+    
+    def has_macro(self, name: str) -> bool:
+        """巨集名稱是否已存在"""
+        return name in self.macros
+    
+    def get_all_names(self) -> List[str]:
+        """獲取所有巨集名稱"""
+        return list(self.macros)
+    
+    def get_info(self, name: str) -> Optional[MacroInfo]:
+        """獲取巨集摘要"""
+        macro = self.macros.get(name)
+        return macro.to_info() if macro else None
+    
+    def get_all_infos(self) -> List[MacroInfo]:
+        """獲取所有巨集摘要"""
+        return [m.to_info() for m in list(self.macros.values())]
+    
     def _sanitize_filename(self, name: str) -> str:
         """清理檔名，移除不合法字元"""
         invalid_chars = '<>:"/\\|?*'
@@ -128,33 +391,29 @@ class MacroManager:
         return name
     
     def export_macro(self, name: str, filepath: str) -> bool:
-        """匯出巨集到指定位置"""
-        if name not in self.macros:
+        """匯出巨集到指定位置（.gz / .xz 副檔名會自動壓縮）"""
+        macro = self.get_macro(name)
+        if macro is None:
             return False
         
         try:
-            macro = self.macros[name]
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(macro.to_dict(), f, ensure_ascii=False, indent=2)
+            write_macro_file(filepath, macro)
             return True
         except Exception as e:
             print(f"匯出巨集失敗: {e}")
             return False
     
-    def import_macro(self, filepath: str) -> Optional[Macro]:
-        """從檔案匯入巨集"""
+    def import_macro(self, filepath: str, progress: Optional[ProgressCallback] = None) -> Optional[Macro]:
+        """
+        從檔案匯入巨集（支援 gzip/xz 壓縮）
+        事件以串流方式分批解析，不會先把整份 JSON 載入記憶體
+        """
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            macro = Macro.from_dict(data)
+            macro = load_macro_file(filepath, progress)
             
             # 如果名稱重複，添加後綴
-            original_name = macro.name
-            counter = 1
-            while macro.name in self.macros:
-                macro.name = f"{original_name} ({counter})"
-                counter += 1
+            macro.name = self._unique_name(macro.name)
+            macro.id = self.unique_id(macro.id)
             
             self.save_macro(macro)
             return macro
@@ -162,3 +421,40 @@ class MacroManager:
         except Exception as e:
             print(f"匯入巨集失敗: {e}")
             return None
+    
+    def _unique_name(self, name: str) -> str:
+        """名稱重複時添加 (n) 後綴"""
+        return self.unique_names([name])[0]
+    
+    def unique_names(self, names: List[str]) -> List[str]:
+        """
+        一次處理多個名稱的衝突
+        與現有巨集及清單內彼此重複的名稱會添加 (n) 後綴，每個基底名稱記住下一個編號
+        """
+        taken = set(self.get_all_names())
+        next_counter: Dict[str, int] = {}
+        result = []
+        for name in names:
+            unique = name
+            if unique in taken:
+                counter = next_counter.get(name, 1)
+                while f"{name} ({counter})" in taken:
+                    counter += 1
+                unique = f"{name} ({counter})"
+                next_counter[name] = counter + 1
+            taken.add(unique)
+            result.append(unique)
+        return result
+    
+    def export_bundle(self, names: List[str], filepath: str,
+                      progress: Optional[ProgressCallback] = None) -> int:
+        """匯出多個巨集為巨集包，返回匯出數量"""
+        return export_bundle(self, names, filepath, progress)
+    
+    def import_bundle(self, filepath: str, progress: Optional[ProgressCallback] = None) -> List[Macro]:
+        """從巨集包匯入巨集（不是巨集包或無法讀取時拋出例外）"""
+        return import_bundle(self, filepath, progress)
+    
+    def import_macros(self, macros: List[Macro]) -> List[Macro]:
+        """批次儲存多個新巨集，返回成功儲存的巨集"""
+        return [macro for macro in macros if self.save_macro(macro)]
@@ -0,0 +1,222 @@
+"""
+巨集最佳化 - 精簡錄製結果但不改變送出的輸入與時間表
+每個步驟都保持「每個輸入在累計延遲的哪個時間點送出」不變：
+被移除事件的延遲一律轉移到下一個事件上；
+重複區塊的開始/結束標記是邊界，各步驟只在兩個標記之間的片段內進行
+"""
+import json
+from dataclasses import dataclass, field, replace
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from .recorder import EventType, MacroEvent, match_blocks
+
+
+# 短於此長度的延遲事件併入下一個事件的延遲
+MIN_DELAY = 0.001
+
+
+@dataclass
+class OptimizationReport:
+    """最佳化結果統計"""
+    events_before: int = 0
+    events_after: int = 0
+    bytes_before: int = 0  # JSON 序列化後的估計大小
+    bytes_after: int = 0
+    removed: Dict[str, int] = field(default_factory=dict)  # 步驟名稱 -> 減少的事件數
+
+    @property
+    def changed(self) -> bool:
+        return any(self.removed.values())
+
+    @property
+    def reduction(self) -> float:
+        """事件數減少的比例（0~1）"""
+        return 1 - self.events_after / self.events_before if self.events_before else 0.0
+
+    def summary(self) -> str:
+        lines = [f"事件 {self.events_before} → {self.events_after}（減少 {self.reduction:.0%}），"
+                 f"大小 {self.bytes_before / 1024:.1f} KB → {self.bytes_after / 1024:.1f} KB"]
+        for name, count in self.removed.items():
+            if count:
+                lines.append(f"  {name}: -{count}")
+        return "\n".join(lines)
+
+
+def _carry_into(events: List[MacroEvent], carry: float, event: MacroEvent) -> None:
+    events.append(replace(event, delay=event.delay + carry) if carry else event)
+
+
+def _finish(events: List[MacroEvent], carry: float) -> List[MacroEvent]:
+    """結尾剩下的延遲仍需保留（影響循環間隔）"""
+    if carry > 0:
+        events.append(MacroEvent(EventType.DELAY, 0, delay=carry))
+    return events
+
+
+def _is_noop(event: MacroEvent) -> bool:
+    if event.event_type == EventType.MOUSE_MOVE:
+        return True  # 播放器不執行滑鼠移動
+    if event.event_type == EventType.MOUSE_SCROLL:
+        return not event.scroll_dx and not event.scroll_dy
+    if event.event_type == EventType.TEXT:
+        return not event.text
+    if event.event_type == EventType.CALL:
+        return not event.call_id or event.count <= 0
+    return False
+
+
+def drop_noops(events: Sequence[MacroEvent]) -> List[MacroEvent]:
+    """移除播放時不產生輸入的事件（滑鼠移動、零位移滾動、空白文字、不執行的呼叫）"""
+    result: List[MacroEvent] = []
+    carry = 0.0
+    for event in events:
+        if _is_noop(event):
+            carry += event.delay
+            continue
+        _carry_into(result, carry, event)
+        carry = 0.0
+    return _finish(result, carry)
+
+
+def merge_delays(events: Sequence[MacroEvent], min_delay: float = MIN_DELAY) -> List[MacroEvent]:
+    """合併相鄰的延遲事件；合併後仍短於 min_delay 的延遲併入下一個事件"""
+    result: List[MacroEvent] = []
+    pending = 0.0  # 連續延遲事件的總和
+    for event in events:
+        if event.event_type == EventType.DELAY:
+            pending += event.delay
+            continue
+        if pending >= min_delay:
+            result.append(MacroEvent(EventType.DELAY, event.timestamp - pending, delay=pending))
+            pending = 0.0
+        _carry_into(result, pending, event)
+        pending = 0.0
+    return _finish(result, pending)
+
+
+def _same_direction(a: Tuple[int, int], b: Tuple[int, int]) -> bool:
+    return a[0] * b[0] >= 0 and a[1] * b[1] >= 0
+
+
+def _scroll_delta(event: MacroEvent) -> Tuple[int, int]:
+    return event.scroll_dx or 0, event.scroll_dy or 0
+
+
+def coalesce_scrolls(events: Sequence[MacroEvent]) -> List[MacroEvent]:
+    """緊接著（中間沒有延遲）且方向相同的連續滾動合併為一個，位移相加"""
+    result: List[MacroEvent] = []
+    for event in events:
+        if (event.event_type == EventType.MOUSE_SCROLL and event.delay == 0 and result
+                and result[-1].event_type == EventType.MOUSE_SCROLL):
+            last, delta = _scroll_delta(result[-1]), _scroll_delta(event)
+            if _same_direction(last, delta):
+                result[-1] = replace(result[-1], scroll_dx=last[0] + delta[0], scroll_dy=last[1] + delta[1])
+                continue
+        result.append(event)
+    return result
+
+
+def fold_taps(events: Sequence[MacroEvent]) -> List[MacroEvent]:
+    """按下後緊接著（沒有延遲）放開同一個鍵，合併為一個點按事件"""
+    result: List[MacroEvent] = []
+    for event in events:
+        if (event.event_type == EventType.KEY_RELEASE and event.delay == 0 and result
+                and result[-1].event_type == EventType.KEY_PRESS and result[-1].key == event.key):
+            result[-1] = replace(result[-1], event_type=EventType.KEY_TAP)
+            continue
+        result.append(event)
+    return result
+
+
+# 依序執行的步驟：(名稱, 函式)
+PASSES: List[Tuple[str, Callable[[Sequence[MacroEvent]], List[MacroEvent]]]] = [
+    ("移除無作用事件", drop_noops),
+    ("合併延遲", merge_delays),
+    ("合併滾動", coalesce_scrolls),
+    ("合併按鍵點按", fold_taps),
+]
+
+
+def _json_size(events: Sequence[MacroEvent]) -> int:
+    return sum(len(json.dumps(e.to_dict(), ensure_ascii=False)) + 2 for e in events)
+
+
+_BLOCK_MARKERS = (EventType.REPEAT, EventType.REPEAT_END)
+
+
+def _by_segment(step: Callable[[Sequence[MacroEvent]], List[MacroEvent]],
+                events: Sequence[MacroEvent]) -> List[MacroEvent]:
+    """在重複區塊標記之間的每個片段分別執行步驟（延遲不會跨過標記移動，區塊結構不變）"""
+    result: List[MacroEvent] = []
+    segment_start = 0
+    for i, event in enumerate(events):
+        if event.event_type in _BLOCK_MARKERS:
+            result.extend(step(events[segment_start:i]))
+            result.append(event)
+            segment_start = i + 1
+    result.extend(step(events[segment_start:]))
+    return result
+
+
+def optimize_events(events: Sequence[MacroEvent]) -> Tuple[List[MacroEvent], OptimizationReport]:
+    """執行所有最佳化步驟，返回 (新事件清單, 統計)；未修改的事件物件原樣沿用"""
+    report = OptimizationReport(events_before=len(events), bytes_before=_json_size(events))
+    result = list(events)
+    for name, step in PASSES:
+        before = len(result)
+        result = _by_segment(step, result)
+        report.removed[name] = before - len(result)
+    report.events_after = len(result)
+    report.bytes_after = _json_size(result)
+    return result, report
+
+
+def input_schedule(events: Sequence[MacroEvent]) -> List[Tuple[float, str, object]]:
+    """
+    事件清單送出的輸入時間表 [(累計延遲, 動作, 參數)]，用來驗證最佳化沒有改變播放結果
+    點按展開為按下+放開，滾動以總位移比較，重複區塊依次數展開
+    """
+    schedule: List[Tuple[float, str, object]] = []
+    time = _schedule_range(events, match_blocks(events), 0, len(events), 0.0, schedule)
+    schedule.append((time, "end", None))
+    return schedule
+
+
+def _schedule_range(events: Sequence[MacroEvent], blocks: Dict[int, int], start: int, end: int,
+                    time: float, schedule: List[Tuple[float, str, object]]) -> float:
+    i = start
+    while i < end:
+        event = events[i]
+        time += event.delay
+        kind = event.event_type
+        if kind == EventType.REPEAT:
+            block_end = min(blocks[i] + 1, end)
+            for n in range(event.count):
+                if n:
+                    time += event.gap
+                time = _schedule_range(events, blocks, i + 1, block_end, time, schedule)
+            i = block_end
+            continue
+        if kind == EventType.KEY_TAP:
+            schedule.append((time, "press", event.key))
+            schedule.append((time, "release", event.key))
+        elif kind == EventType.KEY_PRESS:
+            schedule.append((time, "press", event.key))
+        elif kind == EventType.KEY_RELEASE:
+            schedule.append((time, "release", event.key))
+        elif kind in (EventType.MOUSE_CLICK, EventType.MOUSE_RELEASE):
+            schedule.append((time, kind.value, event.button))
+        elif kind == EventType.MOUSE_SCROLL and (event.scroll_dx or event.scroll_dy):
+            delta = _scroll_delta(event)
+            if (schedule and schedule[-1][0] == time and schedule[-1][1] == "scroll"
+                    and _same_direction(schedule[-1][2], delta)):
+                _, _, (dx, dy) = schedule.pop()
+                delta = (dx + delta[0], dy + delta[1])
+            schedule.append((time, "scroll", delta))
+        elif kind == EventType.TEXT and event.text:
+            schedule.append((time, "text", (event.text, event.char_delay)))
+            time += event.duration
+        elif kind == EventType.CALL and event.call_id and event.count > 0:
+            schedule.append((time, "call", (event.call_id, event.count)))
+        i += 1
+    return time
@@ -0,0 +1,200 @@
+"""
+儲存佇列 - 在背景執行緒中合併並寫入巨集檔案
+"""
+import io
+import os
+import json
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import BinaryIO, Callable, Dict, List, Optional
+
+
+def atomic_write_json(filepath: str, data: dict, indent: Optional[int] = 2):
+    """
+    以原子方式寫入 JSON 檔案
+    先寫入同目錄的暫存檔並 fsync，再以 os.replace 取代目標檔案，
+    中途當機時舊檔案仍保持完整
+    """
+    def write(f: BinaryIO):
+        text = io.TextIOWrapper(f, encoding='utf-8')
+        json.dump(data, text, ensure_ascii=False, indent=indent)
+        text.flush()
+        text.detach()
+
+    atomic_write(filepath, write)
+
+
+def atomic_write(filepath: str, write: Callable[[BinaryIO], None]):
+    """以原子方式寫入檔案，write 接收二進位檔案物件"""
+    directory = os.path.dirname(os.path.abspath(filepath))
+    fd, tmp_path = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    _fsync_directory(directory)
+
+
+def _fsync_directory(directory: str):
+    """同步目錄項目，確保 rename 本身也已落盤（Windows 不支援，忽略）"""
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+
+@dataclass
+class SaveJob:
+    """待寫入的儲存工作"""
+    key: str
+    write: Callable[[], None]  # 實際寫入動作，失敗時拋出例外
+    due_time: float
+    callbacks: List[Callable[[bool], None]] = field(default_factory=list)
+    # 寫入成功後要移除的舊鍵資料（舊鍵 -> 移除動作），被取代的工作的移除動作也會轉移到這裡
+    removals: Dict[str, Callable[[], None]] = field(default_factory=dict)
+
+
+class PersistenceWorker:
+    """
+    背景儲存工作者
+    同一個 key 在防抖時間內的重複儲存只會寫入最後一次的內容，
+    完成後以 callback(success) 通知呼叫端（在工作者執行緒中呼叫）
+    """
+
+    def __init__(self, debounce: float = 0.3):
+        self.debounce = debounce
+        self._pending: Dict[str, SaveJob] = {}
+        self._in_progress: Optional[str] = None
+        self._cond = threading.Condition()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, key: str, write: Callable[[], None],
+               callback: Optional[Callable[[bool], None]] = None,
+               replaces: Optional[str] = None, delay: Optional[float] = None,
+               remove_old: Optional[Callable[[], None]] = None):
+        """
+        提交儲存工作
+        key: 合併用的鍵（通常是目標檔案路徑）
+        write: 寫入函數，會在背景執行緒中執行
+        replaces: 被此工作取代的舊鍵（例如重新命名前的路徑），其待處理工作會被撤銷
+        delay: 自訂防抖時間，None 表示使用預設值
+        remove_old: 寫入成功後移除舊鍵資料的動作（例如刪除改名前的檔案）；
+            舊鍵的工作被撤銷時，它尚未執行的移除動作由此工作接手，連續改名也不會留下更早的檔案
+        """
+        with self._cond:
+            due = time.monotonic() + (self.debounce if delay is None else delay)
+            inherited: List[Callable[[bool], None]] = []
+            removals: Dict[str, Callable[[], None]] = {}
+            if replaces and replaces != key:
+                superseded = self._pending.pop(replaces, None)
+                if superseded:
+                    inherited = superseded.callbacks
+                    removals.update(superseded.removals)
+                if remove_old:
+                    removals[replaces] = remove_old
+            job = self._pending.get(key)
+            if job:
+                # 合併：保留較早的回調，改用最新的寫入內容並重新計時
+                job.write = write
+                job.due_time = due
+            else:
+                job = SaveJob(key=key, write=write, due_time=due)
+                self._pending[key] = job
+            job.callbacks.extend(inherited)
+            job.removals.update(removals)
+            job.removals.pop(key, None)  # 改回原本的名稱時不能移除剛寫入的資料
+            if callback:
+                job.callbacks.append(callback)
+            self._cond.notify()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """立即寫入所有待處理的工作並等待完成"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            for job in self._pending.values():
+                job.due_time = 0.0
+            self._cond.notify()
+            while self._pending or self._in_progress:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        """寫入剩餘工作並停止工作者"""
+        self.flush(timeout)
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join(timeout)
+
+    def has_pending(self) -> bool:
+        """是否還有尚未寫入的工作"""
+        with self._cond:
+            return bool(self._pending or self._in_progress)
+
+    def _next_job(self) -> Optional[SaveJob]:
+        """等待下一個到期的工作"""
+        with self._cond:
+            while self._running:
+                if self._pending:
+                    job = min(self._pending.values(), key=lambda j: j.due_time)
+                    wait = job.due_time - time.monotonic()
+                    if wait <= 0:
+                        del self._pending[job.key]
+                        self._in_progress = job.key
+                        return job
+                    self._cond.wait(wait)
+                else:
+                    self._cond.wait()
+            return None
+
+    def _run(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                break
+
+            try:
+                job.write()
+                success = True
+            except Exception as e:
+                print(f"背景儲存失敗 ({job.key}): {e}")
+                success = False
+
+            # 寫入失敗時保留舊資料
+            if success:
+                for old_key, remove in job.removals.items():
+                    try:
+                        remove()
+                    except Exception as e:
+                        print(f"移除舊資料失敗 ({old_key}): {e}")
+
+            for callback in job.callbacks:
+                try:
+                    callback(success)
+                except Exception as e:
+                    print(f"儲存回調錯誤: {e}")
+
+            with self._cond:
+                self._in_progress = None
+                self._cond.notify_all()
@@ -3,34 +3,55 @@
 """
 import time
 import threading
-from typing import Optional, Callable
-from pynput import keyboard, mouse
-from pynput.keyboard import Key, Controller as KeyboardController
-from pynput.mouse import Button, Controller as MouseController
+from typing import Dict, Optional, Callable, Sequence
 
-from .recorder import Macro, MacroEvent, EventType
+from .recorder import Macro, MacroEvent, EventType, match_blocks
+from .input_state import InputState, KeyTable
+
+
+# 送出輸入後的等待時間（秒），確保目標程式辨識到按鍵/點擊
+SETTLE_TIME = {
+    EventType.KEY_PRESS: 0.005,
+    EventType.KEY_RELEASE: 0.005,
+    EventType.KEY_TAP: 0.005,
+    EventType.MOUSE_CLICK: 0.005,
+    EventType.MOUSE_RELEASE: 0.005,
+    EventType.MOUSE_SCROLL: 0.01,
+    EventType.TEXT: 0.005,
+}
 
 
 class MacroPlayer:
     """巨集播放器"""
     
     def __init__(self):
-        self.keyboard = KeyboardController()
-        self.mouse = MouseController()
+        # pynput 與輸入控制器在第一次播放時才載入（加快程式啟動）
+        self._keyboard = None
+        self._mouse = None
         
         self.is_playing = False
         self.is_paused = False
         self._stop_requested = False
         self._play_thread: Optional[threading.Thread] = None
         
-        # 追蹤目前按住的按鍵和滑鼠按鈕（用於緊急停止時釋放）
-        self._pressed_keys: set = set()
-        self._pressed_buttons: set = set()
+        # 播放進度（GUI 以固定頻率讀取，播放執行緒只做屬性指派）
+        self.current_macro: Optional[Macro] = None
+        self.current_index: int = -1  # 最後執行完成的事件索引（-1 表示本輪尚未開始）
+        self.current_loop: int = 0  # 已完成的循環次數
+        
+        # 目前按住的按鍵和滑鼠按鈕（停止時只釋放這些；按鍵字串只解析一次）
+        self.key_table = KeyTable(self._parse_key, self._parse_mouse_button)
+        self.input_state = InputState()
         
         # 播放設定
         self.speed_multiplier: float = 1.0  # 播放速度倍率
         self.ignore_delays: bool = False  # 是否忽略延遲
         
+        # 解析呼叫事件：傳入要播放的巨集，返回 {被呼叫巨集 id: 展開後的事件}（通常是 PlanCompiler.link）
+        # 未設定時呼叫事件會被略過
+        self.plan_provider: Optional[Callable[[Macro], Dict[str, Sequence[MacroEvent]]]] = None
+        self._calls: Dict[str, Sequence[MacroEvent]] = {}
+        
         # 回調函數
         self.on_play_started: Optional[Callable[[Macro], None]] = None
         self.on_play_stopped: Optional[Callable[[], None]] = None
@@ -38,15 +59,33 @@ class MacroPlayer:
         self.on_loop_completed: Optional[Callable[[int], None]] = None
         self.on_emergency_stop: Optional[Callable[[], None]] = None
         
-        # 停止播放的快捷鍵
-        self.stop_key = keyboard.Key.f10
-        self._keyboard_listener: Optional[keyboard.Listener] = None
+        # 停止播放的快捷鍵（None 表示 F10）
+        self.stop_key = None
+        self._keyboard_listener = None
+    
+    @property
+    def keyboard(self):
+        """鍵盤控制器（首次使用時建立）"""
+        if self._keyboard is None:
+            from pynput.keyboard import Controller
+            self._keyboard = Controller()
+        return self._keyboard
+    
+    @property
+    def mouse(self):
+        """滑鼠控制器（首次使用時建立）"""
+        if self._mouse is None:
+            from pynput.mouse import Controller
+            self._mouse = Controller()
+        return self._mouse
     
     def _parse_key(self, key_str: str):
         """解析按鍵字串為 pynput Key 對象"""
         if not key_str:
             return None
             
+        from pynput.keyboard import Key
+        
         # 移除 Key. 前綴
         if key_str.startswith("Key."):
             key_name = key_str[4:]
@@ -97,8 +136,9 @@ class MacroPlayer:
         except AttributeError:
             return key_str
     
-    def _parse_mouse_button(self, button_str: str) -> Button:
+    def _parse_mouse_button(self, button_str: str):
         """解析滑鼠按鈕字串"""
+        from pynput.mouse import Button
         if "left" in button_str.lower():
             return Button.left
         elif "right" in button_str.lower():
@@ -107,85 +147,155 @@ class MacroPlayer:
             return Button.middle
         return Button.left
     
+    def send_event(self, event: MacroEvent):
+        """送出單個事件的輸入（不含延遲與辨識等待；可能拋出例外）"""
+        # DELAY 事件不需要執行動作，只需等待（由播放循環處理）
+        if event.event_type == EventType.KEY_PRESS:
+            slot = self.key_table.key_slot(event.key)
+            self.input_state.press(slot)  # 先記錄再送出，停止時才不會漏掉
+            self.keyboard.press(self.key_table.resolved(slot))
+        
+        elif event.event_type == EventType.KEY_RELEASE:
+            slot = self.key_table.key_slot(event.key)
+            self.input_state.release(slot)
+            self.keyboard.release(self.key_table.resolved(slot))
+        
+        elif event.event_type == EventType.KEY_TAP:
+            # 按下與放開之間的間隔與分開的兩個事件相同
+            key = self.key_table.resolved(self.key_table.key_slot(event.key))
+            self.keyboard.press(key)
+            try:
+                time.sleep(SETTLE_TIME[EventType.KEY_PRESS])
+            finally:
+                self.keyboard.release(key)
+        
+        elif event.event_type == EventType.TEXT:
+            if event.text:
+                char_delay = 0.0 if self.ignore_delays else event.char_delay / self.speed_multiplier
+                self.type_text(event.text, char_delay)
+        
+        elif event.event_type == EventType.MOUSE_CLICK:
+            # 直接在當前位置點擊，不移動
+            slot = self.key_table.button_slot(event.button)
+            self.input_state.press(slot)
+            self.mouse.press(self.key_table.resolved(slot))
+        
+        elif event.event_type == EventType.MOUSE_RELEASE:
+            # 直接在當前位置釋放
+            slot = self.key_table.button_slot(event.button)
+            self.input_state.release(slot)
+            self.mouse.release(self.key_table.resolved(slot))
+        
+        elif event.event_type == EventType.MOUSE_SCROLL:
+            # 直接滾動，不移動
+            if event.scroll_dx is not None and event.scroll_dy is not None:
+                self.mouse.scroll(event.scroll_dx, event.scroll_dy)
+        
+        # MOUSE_MOVE：忽略所有移動事件
+    
+    def type_text(self, text: str, char_delay: float = 0.0):
+        """
+        輸入一段文字；沒有字元間隔時整段交給控制器一次送出，
+        否則逐字送出並在字元之間等待（停止時中斷）
+        """
+        if char_delay <= 0:
+            self.keyboard.type(text)
+            return
+        for i, char in enumerate(text):
+            if i:
+                time.sleep(char_delay)
+                if self._stop_requested:
+                    break
+            self.keyboard.type(char)
+    
     def _execute_event(self, event: MacroEvent):
-        """執行單個事件"""
+        """執行單個事件，並等待目標程式辨識輸入"""
         try:
-            # DELAY 事件不需要執行動作，只需等待（在 _play_loop 中處理）
-            if event.event_type == EventType.DELAY:
+            self.send_event(event)
+            settle = SETTLE_TIME.get(event.event_type)
+            if settle:
+                time.sleep(settle)
+        except Exception as e:
+            print(f"執行事件時發生錯誤: {e}")
+    
+    def _wait_delay(self, event: MacroEvent):
+        if not self.ignore_delays and event.delay > 0:
+            time.sleep(event.delay / self.speed_multiplier)
+    
+    def _play_call(self, call: MacroEvent):
+        """播放呼叫事件：重複 count 次被呼叫巨集展開後的事件（進度停在呼叫事件上）"""
+        plan = self._calls.get(call.call_id)
+        if plan is None:
+            return
+        blocks = match_blocks(plan)
+        for _ in range(call.count):
+            if not self._play_range(plan, blocks, 0, len(plan)):
                 return
+    
+    def _play_range(self, events: Sequence[MacroEvent], blocks: Dict[int, int], start: int, end: int,
+                    track: bool = False) -> bool:
+        """
+        播放 events[start:end]，重複區塊直接重播區塊內的事件（不展開成副本）
+        track 為 True 時更新播放進度；被停止時返回 False
+        """
+        i = start
+        while i < end:
+            # 暫停處理
+            while self.is_paused and not self._stop_requested:
+                time.sleep(0.1)
             
-            if event.event_type == EventType.KEY_PRESS:
-                key = self._parse_key(event.key)
-                self._pressed_keys.add(key)  # 追蹤按住的按鍵
-                self.keyboard.press(key)
-                time.sleep(0.005)  # 5ms 確保按鍵被識別
-            
-            elif event.event_type == EventType.KEY_RELEASE:
-                key = self._parse_key(event.key)
-                self._pressed_keys.discard(key)  # 從追蹤中移除
-                self.keyboard.release(key)
-                time.sleep(0.005)  # 5ms 確保按鍵被識別
-            
-            elif event.event_type == EventType.MOUSE_CLICK:
-                # 直接在當前位置點擊，不移動
-                button = self._parse_mouse_button(event.button)
-                self._pressed_buttons.add(button)  # 追蹤按住的按鈕
-                self.mouse.press(button)
-                time.sleep(0.005)
+            if self._stop_requested:
+                return False
             
-            elif event.event_type == EventType.MOUSE_RELEASE:
-                # 直接在當前位置釋放
-                button = self._parse_mouse_button(event.button)
-                self._pressed_buttons.discard(button)  # 從追蹤中移除
-                self.mouse.release(button)
-                time.sleep(0.005)
+            event = events[i]
+            # 延遲處理
+            self._wait_delay(event)
             
-            elif event.event_type == EventType.MOUSE_MOVE:
-                pass # 忽略所有移動事件
+            if event.event_type == EventType.REPEAT:
+                self._mark_played(event, i, track)
+                block_end = min(blocks[i] + 1, end)  # 包含結束標記（它的延遲屬於每一輪）
+                for n in range(event.count):
+                    if n and event.gap > 0 and not self.ignore_delays:
+                        time.sleep(event.gap / self.speed_multiplier)
+                    if not self._play_range(events, blocks, i + 1, block_end, track):
+                        return False
+                i = block_end
+                continue
             
-            elif event.event_type == EventType.MOUSE_SCROLL:
-                # 直接滾動，不移動
-                if event.scroll_dx is not None and event.scroll_dy is not None:
-                    self.mouse.scroll(event.scroll_dx, event.scroll_dy)
-                time.sleep(0.01)
-        
-        except Exception as e:
-            print(f"執行事件時發生錯誤: {e}")
+            if event.event_type == EventType.CALL:
+                self._play_call(event)
+            else:
+                # 執行事件
+                self._execute_event(event)
+            self._mark_played(event, i, track)
+            i += 1
+        return not self._stop_requested
+    
+    def _mark_played(self, event: MacroEvent, index: int, track: bool):
+        if track:
+            self.current_index = index
+            if self.on_event_played:
+                self.on_event_played(event, index)
     
     def _play_loop(self, macro: Macro):
         """播放循環"""
         loop_count = macro.loop_count
         current_loop = 0
+        self.current_macro = macro
+        self.current_loop = 0
         
         while not self._stop_requested:
             # 檢查循環次數
             if loop_count > 0 and current_loop >= loop_count:
                 break
             
-            # 播放所有事件
-            for i, event in enumerate(macro.events):
-                if self._stop_requested:
-                    break
-                
-                # 暫停處理
-                while self.is_paused and not self._stop_requested:
-                    time.sleep(0.1)
-                
-                if self._stop_requested:
-                    break
-                
-                # 延遲處理
-                if not self.ignore_delays and event.delay > 0:
-                    delay = event.delay / self.speed_multiplier
-                    time.sleep(delay)
-                
-                # 執行事件
-                self._execute_event(event)
-                
-                if self.on_event_played:
-                    self.on_event_played(event, i)
+            self.current_index = -1
+            # 播放所有事件（每輪取事件清單的快照，區塊配對與播放內容一致）
+            events = list(macro.events)
+            self._play_range(events, match_blocks(events), 0, len(events), track=True)
             
             current_loop += 1
+            self.current_loop = current_loop
             
             if self.on_loop_completed:
                 self.on_loop_completed(current_loop)
@@ -211,15 +321,23 @@ class MacroPlayer:
             return False
     
     def play(self, macro: Macro):
-        """開始播放巨集"""
+        """
+        開始播放巨集
+        呼叫事件在開始前解析，無法解析（循環呼叫、找不到被呼叫的巨集）時拋出 CompileError，不會開始播放
+        """
+        calls = self.plan_provider(macro) if self.plan_provider else {}
         if self.is_playing:
             self.stop()
         
         self.is_playing = True
         self.is_paused = False
         self._stop_requested = False
+        self._calls = calls
         
         # 啟動停止鍵監聽
+        from pynput import keyboard
+        if self.stop_key is None:
+            self.stop_key = keyboard.Key.f10
         self._keyboard_listener = keyboard.Listener(on_press=self._on_key_press)
         self._keyboard_listener.start()
         
@@ -238,6 +356,14 @@ class MacroPlayer:
         # 停止時自動釋放按鍵，避免卡鍵
         self.release_all_keys()
     
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """等待播放執行緒結束，返回是否已結束"""
+        thread = self._play_thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+            return not thread.is_alive()
+        return True
+    
     def pause(self):
         """暫停播放"""
         if self.is_playing:
@@ -254,33 +380,26 @@ class MacroPlayer:
             self.is_paused = not self.is_paused
     
     def release_all_keys(self):
-        """釋放所有按住的按鍵和滑鼠按鈕"""
-        # 釋放所有追蹤的按鍵
-        for key in list(self._pressed_keys):
-            try:
-                self.keyboard.release(key)
-            except:
-                pass
-        self._pressed_keys.clear()
-        
-        # 釋放所有追蹤的滑鼠按鈕
-        for button in list(self._pressed_buttons):
-            try:
-                self.mouse.release(button)
-            except:
-                pass
-        self._pressed_buttons.clear()
-        
-        # 額外釋放常見的修飾鍵（以防萬一）
-        common_keys = [Key.ctrl, Key.ctrl_l, Key.ctrl_r,
-                       Key.alt, Key.alt_l, Key.alt_r,
-                       Key.shift, Key.shift_l, Key.shift_r,
-                       Key.cmd, Key.cmd_l, Key.cmd_r]
-        for key in common_keys:
-            try:
-                self.keyboard.release(key)
-            except:
-                pass
+        """
+        釋放所有按住的按鍵和滑鼠按鈕
+        只送出實際按住項目的放開事件；重複呼叫（例如停止後又緊急停止）不會再送出任何輸入
+        """
+        for slot in self.input_state.take():
+            self._release_slot(slot)
+    
+    def release_held(self, slot: int):
+        """釋放單一按鍵或按鈕（位元編號來自 key_table）；沒有按住時不送出任何輸入"""
+        if self.input_state.release(slot):
+            self._release_slot(slot)
+    
+    def _release_slot(self, slot: int):
+        try:
+            if self.key_table.is_button(slot):
+                self.mouse.release(self.key_table.resolved(slot))
+            else:
+                self.keyboard.release(self.key_table.resolved(slot))
+        except:
+            pass
     
     def emergency_stop(self):
         """緊急停止：停止所有巨集並釋放所有按鍵"""
@@ -2,10 +2,12 @@
 巨集錄製器 - 負責錄製鍵盤和滑鼠動作
 """
 import time
+import uuid
+import bisect
 import threading
-from pynput import keyboard, mouse
+from itertools import islice
 from dataclasses import dataclass, field
-from typing import List, Optional, Callable
+from typing import Dict, Iterable, List, Optional, Callable, Sequence, Tuple
 from enum import Enum
 
 
@@ -13,16 +15,44 @@ class EventType(Enum):
     """事件類型"""
     KEY_PRESS = "key_press"
     KEY_RELEASE = "key_release"
+    KEY_TAP = "key_tap"  # 按下後立即放開（由最佳化合併而成）
     MOUSE_CLICK = "mouse_click"
     MOUSE_RELEASE = "mouse_release"
     MOUSE_MOVE = "mouse_move"
     MOUSE_SCROLL = "mouse_scroll"
     DELAY = "delay"  # 獨立的延遲事件
+    TEXT = "text"  # 輸入一段文字（整段一次送出）
+    CALL = "call"  # 呼叫另一個巨集（依 id 參照，播放前才解析）
+    REPEAT = "repeat"  # 重複區塊開始：到對應的 REPEAT_END 之間的事件重複 count 次
+    REPEAT_END = "repeat_end"  # 重複區塊結束
+
+
+# 舊版巨集檔沒有 id：以名稱推導固定的 id，同一個檔案每次載入都得到相同結果
+LEGACY_ID_NAMESPACE = uuid.UUID("5b7c1f0e-2d8a-4f43-9a57-3c1e6d2b8f90")
+
+
+def new_macro_id() -> str:
+    """新巨集的 id"""
+    return uuid.uuid4().hex
+
+
+def legacy_macro_id(name: str) -> str:
+    """沒有 id 的舊巨集依名稱推導的 id"""
+    return uuid.uuid5(LEGACY_ID_NAMESPACE, name).hex
+
+
+def text_duration(text: Optional[str], char_delay: Optional[float]) -> float:
+    """文字事件從第一個到最後一個字元的時間"""
+    return (len(text) - 1) * (char_delay or 0.0) if text else 0.0
 
 
 @dataclass
 class MacroEvent:
-    """巨集事件"""
+    """
+    巨集事件
+    事件物件視為不可變：編輯時以 dataclasses.replace 建立新物件取代，
+    因此剪貼簿與多個巨集可以直接共用同一個事件物件而不必深複製
+    """
     event_type: EventType
     timestamp: float
     delay: float = 0.0  # 與前一事件的延遲時間
@@ -38,9 +68,25 @@ class MacroEvent:
     scroll_dx: Optional[int] = None
     scroll_dy: Optional[int] = None
     
+    # 文字輸入相關
+    text: Optional[str] = None
+    char_delay: float = 0.0  # 每個字元之間的間隔（0 表示整段一次送出）
+    
+    # 呼叫巨集與重複區塊相關
+    call_id: Optional[str] = None  # 被呼叫巨集的 id
+    count: int = 1  # 重複次數
+    gap: float = 0.0  # 重複區塊每輪之間的間隔
+    
+    @property
+    def duration(self) -> float:
+        """事件本身佔用的播放時間（不含 delay）"""
+        if self.event_type == EventType.TEXT:
+            return text_duration(self.text, self.char_delay)
+        return 0.0
+    
     def to_dict(self) -> dict:
-        """轉換為字典格式"""
-        return {
+        """轉換為字典格式（文字、呼叫與重複欄位只在對應的事件中輸出）"""
+        data = {
             "event_type": self.event_type.value,
             "timestamp": self.timestamp,
             "delay": self.delay,
@@ -52,6 +98,16 @@ class MacroEvent:
             "scroll_dx": self.scroll_dx,
             "scroll_dy": self.scroll_dy
         }
+        if self.text is not None:
+            data["text"] = self.text
+            data["char_delay"] = self.char_delay
+        if self.call_id is not None:
+            data["call_id"] = self.call_id
+        if self.event_type in (EventType.CALL, EventType.REPEAT):
+            data["count"] = self.count
+        if self.event_type == EventType.REPEAT:
+            data["gap"] = self.gap
+        return data
     
     @classmethod
     def from_dict(cls, data: dict) -> 'MacroEvent':
@@ -66,10 +122,75 @@ class MacroEvent:
             y=data.get("y"),
             button=data.get("button"),
             scroll_dx=data.get("scroll_dx"),
-            scroll_dy=data.get("scroll_dy")
+            scroll_dy=data.get("scroll_dy"),
+            text=data.get("text"),
+            char_delay=data.get("char_delay") or 0.0,
+            call_id=data.get("call_id"),
+            count=data["count"] if data.get("count") is not None else 1,
+            gap=data.get("gap") or 0.0
         )
 
 
+# 計時中的重複區塊：(次數, 每輪間隔, 區塊內第一個事件前的時間)
+RepeatFrame = Tuple[int, float, float]
+
+
+def match_blocks(events: Sequence[MacroEvent]) -> Dict[int, int]:
+    """
+    配對重複區塊：返回 {REPEAT 位置: 對應 REPEAT_END 位置}
+    沒有結束標記的區塊延伸到結尾（值為 len(events)），多出的結束標記忽略
+    """
+    blocks: Dict[int, int] = {}
+    open_blocks: List[int] = []
+    for i, event in enumerate(events):
+        if event.event_type == EventType.REPEAT:
+            open_blocks.append(i)
+        elif event.event_type == EventType.REPEAT_END and open_blocks:
+            blocks[open_blocks.pop()] = i
+    for start in open_blocks:
+        blocks[start] = len(events)
+    return blocks
+
+
+def _close_frame(frame: RepeatFrame, time: float) -> float:
+    """區塊第一輪在 time 結束：加上其餘各輪（各輪之間有間隔），0 次則整個區塊不執行"""
+    count, gap, start = frame
+    if count <= 0:
+        return start
+    return time + (count - 1) * (time - start + gap)
+
+
+def advance_time(event: MacroEvent, time: float,
+                 frames: Tuple[RepeatFrame, ...]) -> Tuple[float, float, Tuple[RepeatFrame, ...]]:
+    """
+    依序累計事件時間，返回 (事件執行時間, 事件結束後的時間, 之後的區塊堆疊)
+    重複區塊內的事件取第一輪的時間，區塊結束時才加上其餘各輪
+    """
+    at = time + event.delay
+    time = at + event.duration
+    if event.event_type == EventType.REPEAT:
+        frames = frames + ((event.count, event.gap, time),)
+    elif event.event_type == EventType.REPEAT_END and frames:
+        time = _close_frame(frames[-1], time)
+        frames = frames[:-1]
+    return at, time, frames
+
+
+def finish_time(time: float, frames: Tuple[RepeatFrame, ...]) -> float:
+    """結尾時關閉沒有結束標記的區塊"""
+    for frame in reversed(frames):
+        time = _close_frame(frame, time)
+    return time
+
+
+def events_duration(events: Iterable[MacroEvent]) -> float:
+    """事件序列的播放時長（重複區塊依次數計算，不展開）"""
+    time, frames = 0.0, ()
+    for event in events:
+        _, time, frames = advance_time(event, time, frames)
+    return finish_time(time, frames)
+
+
 @dataclass
 class Macro:
     """巨集資料結構"""
@@ -80,10 +201,12 @@ class Macro:
     trigger_key: Optional[str] = None  # 觸發按鍵
     target_window: str = ""  # 目標視窗標題（空字串為全域）
     created_time: float = field(default_factory=time.time)
+    id: str = field(default_factory=new_macro_id)  # 不隨改名變動，供呼叫事件參照
     
     def to_dict(self) -> dict:
         """轉換為字典格式"""
         return {
+            "id": self.id,
             "name": self.name,
             "events": [e.to_dict() for e in self.events],
             "loop_count": self.loop_count,
@@ -103,20 +226,115 @@ class Macro:
             loop_delay=data.get("loop_delay", 0.0),
             trigger_key=data.get("trigger_key"),
             target_window=data.get("target_window", ""),
-            created_time=data.get("created_time", time.time())
+            created_time=data.get("created_time", time.time()),
+            id=data.get("id") or legacy_macro_id(data["name"])
         )
     
     @property
     def total_duration(self) -> float:
         """計算巨集總時長"""
-        if not self.events:
-            return 0.0
-        return sum(e.delay for e in self.events)
+        return events_duration(self.events)
     
     @property
     def event_count(self) -> int:
         """事件數量"""
         return len(self.events)
+    
+    def remove_events(self, indices: Iterable[int]) -> List[MacroEvent]:
+        """
+        一次刪除多個事件（單次壓縮，不逐一 del）
+        返回被刪除的事件，依原本順序排列
+        """
+        events = self.events
+        removed = {i for i in indices if 0 <= i < len(events)}
+        if not removed:
+            return []
+        first, last = min(removed), max(removed)
+        if last - first + 1 == len(removed):
+            # 連續區段直接切片刪除
+            taken = events[first:last + 1]
+            del events[first:last + 1]
+            return taken
+        taken = [events[i] for i in sorted(removed)]
+        events[first:] = [e for i, e in enumerate(islice(events, first, None), first) if i not in removed]
+        return taken
+    
+    def restore_events(self, indices: Sequence[int], restored: Sequence[MacroEvent]):
+        """
+        把事件放回原本的位置（remove_events 的反向操作，單次合併）
+        indices 需已排序，且與 restored 一一對應
+        """
+        if not indices:
+            return
+        first = indices[0]
+        if indices[-1] - first + 1 == len(indices):
+            self.events[first:first] = restored
+            return
+        tail = iter(self.events[first:])
+        merged = []
+        k = 0
+        for pos in range(first, len(self.events) + len(restored)):
+            if k < len(indices) and indices[k] == pos:
+                merged.append(restored[k])
+                k += 1
+            else:
+                merged.append(next(tail))
+        self.events[first:] = merged
+    
+    def insert_events(self, index: int, new_events: Sequence[MacroEvent]):
+        """在指定位置插入多個事件（單次切片插入）"""
+        index = max(0, min(index, len(self.events)))
+        self.events[index:index] = new_events
+    
+    def move_events(self, indices: Iterable[int], target: int, after: bool = False) -> int:
+        """
+        把一組事件當作區塊移到目標事件之前（after 為 True 時之後），保持區塊內順序
+        返回區塊移動後的起始位置
+        """
+        block = sorted({i for i in indices if 0 <= i < len(self.events)})
+        if not block:
+            return target
+        # 目標位置換算成移除區塊後的索引
+        new_pos = target - bisect.bisect_left(block, target) + (1 if after else 0)
+        moved = self.remove_events(block)
+        new_pos = max(0, min(new_pos, len(self.events)))
+        self.insert_events(new_pos, moved)
+        return new_pos
+    
+    def to_info(self) -> 'MacroInfo':
+        """取得不含事件的摘要資訊"""
+        return MacroInfo(
+            name=self.name,
+            trigger_key=self.trigger_key,
+            target_window=self.target_window,
+            loop_count=self.loop_count,
+            loop_delay=self.loop_delay,
+            created_time=self.created_time,
+            event_count=self.event_count,
+            total_duration=self.total_duration,
+            used_keys=used_keys_of(self.events),
+            id=self.id
+        )
+
+
+@dataclass
+class MacroInfo:
+    """巨集摘要（不載入事件即可顯示與查詢）"""
+    name: str
+    trigger_key: Optional[str] = None
+    target_window: str = ""
+    loop_count: int = 1
+    loop_delay: float = 0.0
+    created_time: float = 0.0
+    event_count: int = 0
+    total_duration: float = 0.0
+    used_keys: Tuple[str, ...] = ()  # 事件中用到的按鍵（排序、不重複）
+    id: str = ""
+
+
+def used_keys_of(events: Iterable[MacroEvent]) -> Tuple[str, ...]:
+    """收集事件中用到的按鍵"""
+    return tuple(sorted({e.key for e in events if e.key}))
 
 
 class MacroRecorder:
@@ -133,8 +351,9 @@ class MacroRecorder:
         self._start_time: float = 0.0
         self._last_event_time: float = 0.0
         
-        self._keyboard_listener: Optional[keyboard.Listener] = None
-        self._mouse_listener: Optional[mouse.Listener] = None
+        # pynput 在開始錄製時才載入（加快程式啟動，也讓只讀寫巨集的程式不需要輸入裝置）
+        self._keyboard_listener = None
+        self._mouse_listener = None
         
         # 追蹤已按下的按鍵和滑鼠按鈕（避免重複記錄）
         self._pressed_keys: set = set()
@@ -144,8 +363,8 @@ class MacroRecorder:
         self.on_event_recorded: Optional[Callable[[MacroEvent], None]] = None
         self.on_recording_stopped: Optional[Callable[[], None]] = None
         
-        # 停止錄製的快捷鍵（預設 F10）
-        self.stop_key = keyboard.Key.f10
+        # 停止錄製的快捷鍵（None 表示 F10）
+        self.stop_key = None
     
     def start_recording(self):
         """開始錄製"""
@@ -159,6 +378,10 @@ class MacroRecorder:
         self._start_time = None  # 等待第一個事件才開始計時
         self._last_event_time = None
         
+        from pynput import keyboard, mouse
+        if self.stop_key is None:
+            self.stop_key = keyboard.Key.f10
+        
         # 建立監聽器
         if self.record_keyboard:
             self._keyboard_listener = keyboard.Listener(
@@ -360,4 +583,3 @@ class MacroRecorder:
             scroll_dy=dy
         )
         self._add_event(event)
-        self._add_event(event)
@@ -0,0 +1,204 @@
+"""
+巨集庫搜尋索引 - 只使用巨集摘要（MacroInfo），不需要載入事件
+名稱與目標視窗以前綴樹索引（名稱另外索引所有後綴，可做子字串搜尋），
+觸發鍵與使用到的按鍵以雜湊表索引；新增/修改/刪除時逐筆更新
+"""
+import re
+from typing import Dict, Iterable, List, Optional, Set
+
+from .recorder import MacroInfo
+
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+# 名稱中太長的詞只索引前綴，避免後綴展開佔用過多記憶體
+MAX_SUFFIX_TOKEN = 32
+
+
+def tokenize(text: str) -> List[str]:
+    """切出小寫的詞"""
+    return _TOKEN.findall(text.lower()) if text else []
+
+
+def key_terms(key: str) -> Set[str]:
+    """按鍵的查詢詞：完整名稱，特殊鍵另外索引去掉 "Key." 的名稱（Key.space -> space）"""
+    term = key.lower()
+    if term.startswith("key.") and len(term) > 4:
+        return {term, term[4:]}
+    return {term}
+
+
+class PrefixTrie:
+    """前綴樹：每個節點記錄經過此節點的名稱，前綴查詢的成本只與前綴長度有關"""
+
+    def __init__(self):
+        self._root: Dict = {}
+
+    def add(self, term: str, name: str):
+        node = self._root
+        for char in term:
+            node = node.setdefault(char, {})
+            node.setdefault(None, set()).add(name)
+
+    def remove(self, term: str, name: str):
+        """
+        沿路徑移除名稱
+        共用前綴的其他詞也會失去此名稱，因此同一名稱的所有詞必須一起移除
+        """
+        path = [self._root]
+        for char in term:
+            node = path[-1].get(char)
+            if node is None:
+                return
+            path.append(node)
+        # 由下往上移除，並刪除已無名稱的節點
+        for depth in range(len(term), 0, -1):
+            node = path[depth]
+            names = node.get(None)
+            if names is not None:
+                names.discard(name)
+                if not names:
+                    del node[None]
+            if not node:
+                del path[depth - 1][term[depth - 1]]
+
+    def match(self, prefix: str) -> Set[str]:
+        node = self._root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return set()
+        return node.get(None, set())
+
+
+class MacroSearchIndex:
+    """
+    巨集庫搜尋索引
+    查詢語法：以空白分隔的條件全部符合才算命中（AND）
+      一般文字    名稱子字串、目標視窗前綴、觸發鍵或使用到的按鍵
+      key:f      使用過按鍵 f（完全比對，特殊鍵可省略 "Key."）
+      trigger:f1 觸發鍵為 f1
+      window:abc 目標視窗中有以 abc 開頭的詞
+    """
+
+    FIELDS = ("key", "trigger", "window", "name")
+
+    def __init__(self):
+        self._infos: Dict[str, MacroInfo] = {}
+        self._names = PrefixTrie()
+        self._windows = PrefixTrie()
+        self._triggers: Dict[str, Set[str]] = {}
+        self._keys: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._infos)
+
+    def rebuild(self, infos: Iterable[MacroInfo]):
+        """重新建立整個索引"""
+        self.__init__()
+        for info in infos:
+            self.add(info)
+
+    # ---- 更新 ----
+
+    @staticmethod
+    def _name_terms(info: MacroInfo) -> Set[str]:
+        terms = set()
+        for token in tokenize(info.name):
+            if len(token) > MAX_SUFFIX_TOKEN:
+                terms.add(token)
+                continue
+            terms.update(token[i:] for i in range(len(token)))
+        return terms
+
+    def add(self, info: MacroInfo):
+        """加入（或取代）一個巨集"""
+        if info.name in self._infos:
+            self.remove(info.name)
+        self._infos[info.name] = info
+        for term in self._name_terms(info):
+            self._names.add(term, info.name)
+        for token in set(tokenize(info.target_window)):
+            self._windows.add(token, info.name)
+        if info.trigger_key:
+            self._triggers.setdefault(info.trigger_key.lower(), set()).add(info.name)
+        for key in info.used_keys:
+            for term in key_terms(key):
+                self._keys.setdefault(term, set()).add(info.name)
+
+    def update(self, info: MacroInfo, old_name: Optional[str] = None):
+        """巨集被修改或改名"""
+        if old_name and old_name != info.name:
+            self.remove(old_name)
+        self.add(info)
+
+    def remove(self, name: str):
+        """移除一個巨集"""
+        info = self._infos.pop(name, None)
+        if info is None:
+            return
+        for term in self._name_terms(info):
+            self._names.remove(term, name)
+        for token in set(tokenize(info.target_window)):
+            self._windows.remove(token, name)
+        if info.trigger_key:
+            self._discard(self._triggers, info.trigger_key.lower(), name)
+        for key in info.used_keys:
+            for term in key_terms(key):
+                self._discard(self._keys, term, name)
+
+    @staticmethod
+    def _discard(table: Dict[str, Set[str]], term: str, name: str):
+        names = table.get(term)
+        if names is not None:
+            names.discard(name)
+            if not names:
+                del table[term]
+
+    # ---- 查詢 ----
+
+    def _match_term(self, field: Optional[str], text: str) -> Set[str]:
+        if field == "key":
+            return set(self._keys.get(text, ()))
+        if field == "trigger":
+            return set(self._triggers.get(text, ()))
+        if field == "window":
+            result: Optional[Set[str]] = None
+            for token in tokenize(text):
+                names = self._windows.match(token)
+                result = set(names) if result is None else result & names
+            return result or set()
+        if field == "name":
+            return self._match_name(text)
+        # 未指定欄位：任何一個欄位符合即可
+        result = self._match_name(text)
+        for token in tokenize(text):
+            result |= self._windows.match(token)
+        result |= self._triggers.get(text, set())
+        result |= self._keys.get(text, set())
+        return result
+
+    def _match_name(self, text: str) -> Set[str]:
+        result: Optional[Set[str]] = None
+        for token in tokenize(text):
+            names = self._names.match(token)
+            result = set(names) if result is None else result & names
+        return result or set()
+
+    def search(self, query: str) -> Optional[Set[str]]:
+        """
+        查詢符合的巨集名稱
+        查詢字串為空時返回 None（表示不篩選）
+        """
+        result: Optional[Set[str]] = None
+        for part in query.lower().split():
+            field, sep, text = part.partition(":")
+            if not sep or field not in self.FIELDS:
+                field, text = None, part
+            if not text:
+                continue
+            names = self._match_term(field, text)
+            result = names if result is None else result & names
+            if not result:
+                return set()
+        return result
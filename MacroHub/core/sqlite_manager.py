@@ -0,0 +1,541 @@
+"""
+SQLite 巨集管理器 - 以單一資料庫儲存大量巨集，支援索引查詢
+巨集摘要在啟動時一次載入，事件只在需要時才讀取
+"""
+import os
+import json
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .recorder import (Macro, MacroEvent, MacroInfo, EventType, advance_time, events_duration, finish_time,
+                       legacy_macro_id, text_duration, used_keys_of)
+from .manager import MacroManager, LibraryChange
+from .persistence import PersistenceWorker
+from .macro_io import ProgressCallback, read_macro_file
+
+
+# 事件欄位（順序即資料表欄位順序，對應 MacroEvent.to_dict 的鍵）
+EVENT_COLUMNS = [
+    ("event_type", "TEXT NOT NULL"),
+    ("timestamp", "REAL"),
+    ("delay", "REAL"),
+    ("key", "TEXT"),
+    ("key_code", "INTEGER"),
+    ("x", "INTEGER"),
+    ("y", "INTEGER"),
+    ("button", "TEXT"),
+    ("scroll_dx", "INTEGER"),
+    ("scroll_dy", "INTEGER"),
+    ("text", "TEXT"),
+    ("char_delay", "REAL"),
+    ("call_id", "TEXT"),
+    ("count", "INTEGER"),
+    ("gap", "REAL"),
+]
+
+INFO_COLUMNS = ("name", "trigger_key", "target_window", "loop_count", "loop_delay",
+                "created_time", "event_count", "total_duration", "used_keys", "uid")
+
+# used_keys 欄位以此字元分隔多個按鍵
+KEY_SEPARATOR = "\x1f"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS macros (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    trigger_key TEXT,
+    target_window TEXT NOT NULL DEFAULT '',
+    loop_count INTEGER NOT NULL DEFAULT 1,
+    loop_delay REAL NOT NULL DEFAULT 0,
+    created_time REAL NOT NULL,
+    event_count INTEGER NOT NULL DEFAULT 0,
+    total_duration REAL NOT NULL DEFAULT 0,
+    used_keys TEXT NOT NULL DEFAULT '',
+    uid TEXT NOT NULL DEFAULT '',
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_macros_trigger_key ON macros(trigger_key COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_macros_target_window ON macros(target_window COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_macros_event_count ON macros(event_count);
+CREATE TABLE IF NOT EXISTS events (
+    macro_id INTEGER NOT NULL REFERENCES macros(id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    {event_columns},
+    PRIMARY KEY (macro_id, seq)
+) WITHOUT ROWID;
+""".format(event_columns=",\n    ".join(f"{name} {decl}" for name, decl in EVENT_COLUMNS))
+
+
+def _duration_of(events: List[dict]) -> float:
+    """事件字典的播放時長（只有含重複區塊時才需要建立事件物件）"""
+    if any(e["event_type"] == EventType.REPEAT.value for e in events):
+        return events_duration(map(MacroEvent.from_dict, events))
+    return sum(e["delay"] + text_duration(e.get("text"), e.get("char_delay")) for e in events)
+
+
+def _info_from_row(row: tuple) -> MacroInfo:
+    """資料列（依 INFO_COLUMNS 順序）轉為 MacroInfo"""
+    *fields, used_keys, uid = row
+    return MacroInfo(*fields, used_keys=tuple(used_keys.split(KEY_SEPARATOR)) if used_keys else (),
+                     id=uid or legacy_macro_id(fields[0]))
+
+
+def _info_params(info: MacroInfo) -> tuple:
+    """MacroInfo 轉為依 INFO_COLUMNS 順序的參數"""
+    return tuple(getattr(info, c) for c in INFO_COLUMNS[:-2]) + (KEY_SEPARATOR.join(info.used_keys), info.id)
+
+
+class SQLiteMacroManager(MacroManager):
+    """SQLite 巨集管理器（與 MacroManager 介面相容）"""
+
+    def __init__(self, db_path: str = "macros.db"):
+        self.db_path = db_path
+        self.macros_dir = os.path.dirname(os.path.abspath(db_path))
+        self.macros: Dict[str, Macro] = {}  # 已載入事件的巨集快取
+        self._infos: Dict[str, MacroInfo] = {}
+        self._versions: Dict[str, int] = {}
+
+        self._lock = threading.RLock()
+        os.makedirs(self.macros_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        self._data_version = self._query_data_version()
+
+        self._persistence = PersistenceWorker()
+
+        self._load_infos()
+
+    def _migrate(self):
+        """補上舊資料庫缺少的欄位"""
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(events)")}
+        for name, decl in EVENT_COLUMNS:
+            if name not in existing:
+                self._conn.execute(f"ALTER TABLE events ADD COLUMN {name} {decl.replace(' NOT NULL', '')}")
+
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(macros)")}
+        if "used_keys" not in existing:
+            # 由事件表回填每個巨集用到的按鍵
+            self._conn.execute("ALTER TABLE macros ADD COLUMN used_keys TEXT NOT NULL DEFAULT ''")
+            self._conn.execute(
+                "UPDATE macros SET used_keys = COALESCE((SELECT group_concat(key, char(31)) FROM "
+                "(SELECT DISTINCT key FROM events WHERE macro_id = macros.id AND key IS NOT NULL ORDER BY key)), '')")
+        if "uid" not in existing:
+            # 舊巨集的 id 在讀取摘要時依名稱推導，下次儲存時寫入
+            self._conn.execute("ALTER TABLE macros ADD COLUMN uid TEXT NOT NULL DEFAULT ''")
+
+    def _query_data_version(self) -> int:
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    # ---- 摘要 ----
+
+    def _load_infos(self):
+        """載入所有巨集摘要（不含事件）"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(INFO_COLUMNS)}, version FROM macros").fetchall()
+            self._infos = {row[0]: _info_from_row(row[:-1]) for row in rows}
+            self._versions = {row[0]: row[-1] for row in rows}
+
+    def _query_infos(self, where: str, params: tuple) -> List[MacroInfo]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(INFO_COLUMNS)} FROM macros WHERE {where} ORDER BY name",
+                params).fetchall()
+        return [_info_from_row(row) for row in rows]
+
+    def find_by_trigger_key(self, trigger_key: str) -> List[MacroInfo]:
+        """依觸發按鍵查詢（不分大小寫）"""
+        return self._query_infos("trigger_key = ? COLLATE NOCASE", (trigger_key,))
+
+    def find_by_target_window(self, target_window: str) -> List[MacroInfo]:
+        """依目標視窗查詢（不分大小寫，完全比對）"""
+        return self._query_infos("target_window = ? COLLATE NOCASE", (target_window,))
+
+    def find_by_name_prefix(self, prefix: str) -> List[MacroInfo]:
+        """依名稱前綴查詢（使用名稱索引的範圍掃描）"""
+        return self._query_infos("name >= ? AND name < ?", (prefix, prefix + "\U0010ffff"))
+
+    def find_by_size(self, min_events: int = 0, max_events: Optional[int] = None) -> List[MacroInfo]:
+        """依事件數量範圍查詢"""
+        if max_events is None:
+            return self._query_infos("event_count >= ?", (min_events,))
+        return self._query_infos("event_count BETWEEN ? AND ?", (min_events, max_events))
+
+    def find_name_by_id(self, macro_id: str) -> Optional[str]:
+        for info in list(self._infos.values()):
+            if info.id == macro_id:
+                return info.name
+        return None
+
+    def has_macro(self, name: str) -> bool:
+        return name in self._infos
+
+    def get_all_names(self) -> List[str]:
+        return list(self._infos)
+
+    def get_info(self, name: str) -> Optional[MacroInfo]:
+        return self._infos.get(name)
+
+    def get_all_infos(self) -> List[MacroInfo]:
+        return list(self._infos.values())
+
+    # ---- 讀取 ----
+
+    def get_macro(self, name: str) -> Optional[Macro]:
+        """獲取巨集（首次存取時才載入事件）"""
+        macro = self.macros.get(name)
+        if macro is None and name in self._infos:
+            macro = self.load_macro(name)
+        return macro
+
+    def load_macro(self, name: str) -> Optional[Macro]:
+        """從資料庫載入指定巨集"""
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT id, loop_count, loop_delay, trigger_key, target_window, created_time, uid "
+                    "FROM macros WHERE name = ?", (name,)).fetchone()
+                if row is None:
+                    print(f"找不到巨集: {name}")
+                    return None
+                columns = [c for c, _ in EVENT_COLUMNS]
+                event_rows = self._conn.execute(
+                    f"SELECT {', '.join(columns)} FROM events WHERE macro_id = ? ORDER BY seq",
+                    (row[0],)).fetchall()
+
+            events = [MacroEvent.from_dict(dict(zip(columns, r))) for r in event_rows]
+            macro = Macro(name=name, events=events, loop_count=row[1], loop_delay=row[2],
+                          trigger_key=row[3], target_window=row[4], created_time=row[5],
+                          id=row[6] or legacy_macro_id(name))
+            self.macros[name] = macro
+            return macro
+
+        except Exception as e:
+            print(f"載入巨集失敗: {e}")
+            return None
+
+    def get_all_macros(self) -> List[Macro]:
+        """獲取所有巨集（會載入全部事件，大型巨集庫請改用 get_all_infos）"""
+        macros = []
+        for name in list(self._infos):
+            macro = self.get_macro(name)
+            if macro:
+                macros.append(macro)
+        return macros
+
+    def ensure_loaded(self):
+        """摘要在建構時已讀取，事件在存取時才載入"""
+
+    def load_all(self) -> List[Macro]:
+        """重新載入摘要並清除事件快取"""
+        with self._lock:
+            self.macros = {}
+            self._load_infos()
+        return self.get_all_macros()
+
+    # ---- 寫入 ----
+
+    def _write_macro_data(self, data: dict, old_name: Optional[str] = None):
+        """以單一交易寫入巨集與全部事件（改名也在同一交易內完成）"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if old_name and old_name != data["name"]:
+                    existing = self._uid_of(data["name"])
+                    if existing is None:
+                        self._conn.execute("UPDATE macros SET name = ? WHERE name = ?", (data["name"], old_name))
+                    elif existing == data["id"]:
+                        # 改名後又改回原名（中間的寫入已被合併）：覆寫原本的資料列
+                        self._delete_if_same(old_name, data["id"])
+                    else:
+                        raise ValueError(f"巨集名稱已存在: {data['name']}")
+                info, version = self._write_in_transaction(data)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+            if old_name and old_name != data["name"]:
+                self._infos.pop(old_name, None)
+                self._versions.pop(old_name, None)
+            self._infos[info.name] = info
+            self._versions[info.name] = version
+            self._data_version = self._query_data_version()
+
+    def _uid_of(self, name: str) -> Optional[str]:
+        """資料庫中使用此名稱的巨集 id（沒有時返回 None）"""
+        row = self._conn.execute("SELECT uid FROM macros WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        return row[0] or legacy_macro_id(name)
+
+    def _delete_if_same(self, name: str, macro_id: str) -> bool:
+        """刪除此名稱的資料列，但只在它仍屬於同一個巨集時；返回是否已刪除"""
+        if self._uid_of(name) != macro_id:
+            return False
+        self._conn.execute("DELETE FROM macros WHERE name = ?", (name,))
+        return True
+
+    def _remove_stale_row(self, old_name: str, macro_id: str):
+        """移除改名前的資料列（連續改名時中間的寫入被合併，舊名稱的資料列仍在）"""
+        with self._lock:
+            if self._delete_if_same(old_name, macro_id):
+                self._versions.pop(old_name, None)
+                self._data_version = self._query_data_version()
+
+    def _write_in_transaction(self, data: dict) -> Tuple[MacroInfo, int]:
+        """在既有交易中寫入單一巨集，返回 (摘要, 版本號)"""
+        events = data["events"]
+        info = MacroInfo(
+            name=data["name"],
+            trigger_key=data.get("trigger_key"),
+            target_window=data.get("target_window", ""),
+            loop_count=data.get("loop_count", 1),
+            loop_delay=data.get("loop_delay", 0.0),
+            created_time=data["created_time"],
+            event_count=len(events),
+            total_duration=_duration_of(events),
+            used_keys=tuple(sorted({e["key"] for e in events if e.get("key")})),
+            id=data["id"]
+        )
+        cur = self._conn.cursor()
+        cur.execute(
+            f"INSERT INTO macros ({', '.join(INFO_COLUMNS)}) VALUES ({', '.join('?' * len(INFO_COLUMNS))}) "
+            "ON CONFLICT(name) DO UPDATE SET "
+            + ", ".join(f"{c} = excluded.{c}" for c in INFO_COLUMNS[1:])
+            + ", version = version + 1",
+            _info_params(info))
+        macro_id, version = cur.execute(
+            "SELECT id, version FROM macros WHERE name = ?", (info.name,)).fetchone()
+        cur.execute("DELETE FROM events WHERE macro_id = ?", (macro_id,))
+        self._insert_events(cur, macro_id, events)
+        return info, version
+
+    @staticmethod
+    def _insert_events(cur: sqlite3.Cursor, macro_id: int, events: List[dict], start_seq: int = 0):
+        """批次寫入事件列"""
+        columns = [c for c, _ in EVENT_COLUMNS]
+        cur.executemany(
+            f"INSERT INTO events (macro_id, seq, {', '.join(columns)}) "
+            f"VALUES (?, ?, {', '.join('?' * len(columns))})",
+            ((macro_id, seq) + tuple(e.get(c) for c in columns)
+             for seq, e in enumerate(events, start_seq)))
+
+    def save_macro(self, macro: Macro, old_name: Optional[str] = None) -> bool:
+        """儲存巨集到資料庫（同步）"""
+        try:
+            self._write_macro_data(macro.to_dict(), old_name)
+            self._rekey_macro(macro, old_name)
+            return True
+        except Exception as e:
+            print(f"儲存巨集失敗: {e}")
+            return False
+
+    def save_macro_async(self, macro: Macro, old_name: Optional[str] = None,
+                         callback: Optional[Callable[[bool], None]] = None) -> bool:
+        """
+        在背景儲存巨集（同一巨集的連續儲存會被合併）
+        改名的目標已屬於其他巨集時不做任何變更並返回 False（不會呼叫 callback）
+        """
+        if old_name and old_name != macro.name:
+            conflict = self.name_conflict(macro, macro.name)
+            if conflict is not None:
+                print(f"儲存巨集失敗: 巨集名稱已存在: {conflict}")
+                return False
+        data = macro.to_dict()
+        self._rekey_macro(macro, old_name)
+        self._infos[macro.name] = macro.to_info()
+        if old_name and old_name != macro.name:
+            self._infos.pop(old_name, None)
+        self._persistence.submit(f"sqlite:{macro.name}", lambda: self._write_macro_data(data, old_name),
+                                 callback=callback,
+                                 replaces=f"sqlite:{old_name}" if old_name else None,
+                                 remove_old=lambda: self._remove_stale_row(old_name, data["id"]))
+        return True
+
+    def name_conflict(self, macro: Macro, name: str) -> Optional[str]:
+        """其他巨集是否已使用此名稱，返回該巨集的名稱"""
+        info = self._infos.get(name)
+        if info is not None and info.id != macro.id:
+            return name
+        return None
+
+    def import_macros(self, macros: List[Macro]) -> List[Macro]:
+        """在單一交易中批次寫入多個巨集（失敗時整批復原並拋出例外）"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for macro in macros:
+                    self._write_in_transaction(macro.to_dict())
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._load_infos()
+            self._data_version = self._query_data_version()
+            for macro in macros:
+                self.macros[macro.name] = macro
+        return list(macros)
+
+    def import_macro(self, filepath: str, progress: Optional[ProgressCallback] = None) -> Optional[Macro]:
+        """
+        從檔案串流匯入巨集
+        事件分批直接寫入資料庫（單一交易），匯入期間不會在記憶體中建立完整巨集
+        """
+        placeholder = f"\x00import-{os.getpid()}-{threading.get_ident()}"
+        try:
+            with self._lock:
+                cur = self._conn.cursor()
+                cur.execute("BEGIN IMMEDIATE")
+                try:
+                    cur.execute("INSERT INTO macros (name, created_time) VALUES (?, ?)",
+                                (placeholder, time.time()))
+                    macro_id = cur.lastrowid
+                    totals = {"count": 0, "time": 0.0, "frames": ()}
+                    keys = set()
+
+                    def on_events(batch: List[MacroEvent]):
+                        self._insert_events(cur, macro_id, [e.to_dict() for e in batch], totals["count"])
+                        totals["count"] += len(batch)
+                        elapsed, frames = totals["time"], totals["frames"]
+                        for event in batch:
+                            _, elapsed, frames = advance_time(event, elapsed, frames)
+                        totals["time"], totals["frames"] = elapsed, frames
+                        keys.update(used_keys_of(batch))
+
+                    header = read_macro_file(filepath, on_events, progress)
+                    info = MacroInfo(
+                        name=self._unique_name(header["name"]),
+                        trigger_key=header.get("trigger_key"),
+                        target_window=header.get("target_window", ""),
+                        loop_count=header.get("loop_count", 1),
+                        loop_delay=header.get("loop_delay", 0.0),
+                        created_time=header.get("created_time", time.time()),
+                        event_count=totals["count"],
+                        total_duration=finish_time(totals["time"], totals["frames"]),
+                        used_keys=tuple(sorted(keys)),
+                        id=self.unique_id(header.get("id") or legacy_macro_id(header["name"]))
+                    )
+                    cur.execute(
+                        f"UPDATE macros SET {', '.join(f'{c} = ?' for c in INFO_COLUMNS)} WHERE id = ?",
+                        _info_params(info) + (macro_id,))
+                    cur.execute("COMMIT")
+                except BaseException:
+                    cur.execute("ROLLBACK")
+                    raise
+
+                self._infos[info.name] = info
+                self._versions[info.name] = 0
+                self._data_version = self._query_data_version()
+            return self.get_macro(info.name)
+
+        except Exception as e:
+            print(f"匯入巨集失敗: {e}")
+            return None
+
+    def import_directory(self, macros_dir: str) -> int:
+        """把 JSON 巨集目錄批次匯入資料庫，返回匯入數量"""
+        macros = []
+        for filename in os.listdir(macros_dir):
+            if filename.endswith('.json'):
+                try:
+                    with open(os.path.join(macros_dir, filename), 'r', encoding='utf-8') as f:
+                        macros.append(Macro.from_dict(json.load(f)))
+                except Exception as e:
+                    print(f"載入 {filename} 失敗: {e}")
+        if macros:
+            self.import_macros(macros)
+        return len(macros)
+
+    def delete_macro(self, name: str) -> bool:
+        """刪除巨集"""
+        try:
+            with self._lock:
+                self.macros.pop(name, None)
+                self._infos.pop(name, None)
+                self._versions.pop(name, None)
+
+            def remove():
+                with self._lock:
+                    self._conn.execute("DELETE FROM macros WHERE name = ?", (name,))
+                    self._data_version = self._query_data_version()
+
+            if self._persistence.has_pending():
+                self._persistence.submit(f"sqlite:{name}", remove, delay=0)
+            else:
+                remove()
+            return True
+
+        except Exception as e:
+            print(f"刪除巨集失敗: {e}")
+            return False
+
+    def rename_macro(self, old_name: str, new_name: str) -> bool:
+        """重新命名巨集"""
+        if not self.has_macro(old_name) or self.has_macro(new_name):
+            return False
+
+        macro = self.get_macro(old_name)
+        if macro is None:
+            return False
+        macro.name = new_name
+        if not self.save_macro(macro, old_name=old_name):
+            macro.name = old_name
+            return False
+        return True
+
+    # ---- 外部變更 ----
+
+    def rescan(self) -> LibraryChange:
+        """
+        偵測其他連線對資料庫的修改
+        以 PRAGMA data_version 快速判斷是否有外部寫入，再比對每個巨集的版本號
+        """
+        change = LibraryChange()
+        with self._lock:
+            data_version = self._query_data_version()
+            if data_version == self._data_version:
+                return change
+            self._data_version = data_version
+            rows = self._conn.execute("SELECT name, version FROM macros").fetchall()
+            current: Dict[str, int] = dict(rows)
+            old_versions = self._versions
+            old_infos = self._infos
+
+            def placeholder(name: str) -> Macro:
+                # 未載入事件的舊巨集，只需要名稱與熱鍵供呼叫端取消註冊
+                info = old_infos.get(name)
+                return Macro(name=name, trigger_key=info.trigger_key if info else None,
+                             id=info.id if info else legacy_macro_id(name))
+
+            for name in old_versions.keys() - current.keys():
+                macro = self.macros.pop(name, None)
+                change.removed.append(macro or placeholder(name))
+
+            changed: List[Tuple[str, Optional[Macro]]] = []
+            for name, version in current.items():
+                if old_versions.get(name) != version:
+                    changed.append((name, self.macros.pop(name, None)))
+
+            self._load_infos()
+            for name, old in changed:
+                new = self.load_macro(name)
+                if new is None:
+                    continue
+                if name in old_versions:
+                    change.changed.append((old or placeholder(name), new))
+                else:
+                    change.added.append(new)
+        return change
+
+    def close(self):
+        """寫入剩餘資料並關閉資料庫"""
+        self._persistence.stop()
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,60 @@
+"""
+啟動計時 - 記錄各啟動階段的耗時，用來追蹤啟動速度是否退步
+"""
+import time
+import threading
+from contextlib import contextmanager
+from typing import List, NamedTuple, Optional
+
+
+class StartupPhase(NamedTuple):
+    label: str
+    at: float  # 完成時間（秒，從程式啟動起算）
+    duration: float  # 此階段耗時（秒）
+
+
+class StartupTimer:
+    """
+    啟動計時器
+    mark() 記錄從上一個標記到現在的耗時；在背景執行緒進行的階段改用 phase() 計時，
+    避免與主執行緒的標記互相重疊
+    """
+
+    def __init__(self, start: Optional[float] = None):
+        self.start = time.perf_counter() if start is None else start
+        self.phases: List[StartupPhase] = []
+        self._last = self.start
+        self._lock = threading.Lock()
+
+    def mark(self, label: str) -> float:
+        """記錄一個循序階段完成，返回該階段耗時"""
+        now = time.perf_counter()
+        with self._lock:
+            duration = now - self._last
+            self._last = now
+            self.phases.append(StartupPhase(label, now - self.start, duration))
+        return duration
+
+    @contextmanager
+    def phase(self, label: str):
+        """計時一個區塊（可在背景執行緒使用，不影響 mark() 的起點）"""
+        began = time.perf_counter()
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            with self._lock:
+                self.phases.append(StartupPhase(label, now - self.start, now - began))
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def report(self) -> str:
+        """各階段耗時報告（依完成時間排序）"""
+        with self._lock:
+            phases = sorted(self.phases, key=lambda p: p.at)
+        lines = ["啟動時間："]
+        for p in phases:
+            lines.append(f"  {p.label:<10s} {p.duration * 1000:8.1f} ms  (累計 {p.at * 1000:8.1f} ms)")
+        return "\n".join(lines)
@@ -0,0 +1,29 @@
+"""
+儲存後端選擇 - 依設定建立 JSON 目錄或 SQLite 巨集管理器
+"""
+import os
+import sys
+from typing import Optional
+
+from .manager import MacroManager
+
+
+def default_base_path() -> str:
+    """巨集儲存位置：打包後的 EXE 為 EXE 同級目錄，開發環境為專案目錄"""
+    if getattr(sys, 'frozen', False):
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def open_macro_manager(base_path: str, backend: Optional[str] = None, load: bool = True) -> MacroManager:
+    """
+    建立巨集管理器
+    backend: "json"（預設，每個巨集一個檔案）或 "sqlite"（單一資料庫），
+             未指定時讀取環境變數 MACROHUB_STORAGE
+    load: False 時 JSON 巨集庫延後到 ensure_loaded() 才讀取檔案
+    """
+    backend = (backend or os.environ.get("MACROHUB_STORAGE") or "json").lower()
+    if backend == "sqlite":
+        from .sqlite_manager import SQLiteMacroManager
+        return SQLiteMacroManager(os.path.join(base_path, "macros.db"))
+    return MacroManager(os.path.join(base_path, "macros"), load=load)
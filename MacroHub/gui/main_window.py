@@ -2,23 +2,37 @@
 MacroHub 主視窗 - 現代化深色主題 GUI（增強版）
 新增功能：即時錄製顯示、事件編輯、全域熱鍵、系統托盤
 """
+import bisect
+import dataclasses
 import os
 import sys
 import threading
 import customtkinter as ctk
+import tkinter as tk
 from tkinter import messagebox, filedialog
-from typing import Optional
+from typing import Dict, Optional
 import time
-import pystray
-from PIL import Image, ImageDraw
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from core.recorder import MacroRecorder, Macro, MacroEvent, EventType
+from core.recorder import MacroRecorder, Macro, MacroEvent, MacroInfo, EventType
 from core.player import MacroPlayer
-from core.manager import MacroManager
+from core.compiler import CompileError, PlanCompiler
+from core.search_index import MacroSearchIndex
+from core.event_index import EventIndex, parse_event_query
+from core.history import EditHistory, EditOp, RemoveEvents, InsertEvents, MoveEvents, ReplaceEvent, ReplaceRange
+from core.optimizer import optimize_events
+from core.manager import LibraryChange
+from core.storage import default_base_path, open_macro_manager
+from core.macro_io import MACRO_FILE_TYPES
+from core.bundle import BUNDLE_FILE_TYPES
+from core.library_watcher import LibraryWatcher
 from core.hotkey_manager import HotkeyManager
+from core.startup import StartupTimer
 from core import window_utils
+from gui.virtual_list import VirtualListView, RowContent
+from gui.timeline import TimelineView
+from gui import styles
 
 ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("green")  # 使用綠色作為基礎
@@ -32,6 +46,8 @@ CMD_BORDER = "#00ff00"   # 綠色邊框
 CMD_HOVER = "#003300"    # 深綠（懸停）
 CMD_FONT_FAMILY = "Consolas"
 
+PROGRESS_INTERVAL_MS = 33  # 播放進度的更新間隔（約 30 fps）
+
 # 修改全域預設字體
 # 注意：CustomTkinter 沒有直接的全域字體設定，我們將在元件中使用常數
 
@@ -39,16 +55,19 @@ CMD_FONT_FAMILY = "Consolas"
 class EventEditorDialog(ctk.CTkToplevel):
     """事件編輯對話框"""
     
-    def __init__(self, parent, event: MacroEvent = None, insert_mode=False):
+    def __init__(self, parent, event: MacroEvent = None, insert_mode=False,
+                 macro_choices: Optional[Dict[str, str]] = None):
+        """macro_choices：可呼叫的巨集（名稱 -> id）"""
         super().__init__(parent)
         self.title("編輯事件" if event else "新增事件")
-        self.geometry("400x350")
+        self.geometry("420x460")
         self.resizable(False, False)
         self.configure(fg_color="#0a0a0f")
         
         self.event = event
         self.result = None
         self.insert_mode = insert_mode
+        self.macro_choices = macro_choices or {}
         
         self._create_ui()
         self.grab_set()
@@ -60,15 +79,16 @@ class EventEditorDialog(ctk.CTkToplevel):
         
         # 事件類型
         ctk.CTkLabel(main, text="事件類型", font=ctk.CTkFont(size=12)).pack(anchor="w")
-        self.type_var = ctk.StringVar(value="delay")
+        self.type_var = ctk.StringVar(value=self.event.event_type.value if self.event else "delay")
         type_frame = ctk.CTkFrame(main, fg_color="transparent")
         type_frame.pack(fill="x", pady=(5, 15))
         
-        types = [("延遲", "delay"), ("按鍵按下", "key_press"), ("按鍵釋放", "key_release"),
-                 ("滑鼠點擊", "mouse_click"), ("滑鼠釋放", "mouse_release")]
-        for text, val in types:
+        types = [("延遲", "delay"), ("按鍵按下", "key_press"), ("按鍵釋放", "key_release"), ("按鍵點按", "key_tap"),
+                 ("滑鼠點擊", "mouse_click"), ("滑鼠釋放", "mouse_release"), ("文字", "text"), ("呼叫巨集", "call"),
+                 ("重複開始", "repeat"), ("重複結束", "repeat_end")]
+        for i, (text, val) in enumerate(types):
             ctk.CTkRadioButton(type_frame, text=text, variable=self.type_var, value=val,
-                              command=self._on_type_change).pack(side="left", padx=5)
+                              command=self._on_type_change).grid(row=i // 4, column=i % 4, sticky="w", padx=5, pady=2)
         
         # 延遲時間
         self.delay_frame = ctk.CTkFrame(main, fg_color="transparent")
@@ -86,6 +106,42 @@ class EventEditorDialog(ctk.CTkToplevel):
             self.key_entry.insert(0, self.event.key)
         self.key_entry.pack(anchor="w", pady=5)
         
+        # 文字
+        self.text_frame = ctk.CTkFrame(main, fg_color="transparent")
+        ctk.CTkLabel(self.text_frame, text="文字").pack(anchor="w")
+        self.text_entry = ctk.CTkEntry(self.text_frame, width=360)
+        if self.event and self.event.text:
+            self.text_entry.insert(0, self.event.text)
+        self.text_entry.pack(anchor="w", pady=5)
+        ctk.CTkLabel(self.text_frame, text="每字間隔 (毫秒)").pack(anchor="w")
+        self.char_delay_entry = ctk.CTkEntry(self.text_frame, width=150)
+        self.char_delay_entry.insert(0, f"{self.event.char_delay * 1000:g}" if self.event else "0")
+        self.char_delay_entry.pack(anchor="w", pady=5)
+        
+        # 呼叫巨集
+        self.call_frame = ctk.CTkFrame(main, fg_color="transparent")
+        ctk.CTkLabel(self.call_frame, text="巨集").pack(anchor="w")
+        names = sorted(self.macro_choices)
+        current = next((n for n, i in self.macro_choices.items() if self.event and i == self.event.call_id), None)
+        self.call_var = ctk.StringVar(value=current or (names[0] if names else ""))
+        ctk.CTkOptionMenu(self.call_frame, variable=self.call_var, values=names or [""],
+                          width=240).pack(anchor="w", pady=5)
+        ctk.CTkLabel(self.call_frame, text="重複次數").pack(anchor="w")
+        self.count_entry = ctk.CTkEntry(self.call_frame, width=150)
+        self.count_entry.insert(0, str(self.event.count) if self.event else "1")
+        self.count_entry.pack(anchor="w", pady=5)
+        
+        # 重複區塊
+        self.repeat_frame = ctk.CTkFrame(main, fg_color="transparent")
+        ctk.CTkLabel(self.repeat_frame, text="重複次數（到「重複結束」之間的事件）").pack(anchor="w")
+        self.repeat_count_entry = ctk.CTkEntry(self.repeat_frame, width=150)
+        self.repeat_count_entry.insert(0, str(self.event.count) if self.event else "2")
+        self.repeat_count_entry.pack(anchor="w", pady=5)
+        ctk.CTkLabel(self.repeat_frame, text="每輪間隔 (毫秒)").pack(anchor="w")
+        self.gap_entry = ctk.CTkEntry(self.repeat_frame, width=150)
+        self.gap_entry.insert(0, f"{self.event.gap * 1000:g}" if self.event else "0")
+        self.gap_entry.pack(anchor="w", pady=5)
+        
         # 滑鼠座標
         self.mouse_frame = ctk.CTkFrame(main, fg_color="transparent")
         coord_frame = ctk.CTkFrame(self.mouse_frame, fg_color="transparent")
@@ -116,9 +172,18 @@ class EventEditorDialog(ctk.CTkToplevel):
     def _on_type_change(self):
         t = self.type_var.get()
         self.key_frame.pack_forget()
+        self.text_frame.pack_forget()
+        self.call_frame.pack_forget()
+        self.repeat_frame.pack_forget()
         self.mouse_frame.pack_forget()
-        if t in ["key_press", "key_release"]:
+        if t in ["key_press", "key_release", "key_tap"]:
             self.key_frame.pack(fill="x", pady=10)
+        elif t == "text":
+            self.text_frame.pack(fill="x", pady=10)
+        elif t == "call":
+            self.call_frame.pack(fill="x", pady=10)
+        elif t == "repeat":
+            self.repeat_frame.pack(fill="x", pady=10)
         elif t in ["mouse_click", "mouse_release"]:
             self.mouse_frame.pack(fill="x", pady=10)
     
@@ -133,6 +198,24 @@ class EventEditorDialog(ctk.CTkToplevel):
                 self.result = MacroEvent(EventType.KEY_PRESS, 0, delay=delay, key=self.key_entry.get())
             elif t == "key_release":
                 self.result = MacroEvent(EventType.KEY_RELEASE, 0, delay=delay, key=self.key_entry.get())
+            elif t == "key_tap":
+                self.result = MacroEvent(EventType.KEY_TAP, 0, delay=delay, key=self.key_entry.get())
+            elif t == "text":
+                self.result = MacroEvent(EventType.TEXT, 0, delay=delay, text=self.text_entry.get(),
+                                        char_delay=max(0.0, float(self.char_delay_entry.get()) / 1000))
+            elif t == "call":
+                call_id = self.macro_choices.get(self.call_var.get())
+                if call_id is None:
+                    messagebox.showerror("錯誤", "請選擇要呼叫的巨集")
+                    return
+                self.result = MacroEvent(EventType.CALL, 0, delay=delay, call_id=call_id,
+                                        count=max(1, int(self.count_entry.get())))
+            elif t == "repeat":
+                self.result = MacroEvent(EventType.REPEAT, 0, delay=delay,
+                                        count=max(0, int(self.repeat_count_entry.get())),
+                                        gap=max(0.0, float(self.gap_entry.get()) / 1000))
+            elif t == "repeat_end":
+                self.result = MacroEvent(EventType.REPEAT_END, 0, delay=delay)
             elif t == "mouse_click":
                 self.result = MacroEvent(EventType.MOUSE_CLICK, 0, delay=delay,
                                         x=int(self.x_entry.get()), y=int(self.y_entry.get()),
@@ -164,45 +247,36 @@ class RecordingOverlay(ctk.CTkToplevel):
         ctk.CTkLabel(header, text="🔴 錄製中 - 按 F10 停止", font=ctk.CTkFont(size=14, weight="bold"),
                     text_color="#ef4444").pack(pady=15)
         
-        self.events_frame = ctk.CTkScrollableFrame(self, fg_color="transparent")
-        self.events_frame.pack(fill="both", expand=True, padx=10, pady=10)
-        
-        self.event_count = 0
+        # 虛擬化清單：長時間錄製也只會有一個畫面的列
+        self.events: list = []
+        self.events_list = VirtualListView(self, render_row=self._render_row, row_height=28,
+                                           font=styles.font(11),
+                                           colors={"background": "#0a0a0f", "row": "#12121a", "border": "#0a0a0f"})
+        self.events_list.pack(fill="both", expand=True, padx=10, pady=10)
+    
+    @property
+    def event_count(self) -> int:
+        return len(self.events)
+    
+    def _render_row(self, index: int) -> RowContent:
+        return RowContent(f"{index + 1}. {styles.format_event(self.events[index])}")
     
     def add_event(self, event: MacroEvent):
-        self.event_count += 1
-        icons = {
-            EventType.KEY_PRESS: "⌨️↓", EventType.KEY_RELEASE: "⌨️↑",
-            EventType.MOUSE_CLICK: "🖱️↓", EventType.MOUSE_RELEASE: "🖱️↑",
-            EventType.MOUSE_MOVE: "🖱️→", EventType.MOUSE_SCROLL: "🖱️⟳",
-            EventType.DELAY: "⏱️"
-        }
-        icon = icons.get(event.event_type, "❓")
-        
-        if event.event_type == EventType.DELAY:
-            desc = f"等待 {event.delay*1000:.0f} ms"
-        elif event.event_type in [EventType.KEY_PRESS, EventType.KEY_RELEASE]:
-            desc = event.key
-        elif event.event_type in [EventType.MOUSE_CLICK, EventType.MOUSE_RELEASE]:
-            desc = f"{event.button} ({event.x},{event.y})"
-        else:
-            desc = str(event.event_type.value)
-        
-        item = ctk.CTkFrame(self.events_frame, fg_color="#12121a", corner_radius=5, height=28)
-        item.pack(fill="x", pady=1)
-        item.pack_propagate(False)
-        
-        ctk.CTkLabel(item, text=f"{self.event_count}. {icon} {desc}", font=ctk.CTkFont(size=11),
-                    anchor="w").pack(side="left", padx=10)
-        
-        self.events_frame._parent_canvas.yview_moveto(1.0)
+        self.events.append(event)
+        self.events_list.set_row_count(len(self.events))
+        # 捲到最下方；沒有捲動時只需畫出新的一列
+        if not self.events_list.scroll_to(len(self.events) - 1):
+            self.events_list.refresh_rows([len(self.events) - 1])
 
 
 class MacroHubApp(ctk.CTk):
     """MacroHub 主應用程式"""
     
-    def __init__(self):
+    def __init__(self, startup: Optional[StartupTimer] = None, control: Optional[str] = None):
         super().__init__()
+        self._startup = startup or StartupTimer()
+        self._control_address = control
+        self.control_server = None
         self.title("🎮 MacroHub - 通用巨集管理器")
         self.geometry("1200x800")
         self.minsize(900, 600)
@@ -211,35 +285,55 @@ class MacroHubApp(ctk.CTk):
         self.recorder = MacroRecorder()
         self.player = MacroPlayer()
         
-        # 決定巨集儲存路徑
-        if getattr(sys, 'frozen', False):
-            # 如果是打包後的 EXE，儲存在 EXE 同級目錄
-            base_path = os.path.dirname(sys.executable)
-        else:
-            # 開發環境
-            base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            
-        self.manager = MacroManager(os.path.join(base_path, "macros"))
+        # 巨集檔在視窗顯示後才於背景載入
+        self.manager = open_macro_manager(default_base_path(), load=False)
         self.hotkey_manager = HotkeyManager()
+        self.library_watcher: Optional[LibraryWatcher] = None
+        self._startup.mark("建立管理器")
+        
+        # 呼叫事件在播放前解析（被呼叫的巨集變更時由 compiler.invalidate 失效）
+        self.compiler = PlanCompiler(self.manager)
+        self.player.plan_provider = self.compiler.link
         
         self.selected_macro: Optional[Macro] = None
+        self._library_keys: list = []  # 巨集清單排序鍵 (-created_time, name)
+        self._library_infos: dict = {}  # 名稱 -> MacroInfo
+        self._library_names: dict = {}  # id -> 名稱（顯示呼叫事件）
+        self._library_rows: list = self._library_keys  # 目前顯示的列（未篩選時就是 _library_keys）
+        self._library_picked: set = set()  # Ctrl/Shift 點擊多選的巨集名稱（匯出選取的巨集包）
+        self.search_index = MacroSearchIndex()
+        self._search_job = None
         self.recording_overlay: Optional[RecordingOverlay] = None
         self.tray_icon = None
         
+        # 播放進度（以固定頻率讀取播放器狀態，不由播放執行緒逐事件推送）
+        self._progress_job = None
+        self._progress_index: Optional[EventIndex] = None
+        self._progress_last = None
+        
         # 拖放排序相關
         self.drag_start_idx = None
-        self.drag_item = None
-        self.event_items = []  # 儲存事件項目的參考
+        self._drag_block: list = []  # 拖動中的事件索引（已排序）
+        self._drag_pending_select = None  # 按在多選區塊上，放開時若未拖動則改為單選
+        self._drag_last_y = 0
+        self._drag_scroll_job = None  # 自動捲動的 after 工作
+        self._displayed_events: list = []  # 事件清單目前顯示的事件序列
         
         # 多選和剪貼簿
         self.selected_indices = set()
         self.clipboard_events = []
         
+        # 復原/重做（切換巨集時清空）
+        self.edit_history = EditHistory()
+        self.event_index = EventIndex([])  # 目前巨集的事件搜尋索引
+        
         self._setup_callbacks()
         self._create_ui()
-        self._refresh_macro_list()
-        self._setup_hotkeys()
-        self._start_health_check()
+        self._startup.mark("建立介面")
+        
+        # 先讓視窗畫出來，巨集庫與熱鍵再於背景啟動
+        self.status_indicator.configure(text="⏳ 載入巨集庫...", text_color="#6366f1")
+        self.after_idle(self._on_first_paint)
         
         # 綁定鍵盤快捷鍵
         self.bind("<Up>", self._move_event_up)
@@ -248,6 +342,9 @@ class MacroHubApp(ctk.CTk):
         self.bind("<Control-c>", self._copy_events)
         self.bind("<Control-x>", self._cut_events)
         self.bind("<Control-v>", self._paste_events)
+        self.bind("<Control-z>", self._undo_edit)
+        self.bind("<Control-y>", self._redo_edit)
+        self.bind("<Control-Shift-Z>", self._redo_edit)
         
         self.protocol("WM_DELETE_WINDOW", self._on_close)
     
@@ -279,17 +376,93 @@ class MacroHubApp(ctk.CTk):
         # 每 60 秒檢查一次（配合 keyboard 庫的心跳機制）
         self.after(60000, self._check_health)
 
+    def _on_first_paint(self):
+        """視窗第一次繪製完成：在背景載入巨集庫並啟動熱鍵"""
+        self.update_idletasks()
+        self._startup.mark("首次繪製")
+        threading.Thread(target=self._load_library, daemon=True).start()
+    
+    def _load_library(self):
+        """背景執行緒：讀取巨集檔並註冊熱鍵（不碰任何 Tk 元件）"""
+        try:
+            with self._startup.phase("載入巨集庫"):
+                self.manager.ensure_loaded()
+        except Exception as e:
+            print(f"載入巨集庫失敗: {e}")
+        with self._startup.phase("啟動熱鍵"):
+            self._setup_hotkeys()
+        self.after(0, self._on_library_loaded)
+    
+    def _on_library_loaded(self):
+        """巨集庫載入完成（主執行緒）"""
+        self._refresh_macro_list()
+        self.status_indicator.configure(text="● 待命中", text_color="#22c55e")
+        self._start_health_check()
+        
+        # 監看巨集目錄，自動載入外部新增/修改的巨集
+        self.library_watcher = LibraryWatcher(
+            self.manager, on_change=lambda change: self.after(0, self._apply_library_change, change))
+        self.library_watcher.start()
+        
+        if self._control_address:
+            from core.control_server import ControlServer
+            try:
+                self.control_server = ControlServer(self.manager, self.player, self._control_address)
+                print(f"控制介面：{self.control_server.start()}")
+            except (OSError, ValueError) as e:
+                print(f"控制介面無法啟動: {e}")
+                self.control_server = None
+        
+        self._startup.mark("巨集清單")
+        print(self._startup.report())
+    
     def _setup_hotkeys(self):
-        """設定全域熱鍵"""
-        for macro in self.manager.get_all_macros():
-            if macro.trigger_key:
-                self.hotkey_manager.register_hotkey(macro.trigger_key, lambda m=macro: self._trigger_macro(m))
+        """設定全域熱鍵（只需要巨集摘要，觸發時才取得巨集）"""
+        for info in self.manager.get_all_infos():
+            if info.trigger_key:
+                self.hotkey_manager.register_hotkey(info.trigger_key,
+                                                    lambda name=info.name: self._trigger_macro_named(name))
         
         # 註冊緊急停止鍵（Escape）
         self.hotkey_manager.register_hotkey("escape", self._emergency_stop)
         
         self.hotkey_manager.start()
     
+    def _apply_library_change(self, change: LibraryChange):
+        """套用巨集目錄的外部變更（只重新註冊受影響的熱鍵）"""
+        for macro in change.removed + [m for pair in change.changed for m in pair]:
+            self.compiler.invalidate(macro.id)
+        for macro in change.removed + [old for old, _ in change.changed]:
+            if macro.trigger_key:
+                self.hotkey_manager.unregister_hotkey(macro.trigger_key)
+        for macro in change.added + [new for _, new in change.changed]:
+            if macro.trigger_key:
+                self.hotkey_manager.register_hotkey(macro.trigger_key, lambda m=macro: self._trigger_macro(m))
+        
+        # 更新目前選取的巨集
+        if self.selected_macro is not None:
+            replaced = {id(old): new for old, new in change.changed}
+            if id(self.selected_macro) in replaced:
+                self._select_macro(replaced[id(self.selected_macro)])
+            elif any(m is self.selected_macro for m in change.removed):
+                self.selected_macro = None
+                self.detail_frame.pack_forget()
+                self.no_selection_frame.pack(fill="both", expand=True)
+        
+        # 只更新變動的項目
+        for macro in change.removed:
+            self._library_remove(macro.name)
+        for old, new in change.changed:
+            self._library_update(new.name, old_name=old.name if old.name != new.name else None)
+        for macro in change.added:
+            self._library_update(macro.name)
+    
+    def _trigger_macro_named(self, name: str):
+        """通過熱鍵觸發巨集（依名稱取得目前的巨集）"""
+        macro = self.manager.get_macro(name)
+        if macro:
+            self._trigger_macro(macro)
+    
     def _trigger_macro(self, macro: Macro):
         """通過熱鍵觸發巨集"""
         # 檢查目標視窗
@@ -299,7 +472,10 @@ class MacroHubApp(ctk.CTk):
                 return
                 
         if not self.player.is_playing:
-            self.player.play(macro)
+            try:
+                self.player.play(macro)
+            except CompileError as e:
+                print(f"無法播放「{macro.name}」: {e}")
     
     def _emergency_stop(self):
         """緊急停止所有巨集並釋放按鍵"""
@@ -369,8 +545,23 @@ class MacroHubApp(ctk.CTk):
         ctk.CTkButton(list_header, text="+ 新增", width=70, height=30, fg_color="#6366f1",
                      hover_color="#4f46e5", command=self._start_recording).pack(side="right")
         
-        self.macro_list_frame = ctk.CTkScrollableFrame(left_panel, fg_color="transparent")
-        self.macro_list_frame.pack(fill="both", expand=True, padx=10, pady=(0, 15))
+        # 搜尋：輸入停頓後才查詢索引
+        self.macro_search_entry = ctk.CTkEntry(left_panel, height=32,
+                                               placeholder_text="🔍 搜尋名稱、key:f、trigger:f1、window:...")
+        self.macro_search_entry.pack(fill="x", padx=10, pady=(0, 8))
+        self.macro_search_entry.bind("<KeyRelease>", lambda e: self._schedule_macro_search())
+        
+        # 虛擬化清單：只繪製可見的巨集；資料由 _library_keys 依建立時間排序索引
+        list_area = ctk.CTkFrame(left_panel, fg_color="transparent")
+        list_area.pack(fill="both", expand=True, padx=10, pady=(0, 15))
+        self.macro_list = VirtualListView(
+            list_area, render_row=self._render_macro_row, row_height=66, row_gap=6,
+            font=styles.font(13, "bold"), subtitle_font=styles.font(10),
+            colors={"background": CMD_FG, "row": "#1a1a25", "border": "#1a1a25", "text": "#ffffff"})
+        self.macro_list.pack(fill="both", expand=True)
+        self.macro_list.on_press = self._on_macro_row_pressed
+        self.macro_list_empty = ctk.CTkLabel(list_area, text="尚無巨集\n點擊「+ 新增」開始",
+                                             font=ctk.CTkFont(size=12), text_color="#666")
         
         bottom = ctk.CTkFrame(left_panel, fg_color="transparent")
         bottom.pack(fill="x", padx=15, pady=15)
@@ -378,6 +569,15 @@ class MacroHubApp(ctk.CTk):
                      command=self._import_macro).pack(side="left")
         ctk.CTkButton(bottom, text="📤 匯出", width=100, height=35, fg_color="#1f1f2e",
                      command=self._export_macro).pack(side="right")
+        
+        bundle_row = ctk.CTkFrame(left_panel, fg_color="transparent")
+        bundle_row.pack(fill="x", padx=15, pady=(0, 15))
+        ctk.CTkButton(bundle_row, text="📦 匯入巨集包", width=100, height=30, fg_color="#1f1f2e",
+                     command=self._import_bundle).pack(side="left")
+        ctk.CTkButton(bundle_row, text="📦 匯出全部", width=100, height=30, fg_color="#1f1f2e",
+                     command=self._export_bundle).pack(side="right")
+        ctk.CTkButton(bundle_row, text="📦 匯出選取", width=100, height=30, fg_color="#1f1f2e",
+                     command=self._export_selected_bundle).pack(side="right", padx=(0, 5))
     
     def _create_detail_panel(self):
         right_panel = ctk.CTkFrame(self.content_frame, fg_color="#12121a", corner_radius=15)
@@ -488,6 +688,10 @@ class MacroHubApp(ctk.CTk):
                      command=self._insert_event).pack(side="left", padx=3)
         ctk.CTkButton(btn_frame, text="[ 編輯 ]", width=60, height=28, fg_color=CMD_BG, border_width=1, border_color=CMD_BORDER, text_color=CMD_TEXT, font=ctk.CTkFont(family=CMD_FONT_FAMILY, size=11), hover_color=CMD_HOVER,
                      command=self._edit_event).pack(side="left", padx=3)
+        ctk.CTkButton(btn_frame, text="🔁 重複", width=70, height=28, fg_color="#1f1f2e",
+                     hover_color="#3a3a45", command=self._wrap_repeat).pack(side="left", padx=3)
+        ctk.CTkButton(btn_frame, text="⚡ 最佳化", width=70, height=28, fg_color="#1f1f2e",
+                     hover_color="#3a3a45", command=self._optimize_events).pack(side="left", padx=3)
         ctk.CTkButton(btn_frame, text="🗑️ 刪除", width=70, height=28, fg_color="#1f1f2e",
                      hover_color="#dc2626", command=self._delete_event).pack(side="left", padx=3)
         
@@ -502,52 +706,199 @@ class MacroHubApp(ctk.CTk):
             ctk.CTkCheckBox(opts, text=txt, variable=var, font=ctk.CTkFont(size=11),
                            fg_color="#6366f1").pack(side="left", padx=5)
         
-        self.events_list = ctk.CTkScrollableFrame(events, fg_color="transparent")
-        self.events_list.pack(fill="both", expand=True, padx=10, pady=(10, 10))
+        # 尋找事件 / 依時間定位
+        find = ctk.CTkFrame(events, fg_color="transparent")
+        find.pack(fill="x", padx=15, pady=(8, 0))
+        self.find_entry = ctk.CTkEntry(find, height=28, fg_color="#12121a", border_color="#333",
+                                       placeholder_text="尋找：f、f #12、button:left、type:delay")
+        self.find_entry.pack(side="left", fill="x", expand=True)
+        self.find_entry.bind("<Return>", lambda e: self._find_event())
+        self.find_entry.bind("<Shift-Return>", lambda e: self._find_event(backwards=True))
+        ctk.CTkButton(find, text="◀", width=28, height=28, fg_color="#2a2a35", hover_color="#3a3a45",
+                     command=lambda: self._find_event(backwards=True)).pack(side="left", padx=(5, 0))
+        ctk.CTkButton(find, text="▶", width=28, height=28, fg_color="#2a2a35", hover_color="#3a3a45",
+                     command=self._find_event).pack(side="left", padx=(3, 0))
+        self.find_status = ctk.CTkLabel(find, text="", width=70, font=ctk.CTkFont(size=10), text_color="#888")
+        self.find_status.pack(side="left", padx=5)
+        self.goto_time_entry = ctk.CTkEntry(find, width=70, height=28, fg_color="#12121a", border_color="#333",
+                                            placeholder_text="秒")
+        self.goto_time_entry.pack(side="left")
+        self.goto_time_entry.bind("<Return>", lambda e: self._goto_time())
+        ctk.CTkButton(find, text="前往", width=45, height=28, fg_color="#2a2a35", hover_color="#3a3a45",
+                     command=self._goto_time).pack(side="left", padx=(3, 0))
+        
+        # 時間軸（滾輪捲動，Ctrl+滾輪縮放，點擊跳到該時間的事件）
+        self.timeline = TimelineView(events, height=110)
+        self.timeline.pack(fill="x", padx=10, pady=(8, 0))
+        self.timeline.on_seek = self._on_timeline_seek
+        
+        ctk.CTkLabel(events, text="💡 拖動事件可重新排序", font=ctk.CTkFont(size=10),
+                    text_color="#666").pack(anchor="w", padx=15, pady=(5, 0))
+        
+        # 虛擬化事件清單：只繪製可見的列
+        self.events_list = VirtualListView(events, render_row=self._render_event_row, row_height=34,
+                                           font=(CMD_FONT_FAMILY, 11))
+        self.events_list.pack(fill="both", expand=True, padx=10, pady=(5, 10))
+        self.events_list.on_press = lambda i, e: self._drag_start(e, i)
+        self.events_list.on_motion = self._drag_motion
+        self.events_list.on_release = self._drag_end
+        self.events_list.on_double_click = self._quick_edit_delay
         
         self.selected_event_idx = None
     
+    # ---- 巨集清單（依名稱索引，增量更新）----
+    
+    @staticmethod
+    def _library_key(info: MacroInfo) -> tuple:
+        """清單排序鍵：建立時間新的在前，同時間依名稱"""
+        return (-info.created_time, info.name)
+    
     def _refresh_macro_list(self):
-        for w in self.macro_list_frame.winfo_children():
-            w.destroy()
-        
-        macros = self.manager.get_all_macros()
-        if not macros:
-            ctk.CTkLabel(self.macro_list_frame, text="尚無巨集\n點擊「+ 新增」開始", font=ctk.CTkFont(size=12),
-                        text_color="#666").pack(pady=50)
+        """完整重建巨集清單（啟動或大量匯入時使用）"""
+        infos = self.manager.get_all_infos()
+        self._library_infos = {info.name: info for info in infos}
+        self._library_names = {info.id: info.name for info in infos}
+        self._library_keys = sorted(self._library_key(info) for info in infos)
+        self.search_index.rebuild(infos)
+        self._apply_macro_filter()
+    
+    def _schedule_macro_search(self):
+        if self._search_job is not None:
+            self.after_cancel(self._search_job)
+        self._search_job = self.after(150, self._run_macro_search)
+    
+    def _run_macro_search(self):
+        self._search_job = None
+        self.macro_list.scroll_offset = 0
+        self._apply_macro_filter()
+    
+    def _apply_macro_filter(self):
+        """依搜尋字串重新篩選顯示的列（只查詢索引，不載入事件）"""
+        matches = self.search_index.search(self.macro_search_entry.get())
+        if matches is None:
+            self._library_rows = self._library_keys
+        else:
+            self._library_rows = [key for key in self._library_keys if key[1] in matches]
+        self._sync_macro_list()
+        self.macro_list.refresh()
+    
+    def _library_index(self, name: str) -> Optional[int]:
+        """巨集在目前顯示的列中的位置"""
+        info = self._library_infos.get(name)
+        if info is None:
+            return None
+        key = self._library_key(info)
+        index = bisect.bisect_left(self._library_rows, key)
+        if index < len(self._library_rows) and self._library_rows[index] == key:
+            return index
+        return None
+    
+    def _library_upsert(self, info: MacroInfo, old_name: str = None):
+        """新增或更新單一巨集的列，只重繪位置有變動的範圍"""
+        removed_at = None
+        for name in dict.fromkeys((old_name, info.name)):
+            if name in self._library_infos:
+                index = bisect.bisect_left(self._library_keys, self._library_key(self._library_infos.pop(name)))
+                del self._library_keys[index]
+                removed_at = index if removed_at is None else min(removed_at, index)
+        
+        key = self._library_key(info)
+        inserted_at = bisect.bisect_left(self._library_keys, key)
+        self._library_keys.insert(inserted_at, key)
+        self._library_infos[info.name] = info
+        self._library_names[info.id] = info.name
+        self.search_index.update(info, old_name)
+        
+        if self._library_rows is not self._library_keys:
+            self._apply_macro_filter()  # 篩選中：重新套用（只重繪可見的列）
             return
-        
-        for macro in sorted(macros, key=lambda m: m.created_time, reverse=True):
-            self._create_macro_item(macro)
+        self._sync_macro_list()
+        if removed_at is None:
+            self.macro_list.refresh_range(inserted_at)  # 新項目：之後的列都往下移
+        else:
+            self.macro_list.refresh_range(min(removed_at, inserted_at), max(removed_at, inserted_at) + 1)
     
-    def _create_macro_item(self, macro: Macro):
-        item = ctk.CTkFrame(self.macro_list_frame, fg_color="#1a1a25", corner_radius=8, height=60)
-        item.pack(fill="x", pady=3)
-        item.pack_propagate(False)
-        item.bind("<Button-1>", lambda e, m=macro: self._select_macro(m))
-        
-        content = ctk.CTkFrame(item, fg_color="transparent")
-        content.pack(fill="both", expand=True, padx=12, pady=8)
-        content.bind("<Button-1>", lambda e, m=macro: self._select_macro(m))
-        
-        name_text = f"🎯 {macro.name}"
-        if macro.trigger_key:
-            name_text += f"  [{macro.trigger_key.upper()}]"
-        name = ctk.CTkLabel(content, text=name_text, font=ctk.CTkFont(size=13, weight="bold"), anchor="w")
-        name.pack(anchor="w")
-        name.bind("<Button-1>", lambda e, m=macro: self._select_macro(m))
-        
-        stats = f"📊 {macro.event_count} 事件 | ⏱️ {macro.total_duration:.1f}s"
-        if macro.loop_count != 1:
-            stats += f" | 🔄 {macro.loop_count if macro.loop_count > 0 else '∞'}"
-        stats_lbl = ctk.CTkLabel(content, text=stats, font=ctk.CTkFont(size=10), text_color="#888", anchor="w")
-        stats_lbl.pack(anchor="w")
-        stats_lbl.bind("<Button-1>", lambda e, m=macro: self._select_macro(m))
+    def _library_remove(self, name: str):
+        """移除單一巨集的列"""
+        info = self._library_infos.pop(name, None)
+        if info is None:
+            return
+        self._library_names.pop(info.id, None)
+        self._library_picked.discard(name)
+        index = bisect.bisect_left(self._library_keys, self._library_key(info))
+        del self._library_keys[index]
+        self.search_index.remove(name)
+        
+        if self._library_rows is not self._library_keys:
+            self._apply_macro_filter()
+            return
+        self._sync_macro_list()
+        self.macro_list.refresh_range(index)
+    
+    def _library_update(self, name: str, old_name: str = None):
+        """依管理器目前的資料更新單一巨集"""
+        info = self.manager.get_info(name)
+        if info is None:
+            self._library_remove(name)
+            if old_name:
+                self._library_remove(old_name)
+        else:
+            self._library_upsert(info, old_name)
+    
+    def _sync_macro_list(self):
+        """同步列數、選取狀態與空清單提示（不重繪）"""
+        self.macro_list.set_row_count(len(self._library_rows))
+        self.macro_list.selection = self._library_selection()
+        if self._library_rows:
+            self.macro_list_empty.place_forget()
+        else:
+            self.macro_list_empty.configure(
+                text="找不到符合的巨集" if self._library_keys else "尚無巨集\n點擊「+ 新增」開始")
+            self.macro_list_empty.place(relx=0.5, rely=0.2, anchor="n")
+    
+    def _render_macro_row(self, index: int) -> RowContent:
+        info = self._library_infos[self._library_rows[index][1]]
+        return RowContent(styles.macro_title_text(info), subtitle=styles.macro_stats_text(info))
+    
+    def _library_selection(self) -> set:
+        """巨集清單中要標示為選取的列：目前開啟的巨集與多選的巨集"""
+        names = set(self._library_picked)
+        if self.selected_macro:
+            names.add(self.selected_macro.name)
+        indices = (self._library_index(name) for name in names)
+        return {index for index in indices if index is not None}
+    
+    def _on_macro_row_pressed(self, index: int, event):
+        """一般點擊開啟巨集；Ctrl 點擊切換多選，Shift 點擊選取到目前巨集為止的範圍"""
+        if event.state & 0x4:
+            name = self._library_rows[index][1]
+            self._library_picked ^= {name}
+        elif event.state & 0x1:
+            anchor = self._library_index(self.selected_macro.name) if self.selected_macro else None
+            anchor = index if anchor is None else anchor
+            low, high = min(anchor, index), max(anchor, index)
+            self._library_picked = {key[1] for key in self._library_rows[low:high + 1]}
+        else:
+            self._library_picked = set()
+            self._on_macro_row_clicked(index)
+            return
+        self.macro_list.set_selection(self._library_selection())
+    
+    def _on_macro_row_clicked(self, index: int):
+        macro = self.manager.get_macro(self._library_rows[index][1])
+        if macro:
+            self._select_macro(macro)
     
     def _select_macro(self, macro: Macro):
+        if macro is not self.selected_macro:
+            self.edit_history.clear()
         self.selected_macro = macro
+        self.event_index = EventIndex(macro.events)
+        self.timeline.set_events(macro.events)
+        self.timeline.set_cursor(None)
         self.selected_event_idx = None
         self.selected_indices = set()
+        self.macro_list.set_selection(self._library_selection())
         self.no_selection_frame.pack_forget()
         self.detail_frame.pack(fill="both", expand=True)
         
@@ -590,105 +941,169 @@ class MacroHubApp(ctk.CTk):
         # Bug fix: Removed undefined macro reference
     
     def _update_events_list(self, events: list, preserve_scroll: bool = False, scroll_to_index: int = None):
-        # 保存目前滾動位置
-        scroll_pos = 0.0
-        try:
-            if preserve_scroll:
-                scroll_pos = self.events_list._parent_canvas.yview()[0]
-        except:
-            pass
-        
-        # 清除舊內容
-        for w in self.events_list.winfo_children():
-            w.destroy()
-        
-        self.event_items = []
-        
-        # 提示標籤
-        if events:
-            ctk.CTkLabel(self.events_list, text="💡 拖動事件可重新排序", font=ctk.CTkFont(size=10),
-                        text_color="#666").pack(anchor="w", pady=(0, 5))
-        
-        # 限制顯示數量以提升性能
-        display_count = min(len(events), 200)
-        
-        for i in range(display_count):
-            item = self._create_event_item(events[i], i)
-            self.event_items.append(item)
-        
-        if len(events) > display_count:
-            ctk.CTkLabel(self.events_list, text=f"... 還有 {len(events) - display_count} 個事件",
-                        font=ctk.CTkFont(size=11), text_color="#666").pack(pady=10)
-        
-        # 刷新佈局
-        self.events_list.update_idletasks()
+        self._displayed_events = events
+        self.events_list.set_row_count(len(events))
+        self.events_list.selection = {i for i in self.selected_indices if i < len(events)}
         
         # 恢復滾動位置或滾動到指定索引
-        try:
-            if scroll_to_index is not None and len(self.event_items) > 0:
-                # 滾動到指定索引的位置
-                ratio = scroll_to_index / max(len(events), 1)
-                self.events_list._parent_canvas.yview_moveto(ratio)
-            elif preserve_scroll:
-                self.events_list._parent_canvas.yview_moveto(scroll_pos)
-            else:
-                self.events_list._parent_canvas.yview_moveto(0.0)
-        except:
-            pass
+        if scroll_to_index is not None and events:
+            self.events_list.scroll_to(min(scroll_to_index, len(events) - 1))
+        else:
+            if not preserve_scroll:
+                self.events_list.scroll_offset = 0
+            self.events_list.refresh()
 
-    def _create_event_item(self, event: MacroEvent, index: int):
-        icons = {EventType.KEY_PRESS: "⌨️↓", EventType.KEY_RELEASE: "⌨️↑", EventType.MOUSE_CLICK: "🖱️↓",
-                EventType.MOUSE_RELEASE: "🖱️↑", EventType.MOUSE_MOVE: "🖱️→", EventType.MOUSE_SCROLL: "🖱️⟳",
-                EventType.DELAY: "⏱️"}
-        icon = icons.get(event.event_type, "❓")
+    def _patch_events_list(self, start: int, end: int = None, scroll_to_index: int = None):
+        """
+        增量更新事件清單（不重建）
+        只重繪 [start, end) 中可見的列；插入/刪除時 end 為 None，之後的編號會一併更新
+        """
+        events = self.selected_macro.events
+        self._displayed_events = events
+        self.events_list.set_row_count(len(events))
+        
+        if scroll_to_index is not None and events and \
+                self.events_list.scroll_to(min(scroll_to_index, len(events) - 1), refresh=False):
+            # 需要捲動時整個可見範圍本來就要重繪
+            self.events_list.selection = set(self.selected_indices)
+            self.events_list.refresh()
+            return
         
-        if event.event_type == EventType.DELAY:
-            desc = f"等待 {event.delay*1000:.0f} ms"
-        elif event.event_type in [EventType.KEY_PRESS, EventType.KEY_RELEASE]:
-            desc = event.key
-        elif event.event_type in [EventType.MOUSE_CLICK, EventType.MOUSE_RELEASE]:
-            desc = f"{event.button} ({event.x},{event.y})"
+        self.events_list.patch(start, end, self.selected_indices)
+    
+    def _apply_edit(self, op: EditOp, anchor_offset: int = None):
+        """執行編輯操作（記入復原歷史）並增量更新清單"""
+        selection = self.edit_history.apply(self.selected_macro, op)
+        self._after_edit(op, selection, anchor_offset)
+    
+    def _after_edit(self, op: EditOp, selection: list, anchor_offset: int = None):
+        """依操作影響的範圍更新選取與清單"""
+        self.selected_indices = set(selection)
+        if selection:
+            self.selected_event_idx = selection[anchor_offset] if anchor_offset is not None else selection[-1]
         else:
-            desc = str(event.event_type.value) if event.event_type else "未知"
-        
-        item = ctk.CTkFrame(self.events_list, fg_color=CMD_BG, corner_radius=0, height=32, border_width=1, border_color="#333333")
-        item.pack(fill="x", pady=1)
-        item.pack_propagate(False)
-        item.event_index = index  # 儲存索引
-        
-        # 點擊選中
-        item.bind("<Button-1>", lambda e, i=index: self._select_event(i, item, e))
-        
-        # 雙擊快速編輯延遲
-        item.bind("<Double-Button-1>", lambda e, i=index: self._quick_edit_delay(i))
-        
-        # 拖放事件
-        item.bind("<ButtonPress-1>", lambda e, i=index: self._drag_start(e, i, item))
-        item.bind("<B1-Motion>", self._drag_motion)
-        item.bind("<ButtonRelease-1>", self._drag_end)
-        
-        label = ctk.CTkLabel(item, text=f"[{index+1:03d}] {icon} {desc}", font=ctk.CTkFont(size=11, family=CMD_FONT_FAMILY), text_color=CMD_TEXT,
-                    anchor="w")
-        label.pack(side="left", padx=10)
-        label.bind("<ButtonPress-1>", lambda e, i=index: self._drag_start(e, i, item))
-        label.bind("<B1-Motion>", self._drag_motion)
-        label.bind("<ButtonRelease-1>", self._drag_end)
-        label.bind("<Double-Button-1>", lambda e, i=index: self._quick_edit_delay(i))
-        
+            self.selected_event_idx = None
+        start, end = op.span()
+        self.compiler.invalidate(self.selected_macro.id)  # 呼叫這個巨集的巨集需要重新展開
+        self.event_index.invalidate(start)
+        self.timeline.invalidate()
+        self._patch_events_list(start, end, scroll_to_index=self.selected_event_idx)
+    
+    def _undo_edit(self, event=None):
+        """Ctrl+Z: 復原"""
+        if not self.selected_macro or isinstance(self.focus_get(), tk.Entry):
+            return
+        result = self.edit_history.undo(self.selected_macro)
+        if result:
+            self._after_edit(*result)
+            self._update_event_stats()
+    
+    def _redo_edit(self, event=None):
+        """Ctrl+Y: 重做"""
+        if not self.selected_macro or isinstance(self.focus_get(), tk.Entry):
+            return
+        result = self.edit_history.redo(self.selected_macro)
+        if result:
+            self._after_edit(*result)
+            self._update_event_stats()
+    
+    def _optimize_events(self):
+        """精簡目前巨集的事件（不改變播放結果，可復原）"""
+        if not self.selected_macro:
+            return
+        events, report = optimize_events(self.selected_macro.events)
+        if not report.changed:
+            self._show_clipboard_status("⚡ 已是最精簡")
+            return
+        self._apply_edit(ReplaceRange.between(self.selected_macro.events, events))
+        self._update_event_stats()
+        self._show_clipboard_status(f"⚡ 事件 {report.events_before} → {report.events_after}")
+        print(report.summary())
+    
+    def _wrap_repeat(self):
+        """把選取的連續事件包成重複區塊（不複製事件，可復原）"""
+        if not self.selected_macro or not self.selected_indices:
+            messagebox.showinfo("提示", "請先選擇要重複的事件")
+            return
+        first, last = min(self.selected_indices), max(self.selected_indices)
+        if last - first + 1 != len(self.selected_indices):
+            messagebox.showinfo("提示", "請選擇連續的事件")
+            return
+        text = ctk.CTkInputDialog(text="重複次數：", title="重複區塊").get_input()
+        if not text:
+            return
+        try:
+            count = int(text)
+        except ValueError:
+            messagebox.showerror("錯誤", "請輸入有效數值")
+            return
+        block = self.selected_macro.events[first:last + 1]
+        events = [MacroEvent(EventType.REPEAT, 0, count=max(0, count)), *block, MacroEvent(EventType.REPEAT_END, 0)]
+        self._apply_edit(ReplaceRange(first, last + 1, events))
+        self._update_event_stats()
+    
+    def _update_event_stats(self):
+        self.stats_label.configure(text=f"📊 {self.selected_macro.event_count} 個事件 | ⏱️ {self.selected_macro.total_duration:.2f} 秒")
+    
+    def _jump_to_event(self, index: int):
+        """選取並捲動到指定事件"""
+        self.selected_indices = {index}
+        self.selected_event_idx = index
+        self.timeline.set_cursor(self.event_index.time_of(index))
+        if not self.events_list.scroll_to(index):
+            self.events_list.set_selection(self.selected_indices)
+        else:
+            self.events_list.selection = set(self.selected_indices)
+            self.events_list.refresh()
+    
+    def _on_timeline_seek(self, seconds: float):
+        index = self.event_index.index_at_time(seconds)
+        if index is not None:
+            self._jump_to_event(index)
+    
+    def _find_event(self, backwards: bool = False):
+        """尋找下一個（或第 n 個）符合的事件"""
+        if not self.selected_macro:
+            return "break"
+        term, nth = parse_event_query(self.find_entry.get())
+        if term is None:
+            return "break"
+        if nth is not None:
+            index = self.event_index.nth(term, nth)
+        else:
+            index = self.event_index.find_next(term, self.selected_event_idx, backwards=backwards)
+        
+        total = self.event_index.count(term)
+        if index is None:
+            self.find_status.configure(text=f"找不到 (共 {total})", text_color="#ef4444")
+            return "break"
+        self._jump_to_event(index)
+        self.find_status.configure(text=f"{self.event_index.occurrence(term, index)} / {total}",
+                                   text_color="#888")
+        return "break"
+    
+    def _goto_time(self):
+        """跳到指定時間點執行的事件"""
+        if not self.selected_macro:
+            return
+        try:
+            seconds = float(self.goto_time_entry.get())
+        except ValueError:
+            messagebox.showerror("錯誤", "請輸入有效的秒數")
+            return
+        index = self.event_index.index_at_time(seconds)
+        if index is not None:
+            self._jump_to_event(index)
+            self.find_status.configure(text=f"{self.event_index.time_of(index):.2f}s", text_color="#888")
+    
+    def _render_event_row(self, index: int) -> RowContent:
+        """事件清單的列內容（只在該列可見時呼叫）"""
+        event = self._displayed_events[index]
         # 延遲事件顯示可編輯提示
         if event.event_type == EventType.DELAY:
-            delay_label = ctk.CTkLabel(item, text="(雙擊編輯)", font=ctk.CTkFont(size=9),
-                        text_color="#6366f1")
-        else:
-            delay_label = ctk.CTkLabel(item, text="", font=ctk.CTkFont(size=10),
-                        text_color="#666")
-        delay_label.pack(side="right", padx=10)
-        delay_label.bind("<ButtonPress-1>", lambda e, i=index: self._drag_start(e, i, item))
-        delay_label.bind("<B1-Motion>", self._drag_motion)
-        delay_label.bind("<ButtonRelease-1>", self._drag_end)
-        delay_label.bind("<Double-Button-1>", lambda e, i=index: self._quick_edit_delay(i))
-        
-        return item
+            return RowContent(styles.event_row_text(index, event), styles.DELAY_HINT, styles.DELAY_HINT_COLOR)
+        depth = self.event_index.depth(index) if self._displayed_events is self.event_index.events else 0
+        return RowContent(styles.event_row_text(index, event, self._library_names, depth))
     
     def _quick_edit_delay(self, index: int):
         """快速編輯延遲事件"""
@@ -714,79 +1129,91 @@ class MacroHubApp(ctk.CTk):
             try:
                 new_ms = int(result)
                 if new_ms >= 0:
-                    event.delay = new_ms / 1000
-                    self._update_events_list(self.selected_macro.events, scroll_to_index=index)
+                    # 事件物件不可變（可能與剪貼簿共用），以新物件取代
+                    self._apply_edit(ReplaceEvent(index, dataclasses.replace(event, delay=new_ms / 1000)))
                     self.stats_label.configure(text=f"📊 {self.selected_macro.event_count} 事件")
             except ValueError:
                 messagebox.showerror("錯誤", "請輸入有效的數字")
     
-    def _drag_start(self, event, index, item):
+    def _drag_start(self, event, index):
         """開始拖動"""
+        # 按在已選取的多選區塊上時保留選取，拖動整個區塊
+        modifiers = event is not None and event.state & 0x5
+        block_press = not modifiers and index in self.selected_indices and len(self.selected_indices) > 1
+        if not block_press:
+            self._select_event(index, event)
+        else:
+            self.focus_set()
+        self._drag_pending_select = index if block_press else None
+        
+        # 按住 Shift/Ctrl 時只做多選，不拖動
+        if modifiers:
+            self.drag_start_idx = None
+            return
         self.drag_start_idx = index
-        self.drag_item = item
-        self._select_event(index, item)
-        item.configure(fg_color="#4f46e5")
+        self._drag_block = sorted(self.selected_indices)
+        self._drag_last_y = event.y if event is not None else 0
+        self.events_list.set_dragging(self._drag_block)
+    
+    def _drag_target(self, y: int):
+        """依座標計算拖放目標，落在拖動區塊內則無目標"""
+        target = self.events_list.index_at(y, clamp=True)
+        if target is None or target in self.events_list.dragging:
+            return None
+        return target
     
     def _drag_motion(self, event):
         """拖動中"""
-        if self.drag_item is None or not self.event_items:
+        if self.drag_start_idx is None:
             return
         
-        # 計算滑鼠相對位置，決定目標位置
-        try:
-            y = event.widget.winfo_rooty() + event.y
-            
-            for i, item in enumerate(self.event_items):
-                if item == self.drag_item:
-                    continue
-                item_y = item.winfo_rooty()
-                item_h = item.winfo_height()
-                
-                # 判斷滑鼠是否在這個項目的範圍內
-                if item_y < y < item_y + item_h:
-                    # 高亮顯示目標位置
-                    item.configure(fg_color="#2a3a5e")
-                else:
-                    if hasattr(item, 'event_index') and item.event_index == self.selected_event_idx:
-                        item.configure(fg_color="#2a2a4e")
-                    else:
-                        item.configure(fg_color="#12121a")
-        except:
-            pass
+        self._drag_last_y = event.y
+        # 高亮顯示目標位置（只重新上色新舊目標列）
+        self.events_list.set_drop_target(self._drag_target(event.y))
+        
+        # 拖出清單上下緣時自動捲動
+        if self._drag_scroll_job is None:
+            self._drag_autoscroll()
+    
+    def _drag_autoscroll(self):
+        """拖動時游標在清單外就持續捲動"""
+        self._drag_scroll_job = None
+        if self.drag_start_idx is None:
+            return
+        if self.events_list.edge_scroll(self._drag_last_y):
+            self.events_list.set_drop_target(self._drag_target(self._drag_last_y))
+            self._drag_scroll_job = self.after(30, self._drag_autoscroll)
     
     def _drag_end(self, event):
         """結束拖動"""
-        if self.drag_item is None or self.drag_start_idx is None or not self.selected_macro:
-            self.drag_item = None
-            self.drag_start_idx = None
+        start_idx = self.drag_start_idx
+        block = self._drag_block
+        pending_select = self._drag_pending_select
+        self.drag_start_idx = None
+        self._drag_block = []
+        self._drag_pending_select = None
+        if self._drag_scroll_job is not None:
+            self.after_cancel(self._drag_scroll_job)
+            self._drag_scroll_job = None
+        
+        target_idx = self._drag_target(event.y) if start_idx is not None else None
+        self.events_list.set_drop_target(None)
+        self.events_list.set_dragging(())
+        
+        if start_idx is None or not self.selected_macro:
             return
         
-        try:
-            y = event.widget.winfo_rooty() + event.y
-            target_idx = self.drag_start_idx
-            
-            for i, item in enumerate(self.event_items):
-                item_y = item.winfo_rooty()
-                item_h = item.winfo_height()
-                
-                if item_y < y < item_y + item_h:
-                    target_idx = i
-                    break
-            
-            # 如果位置改變，重新排序
-            if target_idx != self.drag_start_idx:
-                events = self.selected_macro.events
-                moved_event = events.pop(self.drag_start_idx)
-                events.insert(target_idx, moved_event)
-                self.selected_event_idx = target_idx
-                self._update_events_list(events, scroll_to_index=target_idx)
-        except:
-            pass
-        
-        self.drag_item = None
-        self.drag_start_idx = None
+        if target_idx is None:
+            # 在多選區塊上點一下但沒有拖動：改為單選
+            if pending_select is not None and self.events_list.index_at(event.y) == pending_select:
+                self._select_event(pending_select)
+            return
+        
+        # 重新排序：區塊移到目標列之前（往上拖）或之後（往下拖）
+        op = MoveEvents(block, target_idx, after=target_idx > start_idx)
+        self._apply_edit(op, anchor_offset=block.index(start_idx))
     
-    def _select_event(self, index: int, item, event=None):
+    def _select_event(self, index: int, event=None):
         # 處理多選邏輯
         if event:
             # Windows/Linux: Shift=0x1, Ctrl=0x4
@@ -825,16 +1252,13 @@ class MacroHubApp(ctk.CTk):
             self.selected_event_idx = index
 
         self._update_selection_visuals()
+        self.timeline.set_cursor(self.event_index.time_of(index))
         # 確保視窗獲得焦點以接收鍵盤事件
         self.focus_set()
         
     def _update_selection_visuals(self):
         """更新所有事件項目的選中狀態顏色"""
-        for i, item in enumerate(self.event_items):
-            if i in self.selected_indices:
-                item.configure(fg_color="#2a2a4e") # 選中顏色
-            else:
-                item.configure(fg_color="#12121a") # 預設顏色
+        self.events_list.set_selection(self.selected_indices)
     
     def _move_event_up(self, event=None):
         """按上鍵將選中事件向上移動"""
@@ -843,15 +1267,9 @@ class MacroHubApp(ctk.CTk):
         if self.selected_event_idx <= 0:
             return  # 已經在最上面
         
-        events = self.selected_macro.events
+        # 與上一個事件交換位置（只有交換的兩列需要重繪）
         idx = self.selected_event_idx
-        # 交換位置
-        events[idx], events[idx - 1] = events[idx - 1], events[idx]
-        self.selected_event_idx = idx - 1
-        self._update_events_list(events, scroll_to_index=idx - 1)
-        # 重新選中
-        if self.event_items and self.selected_event_idx < len(self.event_items):
-            self.event_items[self.selected_event_idx].configure(fg_color="#2a2a4e")
+        self._apply_edit(MoveEvents([idx], idx - 1))
     
     def _move_event_down(self, event=None):
         """按下鍵將選中事件向下移動"""
@@ -860,41 +1278,33 @@ class MacroHubApp(ctk.CTk):
         if self.selected_event_idx >= len(self.selected_macro.events) - 1:
             return  # 已經在最下面
         
-        events = self.selected_macro.events
+        # 與下一個事件交換位置（只有交換的兩列需要重繪）
         idx = self.selected_event_idx
-        # 交換位置
-        events[idx], events[idx + 1] = events[idx + 1], events[idx]
-        self.selected_event_idx = idx + 1
-        self._update_events_list(events, scroll_to_index=idx + 1)
-        # 重新選中
-        if self.event_items and self.selected_event_idx < len(self.event_items):
-            self.event_items[self.selected_event_idx].configure(fg_color="#2a2a4e")
+        self._apply_edit(MoveEvents([idx], idx + 1, after=True))
     
     def _delete_event_key(self, event=None):
         """按 Delete 鍵刪除選中事件"""
         if not self.selected_macro or not self.selected_indices:
             return
             
-        events = self.selected_macro.events
-        # 從後往前刪除，避免索引偏移
-        for idx in sorted(list(self.selected_indices), reverse=True):
-            if idx < len(events):
-                del events[idx]
-        
-        self.selected_indices.clear()
-        self.selected_event_idx = None
-        self._update_events_list(events, preserve_scroll=True)
+        self._remove_selected_events()
         self.stats_label.configure(text=f"📊 {self.selected_macro.event_count} 個事件 | ⏱️ {self.selected_macro.total_duration:.2f} 秒")
     
+    def _remove_selected_events(self):
+        """刪除選中的事件（可復原），只重繪第一個被刪除的位置之後的列"""
+        count = self.selected_macro.event_count
+        op = RemoveEvents([idx for idx in self.selected_indices if idx < count])
+        self._apply_edit(op)
+        return op.events
+    
     def _insert_event(self):
         if not self.selected_macro:
             return
-        dialog = EventEditorDialog(self, insert_mode=True)
+        dialog = EventEditorDialog(self, insert_mode=True, macro_choices=self._call_choices())
         self.wait_window(dialog)
-        if dialog.result:
+        if dialog.result and self._check_call(dialog.result):
             idx = (self.selected_event_idx + 1) if self.selected_event_idx is not None else len(self.selected_macro.events)
-            self.selected_macro.events.insert(idx, dialog.result)
-            self._update_events_list(self.selected_macro.events, scroll_to_index=idx)
+            self._apply_edit(InsertEvents(idx, [dialog.result]))
             self.stats_label.configure(text=f"📊 {self.selected_macro.event_count} 個事件 | ⏱️ {self.selected_macro.total_duration:.2f} 秒")
     
     def _edit_event(self):
@@ -905,11 +1315,25 @@ class MacroHubApp(ctk.CTk):
         # 使用集合中的唯一索引
         idx = list(self.selected_indices)[0]
         event = self.selected_macro.events[idx]
-        dialog = EventEditorDialog(self, event=event)
+        dialog = EventEditorDialog(self, event=event, macro_choices=self._call_choices())
         self.wait_window(dialog)
-        if dialog.result:
-            self.selected_macro.events[self.selected_event_idx] = dialog.result
-            self._update_events_list(self.selected_macro.events, scroll_to_index=idx)
+        if dialog.result and self._check_call(dialog.result):
+            self._apply_edit(ReplaceEvent(idx, dialog.result))
+    
+    def _call_choices(self) -> Dict[str, str]:
+        """目前巨集可以呼叫的巨集（名稱 -> id）"""
+        return {info.name: info.id for info in self._library_infos.values() if info.id != self.selected_macro.id}
+    
+    def _check_call(self, event: MacroEvent) -> bool:
+        """呼叫事件不能造成循環呼叫"""
+        if event.event_type != EventType.CALL:
+            return True
+        try:
+            self.compiler.link(Macro(self.selected_macro.name, [event], id=self.selected_macro.id))
+            return True
+        except CompileError as e:
+            messagebox.showerror("錯誤", str(e))
+            return False
     
     def _delete_event(self):
         if not self.selected_macro:
@@ -923,14 +1347,7 @@ class MacroHubApp(ctk.CTk):
                  return
 
         if messagebox.askyesno("確認", f"確定刪除選中的 {len(self.selected_indices)} 個事件？"):
-            events = self.selected_macro.events
-            for idx in sorted(list(self.selected_indices), reverse=True):
-                if idx < len(events):
-                    del events[idx]
-            
-            self.selected_indices.clear()
-            self.selected_event_idx = None
-            self._update_events_list(events, preserve_scroll=True)
+            self._remove_selected_events()
             self.stats_label.configure(text=f"📊 {self.selected_macro.event_count} 個事件 | ⏱️ {self.selected_macro.total_duration:.2f} 秒")
 
     def _copy_events(self, event=None):
@@ -938,17 +1355,14 @@ class MacroHubApp(ctk.CTk):
         if not self.selected_macro or not self.selected_indices:
             return
         
-        # 排序索引以保證順序
-        indices = sorted(list(self.selected_indices))
+        # 排序索引以保證順序；事件物件不可變，直接共用不必深複製
         events = self.selected_macro.events
-        
-        self.clipboard_events = []
-        import copy
-        for idx in indices:
-            if idx < len(events):
-                self.clipboard_events.append(copy.deepcopy(events[idx]))
-        
-        self.status_indicator.configure(text=f"📋 已複製 {len(self.clipboard_events)} 個事件", text_color="#6366f1")
+        self.clipboard_events = [events[idx] for idx in sorted(self.selected_indices) if idx < len(events)]
+        self._show_clipboard_status(f"📋 已複製 {len(self.clipboard_events)} 個事件")
+    
+    def _show_clipboard_status(self, text: str):
+        """顯示剪貼簿操作的狀態訊息，2 秒後恢復"""
+        self.status_indicator.configure(text=text, text_color="#6366f1")
         self.after(2000, lambda: self.status_indicator.configure(text="● 待命中", text_color="#22c55e"))
 
     def _cut_events(self, event=None):
@@ -956,16 +1370,9 @@ class MacroHubApp(ctk.CTk):
         if not self.selected_macro or not self.selected_indices:
             return
             
-        self._copy_events()
-        # 靜默執行刪除
-        events = self.selected_macro.events
-        for idx in sorted(list(self.selected_indices), reverse=True):
-            if idx < len(events):
-                del events[idx]
-        
-        self.selected_indices.clear()
-        self.selected_event_idx = None
-        self._update_events_list(events, preserve_scroll=True)
+        # 被刪除的事件直接放入剪貼簿
+        self.clipboard_events = self._remove_selected_events()
+        self._show_clipboard_status(f"📋 已剪下 {len(self.clipboard_events)} 個事件")
         self.stats_label.configure(text=f"📊 {self.selected_macro.event_count} 個事件 | ⏱️ {self.selected_macro.total_duration:.2f} 秒")
 
     def _paste_events(self, event=None):
@@ -973,32 +1380,18 @@ class MacroHubApp(ctk.CTk):
         if not self.selected_macro or not self.clipboard_events:
             return
             
-        events = self.selected_macro.events
-        
         # 決定插入位置：如果在最後選擇的事件後面，或者列表末尾
         if self.selected_event_idx is not None:
              insert_pos = self.selected_event_idx + 1
         else:
-             insert_pos = len(events)
-             
-        import copy
-        new_events = [copy.deepcopy(e) for e in self.clipboard_events]
-        
-        for i, new_event in enumerate(new_events):
-            events.insert(insert_pos + i, new_event)
-            
-        self._update_events_list(events, scroll_to_index=insert_pos)
-        self.stats_label.configure(text=f"📊 {self.selected_macro.event_count} 個事件 | ⏱️ {self.selected_macro.total_duration:.2f} 秒")
+             insert_pos = len(self.selected_macro.events)
         
         # 選中新貼上的事件
-        self.selected_indices.clear()
-        for i in range(len(new_events)):
-            self.selected_indices.add(insert_pos + i)
-        self.selected_event_idx = insert_pos + len(new_events) - 1 if new_events else insert_pos
-        self._update_selection_visuals()
+        new_events = list(self.clipboard_events)
+        self._apply_edit(InsertEvents(insert_pos, new_events))
+        self.stats_label.configure(text=f"📊 {self.selected_macro.event_count} 個事件 | ⏱️ {self.selected_macro.total_duration:.2f} 秒")
         
-        self.status_indicator.configure(text=f"📋 已貼上 {len(new_events)} 個事件", text_color="#6366f1")
-        self.after(2000, lambda: self.status_indicator.configure(text="● 待命中", text_color="#22c55e"))
+        self._show_clipboard_status(f"📋 已貼上 {len(new_events)} 個事件")
     
     def _append_recording(self):
         """追加錄製：在現有巨集末尾繼續錄製"""
@@ -1043,12 +1436,12 @@ class MacroHubApp(ctk.CTk):
                 else:
                     insert_idx = len(macro.events)
                 
-                # 插入新事件
-                for i, event in enumerate(new_events):
-                    macro.events.insert(insert_idx + i, event)
+                # 插入新事件（可復原）
+                if macro is self.selected_macro:
+                    self._apply_edit(InsertEvents(insert_idx, new_events))
+                else:
+                    macro.insert_events(insert_idx, new_events)
                 
-                # 更新顯示
-                # Bug fix: Removed undefined macro reference
                 self.stats_label.configure(text=f"📊 {macro.event_count} 個事件 | ⏱️ {macro.total_duration:.2f} 秒")
                 
                 messagebox.showinfo("完成", f"已追加 {len(new_events)} 個事件\n記得點擊「儲存」保存變更")
@@ -1087,7 +1480,7 @@ class MacroHubApp(ctk.CTk):
                 if name:
                     macro = self.recorder.create_macro(name)
                     self.manager.save_macro(macro)
-                    self._refresh_macro_list()
+                    self._library_update(macro.name)
                     self._select_macro(macro)
                     messagebox.showinfo("完成", f"已儲存「{name}」({len(macro.events)} 事件)")
         self.after(100, update)
@@ -1107,16 +1500,76 @@ class MacroHubApp(ctk.CTk):
             self.status_indicator.configure(text="▶️ 播放中...", text_color="#6366f1")
             
             # 使用線程啟動，避免卡住 GUI
-            threading.Thread(target=lambda: self.player.play(self.selected_macro), daemon=True).start()
+            threading.Thread(target=self._play_in_background, args=(self.selected_macro,), daemon=True).start()
             
         except ValueError:
             messagebox.showerror("錯誤", "設定值必須為數字")
     
+    def _play_in_background(self, macro: Macro):
+        try:
+            self.player.play(macro)
+        except CompileError as e:
+            self.after(0, self._on_play_failed, str(e))
+    
+    def _on_play_failed(self, message: str):
+        self.play_btn.configure(state="normal")
+        self.stop_btn.configure(state="disabled")
+        self.status_indicator.configure(text="● 待命中", text_color="#22c55e")
+        messagebox.showerror("無法播放", message)
+    
     def _stop_macro(self):
         self.player.stop()
     
     def _on_play_started(self, macro):
-        pass
+        self.after(0, self._start_playback_progress, macro)
+    
+    def _start_playback_progress(self, macro: Macro):
+        """開始顯示播放進度"""
+        # 時間累計值：播放中的巨集就是目前編輯的巨集時直接共用其索引
+        self._progress_index = self.event_index if macro is self.selected_macro else EventIndex(macro.events)
+        self._progress_last = None
+        if self._progress_job is None:
+            self._poll_playback()
+    
+    def _poll_playback(self):
+        """定時讀取播放器狀態並更新畫面（只在進度有變化時重繪）"""
+        self._progress_job = None
+        player = self.player
+        macro = player.current_macro
+        if not player.is_playing or macro is None or self._progress_index is None:
+            self._stop_playback_progress()
+            return
+        
+        index, loop = player.current_index, player.current_loop
+        if (macro, index, loop) != self._progress_last:
+            self._progress_last = (macro, index, loop)
+            self._show_playback_progress(macro, index, loop)
+        self._progress_job = self.after(PROGRESS_INTERVAL_MS, self._poll_playback)
+    
+    def _show_playback_progress(self, macro: Macro, index: int, loop: int):
+        offsets = self._progress_index
+        speed = self.player.speed_multiplier or 1.0
+        elapsed = (offsets.time_of(index) if index >= 0 else 0.0) / speed
+        total = offsets.total_duration / speed
+        loops = f"{loop + 1}/{macro.loop_count}" if macro.loop_count > 0 else f"{loop + 1}/∞"
+        self.status_indicator.configure(
+            text=f"▶️ {max(index + 1, 0)}/{macro.event_count} | 🔄 {loops} | {elapsed:.1f}s / {total:.1f}s",
+            text_color="#6366f1")
+        
+        if macro is self.selected_macro and index < macro.event_count:
+            playing = index if index >= 0 else None
+            self.events_list.set_playing(playing)
+            if playing is not None:
+                self.events_list.scroll_to(playing)
+                self.timeline.set_cursor(self.event_index.time_of(playing))
+    
+    def _stop_playback_progress(self):
+        if self._progress_job is not None:
+            self.after_cancel(self._progress_job)
+            self._progress_job = None
+        self._progress_index = None
+        self._progress_last = None
+        self.events_list.set_playing(None)
     
     def _on_play_stopped(self):
         self.after(100, lambda: (self.play_btn.configure(state="normal"), self.stop_btn.configure(state="disabled"),
@@ -1133,16 +1586,21 @@ class MacroHubApp(ctk.CTk):
             
             old_name = self.selected_macro.name
             old_key = self.selected_macro.trigger_key
+            loop_count = int(self.loop_count_entry.get())
+            loop_delay = float(self.loop_delay_entry.get())
+            renamed = new_name != old_name
+            
+            # 名稱已屬於其他巨集時直接拒絕（不修改巨集、熱鍵與清單）
+            if renamed and self.manager.name_conflict(self.selected_macro, new_name) is not None:
+                messagebox.showerror("錯誤", f"名稱「{new_name}」已被其他巨集使用")
+                return
             
             self.selected_macro.name = new_name
             self.selected_macro.trigger_key = self.hotkey_entry.get().strip() or None
-            self.selected_macro.loop_count = int(self.loop_count_entry.get())
-            self.selected_macro.loop_delay = float(self.loop_delay_entry.get())
+            self.selected_macro.loop_count = loop_count
+            self.selected_macro.loop_delay = loop_delay
             self.selected_macro.target_window = self.target_window_entry.get().strip()
             
-            if old_name != new_name:
-                self.manager.delete_macro(old_name)
-            
             # 更新熱鍵
             if old_key:
                 self.hotkey_manager.unregister_hotkey(old_key)
@@ -1150,12 +1608,25 @@ class MacroHubApp(ctk.CTk):
                 self.hotkey_manager.register_hotkey(self.selected_macro.trigger_key,
                                                    lambda m=self.selected_macro: self._trigger_macro(m))
             
-            self.manager.save_macro(self.selected_macro)
-            self._refresh_macro_list()
-            messagebox.showinfo("完成", "已儲存")
+            # 改名與儲存在背景以單一交易完成（先寫新檔再刪舊檔）
+            name = new_name
+            self.manager.save_macro_async(
+                self.selected_macro, old_name=old_name if renamed else None,
+                callback=lambda ok: self.after(0, self._on_macro_saved, name, ok))
+            self._library_upsert(self.selected_macro.to_info(), old_name if renamed else None)
+            self.status_indicator.configure(text="💾 儲存中...", text_color="#6366f1")
         except ValueError:
             messagebox.showerror("錯誤", "請輸入有效數值")
     
+    def _on_macro_saved(self, name: str, success: bool):
+        """背景儲存完成回調（主執行緒）"""
+        if success:
+            self.status_indicator.configure(text=f"💾 已儲存「{name}」", text_color="#22c55e")
+            self.after(2000, lambda: self.status_indicator.configure(text="● 待命中", text_color="#22c55e"))
+        else:
+            self.status_indicator.configure(text="● 待命中", text_color="#22c55e")
+            messagebox.showerror("錯誤", f"儲存「{name}」失敗")
+    
     def _delete_macro(self):
         if not self.selected_macro:
             return
@@ -1163,32 +1634,137 @@ class MacroHubApp(ctk.CTk):
             if self.selected_macro.trigger_key:
                 self.hotkey_manager.unregister_hotkey(self.selected_macro.trigger_key)
             self.manager.delete_macro(self.selected_macro.name)
+            self.compiler.invalidate(self.selected_macro.id)
+            self._library_remove(self.selected_macro.name)
             self.selected_macro = None
             self.detail_frame.pack_forget()
             self.no_selection_frame.pack(fill="both", expand=True)
-            self._refresh_macro_list()
     
     def _import_macro(self):
-        path = filedialog.askopenfilename(title="選擇檔案", filetypes=[("JSON", "*.json")])
-        if path:
-            macro = self.manager.import_macro(path)
-            if macro:
-                self._refresh_macro_list()
-                self._select_macro(macro)
-                messagebox.showinfo("完成", f"已匯入「{macro.name}」")
+        path = filedialog.askopenfilename(title="選擇檔案", filetypes=MACRO_FILE_TYPES)
+        if not path:
+            return
+        
+        self._run_background("📥 匯入中...", lambda progress: self.manager.import_macro(path, progress=progress),
+                             self._on_macro_imported)
+    
+    def _on_macro_imported(self, macro: Optional[Macro]):
+        """匯入完成回調（主執行緒）"""
+        if macro:
+            self._library_update(macro.name)
+            self._select_macro(macro)
+            messagebox.showinfo("完成", f"已匯入「{macro.name}」")
+        else:
+            messagebox.showerror("錯誤", "匯入失敗")
     
     def _export_macro(self):
         if not self.selected_macro:
             messagebox.showwarning("提示", "請先選擇巨集")
             return
         path = filedialog.asksaveasfilename(title="儲存", defaultextension=".json",
-                                           initialfile=f"{self.selected_macro.name}.json")
+                                           initialfile=f"{self.selected_macro.name}.json",
+                                           filetypes=MACRO_FILE_TYPES)
         if path:
             self.manager.export_macro(self.selected_macro.name, path)
             messagebox.showinfo("完成", f"已匯出至 {path}")
     
+    def _import_bundle(self):
+        path = filedialog.askopenfilename(title="選擇巨集包", filetypes=BUNDLE_FILE_TYPES)
+        if not path:
+            return
+        
+        def task(progress):
+            try:
+                return self.manager.import_bundle(path, progress=progress)
+            except Exception as e:
+                print(f"匯入巨集包失敗: {e}")
+                return e
+        
+        self._run_background("📦 匯入中...", task, self._on_bundle_imported)
+    
+    def _on_bundle_imported(self, macros):
+        """巨集包匯入完成回調（主執行緒）；macros 為例外時表示檔案無法讀取"""
+        if isinstance(macros, Exception):
+            messagebox.showerror("錯誤", f"匯入巨集包失敗：{macros}")
+            return
+        for macro in macros:
+            if macro.trigger_key:
+                self.hotkey_manager.register_hotkey(macro.trigger_key, lambda m=macro: self._trigger_macro(m))
+        if len(macros) > 20:
+            self._refresh_macro_list()
+        else:
+            for macro in macros:
+                self._library_update(macro.name)
+        messagebox.showinfo("完成", f"已匯入 {len(macros)} 個巨集")
+    
+    def _export_selected_bundle(self):
+        """匯出巨集清單中選取的巨集（Ctrl/Shift 點擊多選）"""
+        names = [key[1] for key in self._library_keys
+                 if key[1] in self._library_picked or (self.selected_macro and key[1] == self.selected_macro.name)]
+        if not names:
+            messagebox.showwarning("提示", "請先在清單中選擇巨集（Ctrl/Shift+點擊可多選）")
+            return
+        initialfile = f"{names[0]}.mhz" if len(names) == 1 else "macros.mhz"
+        self._export_bundle(names, initialfile)
+    
+    def _export_bundle(self, names: list = None, initialfile: str = "macros.mhz"):
+        """匯出巨集包；names 為 None 時匯出整個巨集庫"""
+        if names is None:
+            names = self.manager.get_all_names()
+        if not names:
+            messagebox.showwarning("提示", "沒有可匯出的巨集")
+            return
+        path = filedialog.asksaveasfilename(title="匯出巨集包", defaultextension=".mhz",
+                                           initialfile=initialfile, filetypes=BUNDLE_FILE_TYPES)
+        if not path:
+            return
+        
+        def task(progress):
+            try:
+                return self.manager.export_bundle(names, path, progress=progress)
+            except Exception as e:
+                print(f"匯出巨集包失敗: {e}")
+                return None
+        
+        def done(count):
+            if count is None:
+                messagebox.showerror("錯誤", "匯出巨集包失敗")
+            else:
+                messagebox.showinfo("完成", f"已匯出 {count} 個巨集至 {path}")
+        
+        self._run_background("📦 匯出中...", task, done)
+    
+    def _run_background(self, label: str, task, on_done):
+        """
+        在背景執行緒執行耗時工作
+        task(progress) 的進度顯示在狀態列，完成後在主執行緒呼叫 on_done(結果)
+        """
+        self.status_indicator.configure(text=f"{label} 0%", text_color="#6366f1")
+        last_percent = [-1]
+        
+        def progress(done, total):
+            # 只在百分比變化時更新 GUI
+            percent = done * 100 // max(total, 1)
+            if percent != last_percent[0]:
+                last_percent[0] = percent
+                self.after(0, lambda: self.status_indicator.configure(text=f"{label} {percent}%"))
+        
+        def finish(result):
+            self.status_indicator.configure(text="● 待命中", text_color="#22c55e")
+            on_done(result)
+        
+        def run():
+            result = task(progress)
+            self.after(0, finish, result)
+        
+        threading.Thread(target=run, daemon=True).start()
+    
     def _minimize_to_tray(self):
         """最小化到系統托盤"""
+        # 托盤與繪圖套件只在第一次最小化時載入
+        import pystray
+        from PIL import Image, ImageDraw
+        
         self.withdraw()
         
         # 建立托盤圖示
@@ -1216,7 +1792,12 @@ class MacroHubApp(ctk.CTk):
         self.after(0, self._cleanup_and_quit)
     
     def _cleanup_and_quit(self):
+        if self.control_server:
+            self.control_server.stop()
+        if self.library_watcher:
+            self.library_watcher.stop()
         self.hotkey_manager.stop()
+        self.manager.close()
         self.destroy()
     
     def _on_close(self):
@@ -1226,8 +1807,8 @@ class MacroHubApp(ctk.CTk):
             self._cleanup_and_quit()
 
 
-def main():
-    app = MacroHubApp()
+def main(startup: Optional[StartupTimer] = None, control: Optional[str] = None):
+    app = MacroHubApp(startup, control)
     app.mainloop()
 
 
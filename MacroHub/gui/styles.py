@@ -0,0 +1,85 @@
+"""
+GUI 共用樣式與資源快取
+字型物件、事件圖示與列文字格式集中在這裡，清單繪製時不再重複建立
+"""
+from functools import lru_cache
+from typing import Mapping, Optional
+import customtkinter as ctk
+
+from core.recorder import EventType, MacroEvent, MacroInfo
+
+
+EVENT_ICONS = {
+    EventType.KEY_PRESS: "⌨️↓", EventType.KEY_RELEASE: "⌨️↑", EventType.KEY_TAP: "⌨️↕",
+    EventType.MOUSE_CLICK: "🖱️↓", EventType.MOUSE_RELEASE: "🖱️↑",
+    EventType.MOUSE_MOVE: "🖱️→", EventType.MOUSE_SCROLL: "🖱️⟳",
+    EventType.DELAY: "⏱️", EventType.TEXT: "📝", EventType.CALL: "📞",
+    EventType.REPEAT: "🔁", EventType.REPEAT_END: "🔚",
+}
+UNKNOWN_ICON = "❓"
+
+TEXT_PREVIEW_LENGTH = 24  # 文字事件說明最多顯示的字數
+
+DELAY_HINT = "(雙擊編輯)"
+DELAY_HINT_COLOR = "#6366f1"
+
+
+@lru_cache(maxsize=None)
+def font(size: int = 12, weight: str = "normal", family: Optional[str] = None) -> ctk.CTkFont:
+    """
+    共用的字型物件（需在主視窗建立後呼叫）
+    相同參數返回同一個 CTkFont，避免每列各建立一個 Tk 字型
+    """
+    if family is None:
+        return ctk.CTkFont(size=size, weight=weight)
+    return ctk.CTkFont(family=family, size=size, weight=weight)
+
+
+def describe_event(event: MacroEvent, macro_names: Optional[Mapping[str, str]] = None) -> str:
+    """事件的簡短說明文字（macro_names：巨集 id -> 名稱，用於顯示呼叫事件）"""
+    if event.event_type == EventType.DELAY:
+        return f"等待 {event.delay*1000:.0f} ms"
+    if event.event_type in (EventType.KEY_PRESS, EventType.KEY_RELEASE, EventType.KEY_TAP):
+        return str(event.key)
+    if event.event_type in (EventType.MOUSE_CLICK, EventType.MOUSE_RELEASE):
+        return f"{event.button} ({event.x},{event.y})"
+    if event.event_type == EventType.TEXT:
+        text = (event.text or "").replace("\n", "⏎")
+        if len(text) > TEXT_PREVIEW_LENGTH:
+            text = text[:TEXT_PREVIEW_LENGTH] + "…"
+        return f"「{text}」({len(event.text or '')} 字)"
+    if event.event_type == EventType.CALL:
+        name = (macro_names or {}).get(event.call_id) or "（找不到巨集）"
+        return f"{name} ×{event.count}" if event.count != 1 else name
+    if event.event_type == EventType.REPEAT:
+        text = f"重複 ×{event.count}"
+        return text + f"（每輪間隔 {event.gap*1000:.0f} ms）" if event.gap > 0 else text
+    if event.event_type == EventType.REPEAT_END:
+        return "重複結束"
+    return str(event.event_type.value) if event.event_type else "未知"
+
+
+def format_event(event: MacroEvent, macro_names: Optional[Mapping[str, str]] = None) -> str:
+    """圖示 + 說明"""
+    return f"{EVENT_ICONS.get(event.event_type, UNKNOWN_ICON)} {describe_event(event, macro_names)}"
+
+
+def event_row_text(index: int, event: MacroEvent, macro_names: Optional[Mapping[str, str]] = None,
+                   depth: int = 0) -> str:
+    """事件清單的列文字（depth：所在的重複區塊層數，以縮排表示）"""
+    return f"[{index+1:03d}] {'│ ' * depth}{format_event(event, macro_names)}"
+
+
+def macro_title_text(info: MacroInfo) -> str:
+    """巨集清單的標題列"""
+    if info.trigger_key:
+        return f"🎯 {info.name}  [{info.trigger_key.upper()}]"
+    return f"🎯 {info.name}"
+
+
+def macro_stats_text(info: MacroInfo) -> str:
+    """巨集清單的統計列"""
+    stats = f"📊 {info.event_count} 事件 | ⏱️ {info.total_duration:.1f}s"
+    if info.loop_count != 1:
+        stats += f" | 🔄 {info.loop_count if info.loop_count > 0 else '∞'}"
+    return stats
@@ -0,0 +1,287 @@
+"""
+時間軸檢視 - 在單一 Canvas 上以時間軸畫出巨集
+按鍵按住區間、滑鼠點擊、滾輪與延遲各佔一列；
+可見範圍內的項目過多時改畫分箱統計（細節層級），繪製成本只與畫面寬度有關
+"""
+import bisect
+import math
+import tkinter as tk
+from typing import Callable, List, NamedTuple, Optional, Tuple
+import customtkinter as ctk
+
+from core.recorder import EventType, MacroEvent, advance_time, finish_time
+
+
+class Span(NamedTuple):
+    start: float
+    end: float
+    label: str
+
+
+class TimelineData:
+    """
+    時間軸資料：各類別依開始時間排序的陣列
+    starts/ends 分開存放，讓可見範圍與分箱都能用二分搜尋計算
+    """
+
+    def __init__(self, events: List[MacroEvent]):
+        self.keys: List[Span] = []
+        self.delays: List[Span] = []
+        self.clicks: List[Tuple[float, str]] = []
+        self.scrolls: List[float] = []
+
+        time = 0.0
+        frames = ()
+        held = {}
+        for event in events:
+            start = time
+            closing = frames[-1] if event.event_type == EventType.REPEAT_END and frames else None
+            time, after, frames = advance_time(event, time, frames)
+            if event.event_type == EventType.KEY_PRESS:
+                held.setdefault(event.key, time)
+            elif event.event_type == EventType.KEY_TAP:
+                self.keys.append(Span(time, time, event.key or ""))
+            elif event.event_type == EventType.TEXT:
+                self.keys.append(Span(time, after, event.text or ""))
+            elif event.event_type == EventType.KEY_RELEASE:
+                pressed = held.pop(event.key, None)
+                if pressed is not None:
+                    self.keys.append(Span(pressed, time, event.key or ""))
+            elif event.event_type == EventType.MOUSE_CLICK:
+                self.clicks.append((time, event.button or ""))
+            elif event.event_type == EventType.MOUSE_SCROLL:
+                self.scrolls.append(time)
+            elif event.event_type == EventType.DELAY and event.delay > 0:
+                self.delays.append(Span(start, time, ""))
+            elif closing is not None and after > time:
+                # 重複區塊只畫第一輪，其餘各輪在延遲列畫成一段
+                self.delays.append(Span(time, after, f"×{closing[0]}"))
+            time = after
+        time = finish_time(time, frames)
+        for key, pressed in held.items():  # 沒有放開的按鍵畫到結尾
+            self.keys.append(Span(pressed, time, key or ""))
+
+        self.duration = time
+        self.keys.sort()
+        self.delays.sort()
+        self.key_starts = [span.start for span in self.keys]
+        # 最長按住時間：可見範圍往前多找這麼久，才不會漏掉跨越左邊界的區間
+        self.max_key_length = max((span.end - span.start for span in self.keys), default=0.0)
+        self.delay_starts = [span.start for span in self.delays]
+        self.max_delay_length = max((span.end - span.start for span in self.delays), default=0.0)
+        self.click_times = [t for t, _ in self.clicks]
+
+
+LANES = [("鍵盤", "#6366f1"), ("點擊", "#22c55e"), ("滾輪", "#eab308"), ("延遲", "#555566")]
+
+
+class TimelineView(ctk.CTkFrame):
+    """
+    時間軸元件
+    滾輪水平捲動、Ctrl+滾輪以游標為中心縮放；點擊時呼叫 on_seek(秒)
+    """
+
+    LABEL_WIDTH = 44
+    MAX_ITEMS = 1500  # 可見項目超過此數量時改畫分箱統計
+    BIN_PIXELS = 3
+
+    def __init__(self, master, height: int = 110, **kwargs):
+        kwargs.setdefault("fg_color", "transparent")
+        super().__init__(master, height=height, **kwargs)
+
+        self.on_seek: Optional[Callable[[float], None]] = None
+        self._data: Optional[TimelineData] = None
+        self._events: List[MacroEvent] = []
+        self._dirty = False
+        self._redraw_job = None
+        self._start = 0.0  # 左邊界時間（秒）
+        self._scale = 50.0  # 每秒像素
+        self._cursor: Optional[float] = None
+        self._hovered = False
+
+        self.canvas = tk.Canvas(self, height=height, bg="#000000", highlightthickness=0, bd=0)
+        self.canvas.pack(fill="both", expand=True)
+        self.canvas.bind("<Configure>", lambda e: self.redraw())
+        self.canvas.bind("<ButtonPress-1>", self._on_click)
+        self.canvas.bind("<Enter>", lambda e: setattr(self, "_hovered", True))
+        self.canvas.bind("<Leave>", lambda e: setattr(self, "_hovered", False))
+        self.canvas.bind_all("<MouseWheel>", self._on_mousewheel, add="+")
+        self.canvas.bind_all("<Button-4>", self._on_mousewheel, add="+")
+        self.canvas.bind_all("<Button-5>", self._on_mousewheel, add="+")
+
+    # ---- 資料 ----
+
+    def set_events(self, events: List[MacroEvent], fit: bool = True):
+        """設定要顯示的事件（重新建立時間軸資料）"""
+        self._events = events
+        self._data = TimelineData(events)
+        self._dirty = False
+        if fit:
+            self.fit()
+        else:
+            self.redraw()
+
+    def invalidate(self):
+        """事件已被編輯，稍後重新建立資料（連續編輯只重建一次）"""
+        self._dirty = True
+        if self._redraw_job is None:
+            self._redraw_job = self.after(250, self._rebuild)
+
+    def _rebuild(self):
+        self._redraw_job = None
+        if self._dirty:
+            self.set_events(self._events, fit=False)
+
+    def set_cursor(self, seconds: Optional[float]):
+        """標示目前時間（選取的事件或播放位置）"""
+        self._cursor = seconds
+        self.canvas.delete("cursor")
+        self._draw_cursor()
+
+    # ---- 座標 ----
+
+    def _plot_width(self) -> int:
+        return max(self.canvas.winfo_width() - self.LABEL_WIDTH, 1)
+
+    def _x(self, seconds: float) -> float:
+        return self.LABEL_WIDTH + (seconds - self._start) * self._scale
+
+    def _time_at(self, x: float) -> float:
+        return self._start + (x - self.LABEL_WIDTH) / self._scale
+
+    def fit(self):
+        """縮放到整個巨集"""
+        duration = self._data.duration if self._data else 0.0
+        self._start = 0.0
+        self._scale = self._plot_width() / duration if duration > 0 else 50.0
+        self.redraw()
+
+    def _clamp(self):
+        duration = self._data.duration if self._data else 0.0
+        visible = self._plot_width() / self._scale
+        self._start = min(max(self._start, 0.0), max(duration - visible, 0.0))
+
+    def _on_mousewheel(self, event):
+        if not self._hovered or not self._data:
+            return
+        if event.num == 4:
+            direction = 1
+        elif event.num == 5:
+            direction = -1
+        else:
+            direction = 1 if event.delta > 0 else -1
+
+        if event.state & 0x4:
+            # Ctrl+滾輪：以游標位置為中心縮放
+            anchor = self._time_at(event.x)
+            min_scale = self._plot_width() / max(self._data.duration, 1e-3)
+            self._scale = min(max(self._scale * (1.25 if direction > 0 else 0.8), min_scale), 5000.0)
+            self._start = anchor - (event.x - self.LABEL_WIDTH) / self._scale
+        else:
+            self._start -= direction * self._plot_width() / self._scale / 10
+        self.redraw()
+
+    def _on_click(self, event):
+        if self.on_seek and self._data and event.x >= self.LABEL_WIDTH:
+            self.on_seek(max(self._time_at(event.x), 0.0))
+
+    # ---- 繪製 ----
+
+    def redraw(self):
+        """重畫可見範圍"""
+        canvas = self.canvas
+        canvas.delete("all")
+        if not self._data:
+            return
+        self._clamp()
+
+        height = max(canvas.winfo_height(), 1)
+        lane_height = (height - 16) / len(LANES)
+        t0 = self._start
+        t1 = self._time_at(canvas.winfo_width())
+
+        for i, (name, _) in enumerate(LANES):
+            y = 16 + i * lane_height
+            canvas.create_text(4, y + lane_height / 2, text=name, anchor="w", fill="#888888",
+                               font=("Consolas", 9))
+            canvas.create_line(self.LABEL_WIDTH, y, canvas.winfo_width(), y, fill="#1a1a25")
+
+        self._draw_axis(t0, t1)
+        data = self._data
+        lanes = [16 + i * lane_height for i in range(len(LANES))]
+        self._draw_spans(data.keys, data.key_starts, data.max_key_length, t0, t1,
+                         lanes[0], lane_height, LANES[0][1], show_labels=True)
+        self._draw_points(data.click_times, t0, t1, lanes[1], lane_height, LANES[1][1])
+        self._draw_points(data.scrolls, t0, t1, lanes[2], lane_height, LANES[2][1])
+        self._draw_spans(data.delays, data.delay_starts, data.max_delay_length, t0, t1,
+                         lanes[3], lane_height, LANES[3][1], show_labels=True)
+        self._draw_cursor()
+
+    def _draw_axis(self, t0: float, t1: float):
+        """時間刻度：依縮放挑選 1/2/5 × 10^n 的間距"""
+        span = max(t1 - t0, 1e-6)
+        raw = span / 8
+        power = 10 ** math.floor(math.log10(raw))
+        step = next(m * power for m in (1, 2, 5, 10) if m * power >= raw)
+        tick = math.ceil(t0 / step) * step
+        while tick <= t1:
+            x = self._x(tick)
+            self.canvas.create_line(x, 12, x, 16, fill="#555555")
+            label = f"{tick:.0f}s" if step >= 1 else f"{tick:.2f}s"
+            self.canvas.create_text(x, 6, text=label, fill="#666666", font=("Consolas", 8))
+            tick += step
+
+    def _visible_range(self, starts: List[float], max_length: float, t0: float, t1: float) -> Tuple[int, int]:
+        return bisect.bisect_left(starts, t0 - max_length), bisect.bisect_right(starts, t1)
+
+    def _draw_spans(self, spans: List[Span], starts: List[float], max_length: float, t0: float, t1: float,
+                    y: float, height: float, color: str, show_labels: bool = False):
+        first, last = self._visible_range(starts, max_length, t0, t1)
+        if last - first > self.MAX_ITEMS:
+            self._draw_bins(starts, t0, t1, y, height, color)
+            return
+        top, bottom = y + 3, y + height - 3
+        for span in spans[first:last]:
+            if span.end < t0:
+                continue
+            x0, x1 = self._x(span.start), max(self._x(span.end), self._x(span.start) + 1)
+            self.canvas.create_rectangle(x0, top, x1, bottom, fill=color, outline="")
+            if show_labels and x1 - x0 > 24:
+                self.canvas.create_text(x0 + 3, (top + bottom) / 2, text=span.label, anchor="w",
+                                        fill="#ffffff", font=("Consolas", 8))
+
+    def _draw_points(self, times: List[float], t0: float, t1: float, y: float, height: float, color: str):
+        first, last = bisect.bisect_left(times, t0), bisect.bisect_right(times, t1)
+        if last - first > self.MAX_ITEMS:
+            self._draw_bins(times, t0, t1, y, height, color)
+            return
+        top, bottom = y + 3, y + height - 3
+        for t in times[first:last]:
+            x = self._x(t)
+            self.canvas.create_line(x, top, x, bottom, fill=color, width=2)
+
+    def _draw_bins(self, times: List[float], t0: float, t1: float, y: float, height: float, color: str):
+        """分箱統計：每個箱以二分搜尋計數，高度取對數"""
+        bins = max(int(self._plot_width() / self.BIN_PIXELS), 1)
+        width = (t1 - t0) / bins
+        counts = []
+        edge = bisect.bisect_left(times, t0)
+        for b in range(bins):
+            nxt = bisect.bisect_left(times, t0 + (b + 1) * width, edge)
+            counts.append(nxt - edge)
+            edge = nxt
+        peak = math.log1p(max(counts, default=0)) or 1.0
+        bottom = y + height - 2
+        for b, count in enumerate(counts):
+            if count:
+                x = self.LABEL_WIDTH + b * self.BIN_PIXELS
+                bar = (height - 5) * math.log1p(count) / peak
+                self.canvas.create_rectangle(x, bottom - bar, x + self.BIN_PIXELS - 1, bottom,
+                                             fill=color, outline="")
+
+    def _draw_cursor(self):
+        if self._cursor is None or not self._data:
+            return
+        x = self._x(self._cursor)
+        if self.LABEL_WIDTH <= x <= self.canvas.winfo_width():
+            self.canvas.create_line(x, 0, x, self.canvas.winfo_height(), fill="#ef4444", tags="cursor")
@@ -0,0 +1,379 @@
+"""
+虛擬化清單元件 - 以單一 Canvas 繪製，只為可見的列建立圖元並重複使用
+"""
+import tkinter as tk
+from typing import Callable, Iterable, List, NamedTuple, Optional, Set, Tuple
+import customtkinter as ctk
+
+
+class RowContent(NamedTuple):
+    """一列要顯示的內容"""
+    text: str
+    hint: str = ""
+    hint_color: str = "#666666"
+    subtitle: str = ""  # 第二行文字（空字串時主文字垂直置中）
+
+
+DEFAULT_COLORS = {
+    "background": "#000000",
+    "row": "#000000",
+    "border": "#333333",
+    "text": "#cccccc",
+    "subtitle": "#888888",
+    "selected": "#2a2a4e",
+    "playing": "#14532d",
+    "drop_target": "#2a3a5e",
+    "dragging": "#4f46e5",
+}
+
+
+class VirtualListView(ctk.CTkFrame):
+    """
+    虛擬化清單
+    資料由 render_row(index) 提供，清單本身只記錄列數與選取狀態；
+    每次重繪只處理視窗內可見的列，成本與資料量無關
+    """
+
+    def __init__(self, master, render_row: Callable[[int], RowContent], row_height: int = 34,
+                 font=("Consolas", 11), hint_font=("Consolas", 9), subtitle_font=("Consolas", 9),
+                 row_gap: int = 0, colors: Optional[dict] = None, **kwargs):
+        kwargs.setdefault("fg_color", "transparent")
+        super().__init__(master, **kwargs)
+
+        self.render_row = render_row
+        self.row_height = row_height
+        self.font = font
+        self.hint_font = hint_font
+        self.subtitle_font = subtitle_font
+        self.row_gap = row_gap  # 列與列之間的間距（卡片樣式）
+        self.colors = dict(DEFAULT_COLORS, **(colors or {}))
+
+        self.row_count = 0
+        self.selection: Set[int] = set()
+        self.drop_target: Optional[int] = None
+        self.dragging: Set[int] = set()  # 正在拖動的列
+        self.playing: Optional[int] = None  # 正在播放的列
+
+        # 滑鼠回調（index 為 None 表示點在列外）
+        self.on_press: Optional[Callable[[int, tk.Event], None]] = None
+        self.on_motion: Optional[Callable[[tk.Event], None]] = None
+        self.on_release: Optional[Callable[[tk.Event], None]] = None
+        self.on_double_click: Optional[Callable[[int], None]] = None
+
+        self._offset = 0.0  # 捲動位置（像素）
+        self._slots: List[Tuple[int, int, int, int]] = []  # 重複使用的 (底框, 文字, 提示, 副標題) 圖元
+        self._hovered = False
+
+        self.canvas = tk.Canvas(self, bg=self.colors["background"], highlightthickness=0, bd=0)
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True)
+
+        self.canvas.bind("<Configure>", lambda e: self.refresh())
+        self.canvas.bind("<ButtonPress-1>", self._on_press)
+        self.canvas.bind("<B1-Motion>", self._on_motion)
+        self.canvas.bind("<ButtonRelease-1>", self._on_release)
+        self.canvas.bind("<Double-Button-1>", self._on_double_click)
+        self.canvas.bind("<Enter>", lambda e: setattr(self, "_hovered", True))
+        self.canvas.bind("<Leave>", lambda e: setattr(self, "_hovered", False))
+        # 滾輪事件在 Windows 上送往焦點視窗，因此綁在全域並檢查游標是否在清單上
+        self.canvas.bind_all("<MouseWheel>", self._on_mousewheel, add="+")
+        self.canvas.bind_all("<Button-4>", self._on_mousewheel, add="+")
+        self.canvas.bind_all("<Button-5>", self._on_mousewheel, add="+")
+
+    # ---- 資料 ----
+
+    def set_row_count(self, count: int):
+        """設定列數（不重繪）"""
+        self.row_count = count
+        self.selection = {i for i in self.selection if i < count}
+
+    def set_selection(self, indices: Iterable[int]):
+        """設定選取的列，只重新上色狀態有變化的列"""
+        selection = set(indices)
+        changed = selection ^ self.selection
+        self.selection = selection
+        for index in changed:
+            self.repaint_row(index)
+
+    def set_drop_target(self, index: Optional[int]):
+        """設定拖放目標列，只重新上色新舊兩列"""
+        old = self.drop_target
+        if index == old:
+            return
+        self.drop_target = index
+        for row in (old, index):
+            if row is not None:
+                self.repaint_row(row)
+
+    def set_playing(self, index: Optional[int]):
+        """標示正在播放的列，只重新上色新舊兩列"""
+        old = self.playing
+        if index == old:
+            return
+        self.playing = index
+        for row in (old, index):
+            if row is not None:
+                self.repaint_row(row)
+
+    def set_dragging(self, indices: Iterable[int]):
+        """設定正在拖動的列，只重新上色狀態有變化的列"""
+        dragging = set(indices)
+        changed = dragging ^ self.dragging
+        self.dragging = dragging
+        for index in changed:
+            self.repaint_row(index)
+
+    # ---- 捲動 ----
+
+    @property
+    def scroll_offset(self) -> float:
+        return self._offset
+
+    @scroll_offset.setter
+    def scroll_offset(self, value: float):
+        self._offset = value
+        self._clamp_offset()
+
+    def _view_height(self) -> int:
+        return max(self.canvas.winfo_height(), 1)
+
+    def _max_offset(self) -> float:
+        return max(0.0, self.row_count * self.row_height - self._view_height())
+
+    def _clamp_offset(self):
+        self._offset = min(max(self._offset, 0.0), self._max_offset())
+
+    def scroll_to(self, index: int, refresh: bool = True) -> bool:
+        """
+        必要時捲動，讓指定的列完整出現在視窗內
+        返回是否真的捲動了（有捲動時會重繪整個可見範圍）
+        """
+        top = index * self.row_height
+        bottom = top + self.row_height
+        old_offset = self._offset
+        if top < self._offset:
+            self._offset = top
+        elif bottom > self._offset + self._view_height():
+            self._offset = bottom - self._view_height()
+        self._clamp_offset()
+        scrolled = self._offset != old_offset
+        if scrolled and refresh:
+            self.refresh()
+        return scrolled
+
+    def scroll_by(self, pixels: float):
+        self._offset += pixels
+        self.refresh()
+
+    def edge_scroll(self, y: int, max_rows: float = 2.0) -> bool:
+        """
+        拖動到清單上下緣外時捲動一步（距離邊緣越遠越快）
+        返回是否真的捲動了
+        """
+        height = self._view_height()
+        if y < 0:
+            distance = y
+        elif y > height:
+            distance = y - height
+        else:
+            return False
+
+        speed = min(abs(distance), 100) / 100 * max_rows * self.row_height + 4
+        old_offset = self._offset
+        self._offset += speed if distance > 0 else -speed
+        self._clamp_offset()
+        if self._offset == old_offset:
+            return False
+        self.refresh()
+        return True
+
+    def _on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self._offset = float(args[1]) * self.row_count * self.row_height
+        elif args[0] == "scroll":
+            step = self._view_height() - self.row_height if args[2] == "pages" else self.row_height
+            self._offset += int(args[1]) * max(step, self.row_height)
+        self.refresh()
+
+    def _on_mousewheel(self, event):
+        if not self._hovered:
+            return
+        if event.num == 4:
+            units = -3
+        elif event.num == 5:
+            units = 3
+        else:
+            units = -3 * event.delta / 120
+        self.scroll_by(units * self.row_height)
+
+    def _update_scrollbar(self):
+        total = self.row_count * self.row_height
+        if total <= 0:
+            self.scrollbar.set(0.0, 1.0)
+            return
+        self.scrollbar.set(self._offset / total, min(1.0, (self._offset + self._view_height()) / total))
+
+    # ---- 繪製 ----
+
+    def visible_range(self) -> Tuple[int, int]:
+        """目前可見的列範圍 [first, last)"""
+        first = int(self._offset // self.row_height)
+        last = min(self.row_count, int((self._offset + self._view_height()) // self.row_height) + 1)
+        return first, last
+
+    def index_at(self, y: int, clamp: bool = False) -> Optional[int]:
+        """
+        畫布 y 座標對應的列索引（由捲動位置與固定列高直接計算）
+        clamp 為 True 時超出範圍的座標對應到第一列或最後一列
+        """
+        index = int((self._offset + y) // self.row_height)
+        if 0 <= index < self.row_count:
+            return index
+        if clamp and self.row_count:
+            return 0 if index < 0 else self.row_count - 1
+        return None
+
+    def _ensure_slots(self, count: int):
+        while len(self._slots) < count:
+            rect = self.canvas.create_rectangle(0, 0, 0, 0, outline=self.colors["border"], width=1)
+            text = self.canvas.create_text(0, 0, anchor="w", font=self.font, fill=self.colors["text"])
+            hint = self.canvas.create_text(0, 0, anchor="e", font=self.hint_font)
+            subtitle = self.canvas.create_text(0, 0, anchor="w", font=self.subtitle_font,
+                                               fill=self.colors["subtitle"])
+            self._slots.append((rect, text, hint, subtitle))
+
+    def refresh(self):
+        """重繪所有可見的列"""
+        self._clamp_offset()
+        first = int(self._offset // self.row_height)
+        visible = self._view_height() // self.row_height + 2
+        self._ensure_slots(visible)
+        width = self.canvas.winfo_width()
+
+        for k, slot in enumerate(self._slots):
+            if k < visible:
+                self._draw_slot(slot, first + k, width)
+            else:
+                self._hide_slot(slot)
+
+        self._update_scrollbar()
+
+    def _slot_for(self, index: int) -> Optional[Tuple[int, int, int, int]]:
+        """目前顯示指定列的圖元（不可見時返回 None）"""
+        k = index - int(self._offset // self.row_height)
+        visible = self._view_height() // self.row_height + 2
+        if 0 <= k < min(visible, len(self._slots)):
+            return self._slots[k]
+        return None
+
+    def refresh_rows(self, indices: Iterable[int]):
+        """只重繪指定的列（例如交換位置或編輯了單一事件）"""
+        width = self.canvas.winfo_width()
+        for index in indices:
+            slot = self._slot_for(index)
+            if slot is not None:
+                self._draw_slot(slot, index, width)
+        self._update_scrollbar()
+
+    def refresh_range(self, start: int, end: Optional[int] = None):
+        """
+        重繪 [start, end) 範圍內可見的列，end 為 None 表示到清單尾端
+        插入/刪除後呼叫，只更新受影響的列與其編號
+        """
+        old_offset = self._offset
+        self._clamp_offset()
+        if self._offset != old_offset:
+            # 列數減少導致捲動位置改變，整個可見範圍都需重繪
+            self.refresh()
+            return
+        first = int(self._offset // self.row_height)
+        visible = self._view_height() // self.row_height + 2
+        self._ensure_slots(visible)
+        width = self.canvas.winfo_width()
+
+        last = first + visible if end is None else min(first + visible, end)
+        for index in range(max(start, first), last):
+            self._draw_slot(self._slots[index - first], index, width)
+        self._update_scrollbar()
+
+    def patch(self, start: int, end: Optional[int] = None, selection: Optional[Iterable[int]] = None):
+        """
+        增量更新
+        重繪 [start, end) 內可見的列；範圍外只重新上色選取狀態有變化的列
+        """
+        changed: Set[int] = set()
+        if selection is not None:
+            selection = set(selection)
+            changed = selection ^ self.selection
+            self.selection = selection
+        self.refresh_range(start, end)
+        for index in changed:
+            if index < start or (end is not None and index >= end):
+                self.repaint_row(index)
+
+    def repaint_row(self, index: int):
+        """只更新指定列的底色（選取/拖放狀態變化）"""
+        slot = self._slot_for(index)
+        if slot is not None and 0 <= index < self.row_count:
+            self.canvas.itemconfigure(slot[0], fill=self._row_color(index))
+
+    def _hide_slot(self, slot: Tuple[int, int, int, int]):
+        for item in slot:
+            self.canvas.itemconfigure(item, state="hidden")
+
+    def _draw_slot(self, slot: Tuple[int, int, int, int], index: int, width: int):
+        if not 0 <= index < self.row_count:
+            self._hide_slot(slot)
+            return
+
+        rect, text, hint, subtitle = slot
+        content = self.render_row(index)
+        y = index * self.row_height - self._offset
+        middle = y + self.row_height / 2
+        pad = self.row_gap / 2
+
+        self.canvas.coords(rect, 1, y + 1 + pad, width - 2, y + self.row_height - 1 - pad)
+        self.canvas.itemconfigure(rect, fill=self._row_color(index), state="normal")
+        if content.subtitle:
+            line = (self.row_height - self.row_gap) / 4
+            self.canvas.coords(text, 12, middle - line)
+            self.canvas.coords(subtitle, 12, middle + line)
+            self.canvas.itemconfigure(subtitle, text=content.subtitle, state="normal")
+        else:
+            self.canvas.coords(text, 10, middle)
+            self.canvas.itemconfigure(subtitle, state="hidden")
+        self.canvas.itemconfigure(text, text=content.text, state="normal")
+        self.canvas.coords(hint, width - 10, middle)
+        self.canvas.itemconfigure(hint, text=content.hint, fill=content.hint_color, state="normal")
+
+    def _row_color(self, index: int) -> str:
+        if index in self.dragging:
+            return self.colors["dragging"]
+        if index == self.drop_target:
+            return self.colors["drop_target"]
+        if index == self.playing:
+            return self.colors["playing"]
+        if index in self.selection:
+            return self.colors["selected"]
+        return self.colors["row"]
+
+    # ---- 滑鼠 ----
+
+    def _on_press(self, event):
+        index = self.index_at(event.y)
+        if index is not None and self.on_press:
+            self.on_press(index, event)
+
+    def _on_motion(self, event):
+        if self.on_motion:
+            self.on_motion(event)
+
+    def _on_release(self, event):
+        if self.on_release:
+            self.on_release(event)
+
+    def _on_double_click(self, event):
+        index = self.index_at(event.y)
+        if index is not None and self.on_double_click:
+            self.on_double_click(index)
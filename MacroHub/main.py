@@ -1,14 +1,48 @@
 """
 MacroHub - 通用巨集管理器
 主程式入口點
+
+    python main.py               開啟主視窗
+    python main.py --headless    無介面常駐模式（只有熱鍵與播放）
+    python main.py --control 127.0.0.1:8765
+                                 另外開啟本機控制介面（見 core/control_server.py）
 """
 import os
 import sys
+import time
+
+_START = time.perf_counter()  # 啟動計時起點（在載入任何 GUI 模組之前）
 
 # 確保可以找到模組
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from gui.main_window import main
+import argparse
+
+from core.startup import StartupTimer
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="MacroHub - 通用巨集管理器")
+    parser.add_argument("--headless", action="store_true", help="不開啟視窗，只執行全域熱鍵與播放")
+    parser.add_argument("--storage", choices=["json", "sqlite"], help="儲存後端（預設讀取 MACROHUB_STORAGE）")
+    parser.add_argument("--macros", metavar="DIR", help="巨集儲存位置（常駐模式）")
+    parser.add_argument("--no-watch", action="store_true", help="常駐模式不監看巨集目錄")
+    parser.add_argument("--control", metavar="ADDRESS",
+                        help="開啟本機控制介面，例如 127.0.0.1:8765 或 unix:/tmp/macrohub.sock")
+    return parser.parse_args(argv)
+
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    startup = StartupTimer(_START)
+    if args.headless:
+        # 常駐模式完全不載入 customtkinter/tkinter
+        from core.daemon import run_daemon
+        startup.mark("載入模組")
+        run_daemon(args.macros, args.storage, watch=not args.no_watch, control=args.control, startup=startup)
+    else:
+        if args.storage:
+            os.environ["MACROHUB_STORAGE"] = args.storage
+        from gui.main_window import main
+        startup.mark("載入模組")
+        main(startup, control=args.control)
@@ -0,0 +1,81 @@
+"""
+巨集包匯出/匯入測試
+
+    python -m pytest tests
+"""
+import os
+import sys
+import shutil
+import zipfile
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.recorder import Macro, MacroEvent, EventType
+from core.manager import MacroManager
+from core.sqlite_manager import SQLiteMacroManager
+
+
+class CountingSQLiteManager(SQLiteMacroManager):
+    """記錄批次寫入與逐一儲存次數"""
+
+    def __init__(self, *args, **kwargs):
+        self.batches = []
+        self.saves = 0
+        super().__init__(*args, **kwargs)
+
+    def import_macros(self, macros):
+        self.batches.append(len(macros))
+        return super().import_macros(macros)
+
+    def save_macro(self, macro, old_name=None):
+        self.saves += 1
+        return super().save_macro(macro, old_name)
+
+
+class BundleTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.source = MacroManager(os.path.join(self.dir, "json"))
+        for i in range(5):
+            self.source.save_macro(Macro(f"m{i}", [MacroEvent(EventType.KEY_PRESS, 0, key="a", delay=0.1)] * (i + 1)))
+        self.bundle = os.path.join(self.dir, "macros.mhz")
+
+    def tearDown(self):
+        self.source.close()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_selected_export_and_batched_sqlite_import(self):
+        self.assertEqual(self.source.export_bundle(["m1", "m3"], self.bundle), 2)
+        target = CountingSQLiteManager(os.path.join(self.dir, "macros.db"))
+        try:
+            imported = target.import_bundle(self.bundle)
+            self.assertEqual([m.name for m in imported], ["m1", "m3"])
+            self.assertEqual(target.batches, [2])
+            self.assertEqual(target.saves, 0)
+            self.assertEqual(target.get_info("m3").event_count, 4)
+
+            # 再匯入一次：名稱與 id 都不能與既有巨集衝突
+            again = target.import_bundle(self.bundle)
+            self.assertEqual([m.name for m in again], ["m1 (1)", "m3 (1)"])
+            self.assertNotEqual(again[0].id, imported[0].id)
+        finally:
+            target.close()
+
+    def test_invalid_file_raises(self):
+        path = os.path.join(self.dir, "not-a-bundle.mhz")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("not a zip")
+        with self.assertRaises(zipfile.BadZipFile):
+            self.source.import_bundle(path)
+
+        with zipfile.ZipFile(path, "w") as zf:
+            zf.writestr("manifest.json", '{"format": "other"}')
+        with self.assertRaises(ValueError):
+            self.source.import_bundle(path)
+
+
+if __name__ == "__main__":
+    unittest.main()
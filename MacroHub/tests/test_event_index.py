@@ -0,0 +1,47 @@
+"""
+巨集內事件索引測試
+
+    python -m pytest tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.recorder import MacroRecorder, MacroEvent, EventType
+from core.event_index import EventIndex, parse_event_query
+
+
+class FakeButton:
+    """與 pynput 的 Button.left 有相同字串表示的按鈕"""
+
+    def __str__(self):
+        return "Button.left"
+
+
+class EventIndexTest(unittest.TestCase):
+
+    def _recorded_click(self):
+        recorder = MacroRecorder()
+        recorder.is_recording = True
+        recorder._start_time = None
+        recorder._on_mouse_click(0, 0, FakeButton(), True)
+        recorder._on_mouse_click(0, 0, FakeButton(), False)
+        return recorder.events
+
+    def test_button_query_finds_recorded_click(self):
+        events = [MacroEvent(EventType.KEY_PRESS, 0, key="a")] + self._recorded_click()
+        index = EventIndex(events)
+        term, nth = parse_event_query("button:left")
+        self.assertEqual(index.find_next(term), 1)
+        self.assertEqual(index.count(term), 1)
+        self.assertEqual(index.count(parse_event_query("button:Button.left")[0]), 1)
+
+    def test_key_query_without_prefix(self):
+        index = EventIndex([MacroEvent(EventType.KEY_PRESS, 0, key="Key.space")])
+        self.assertEqual(index.find_next(parse_event_query("space")[0]), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
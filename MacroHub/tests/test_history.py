@@ -0,0 +1,53 @@
+"""
+編輯歷史測試
+
+    python -m pytest tests
+"""
+import os
+import sys
+import unittest
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.recorder import Macro, MacroEvent, EventType
+from core.history import EditHistory, EditOp, RemoveEvents, InsertEvents, MoveEvents, ReplaceRange
+
+
+def key_events(keys: str) -> List[MacroEvent]:
+    return [MacroEvent(EventType.KEY_PRESS, 0, key=k) for k in keys]
+
+
+class EditOpTest(unittest.TestCase):
+
+    def test_incomplete_op_fails_on_creation(self):
+        class ApplyOnly(EditOp):
+            def apply(self, macro: Macro) -> List[int]:
+                return []
+
+        with self.assertRaises(TypeError):
+            ApplyOnly()
+
+    def test_undo_redo_restores_events(self):
+        macro = Macro("m", key_events("abcdef"))
+        original = list(macro.events)
+        history = EditHistory()
+        ops = [RemoveEvents([1, 3]), InsertEvents(2, key_events("xy")), MoveEvents([0], 3),
+               ReplaceRange(1, 3, key_events("z"))]
+        states = [list(macro.events)]
+        for op in ops:
+            history.apply(macro, op)
+            states.append(list(macro.events))
+
+        for state in reversed(states[:-1]):
+            history.undo(macro)
+            self.assertEqual(macro.events, state)
+        self.assertEqual(macro.events, original)
+
+        for state in states[1:]:
+            history.redo(macro)
+            self.assertEqual(macro.events, state)
+
+
+if __name__ == "__main__":
+    unittest.main()
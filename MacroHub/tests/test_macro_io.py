@@ -0,0 +1,55 @@
+"""
+巨集 JSON 串流解析測試
+
+    python -m pytest tests
+"""
+import io
+import os
+import sys
+import json
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.recorder import Macro, MacroEvent, EventType
+from core.macro_io import MacroStreamReader
+
+
+def read_all(text: str, chunk_size: int):
+    events = []
+    header = MacroStreamReader(io.StringIO(text), chunk_size).read(events.extend, batch_size=3)
+    return header, events
+
+
+class MacroStreamReaderTest(unittest.TestCase):
+
+    def test_number_split_at_chunk_boundary(self):
+        text = '{"name":"a","loop_delay":12.5,"events":[]}'
+        for chunk_size in range(1, len(text) + 2):
+            with self.subTest(chunk_size=chunk_size):
+                header, events = read_all(text, chunk_size)
+                self.assertEqual(header, {"name": "a", "loop_delay": 12.5})
+                self.assertEqual(events, [])
+
+    def test_exponent_and_negative_numbers(self):
+        text = '{"a": -1.25e-3, "b": 1E+10, "c": 7, "events": [], "d": 0.5}'
+        for chunk_size in range(1, len(text) + 2):
+            with self.subTest(chunk_size=chunk_size):
+                header, _ = read_all(text, chunk_size)
+                self.assertEqual(header, {"a": -1.25e-3, "b": 1e10, "c": 7, "d": 0.5})
+
+    def test_round_trip_any_chunk_size(self):
+        events = [MacroEvent(EventType.KEY_PRESS, 0.125 * i, key="a", delay=0.0625 * i) for i in range(10)]
+        macro = Macro("巨集", events, loop_count=3, loop_delay=1.5)
+        text = json.dumps(macro.to_dict(), ensure_ascii=False, indent=2)
+        expected = json.loads(text)
+        expected_events = expected.pop("events")
+        for chunk_size in (1, 2, 3, 4, 7, 14, 28, 64, 1 << 16):
+            with self.subTest(chunk_size=chunk_size):
+                header, read = read_all(text, chunk_size)
+                self.assertEqual(header, expected)
+                self.assertEqual([e.to_dict() for e in read], expected_events)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+"""
+巨集最佳化測試：最佳化前後送出的輸入時間表必須完全相同
+
+延遲都使用 2 的負次方，累加順序不同時結果仍然精確相等
+
+    python -m pytest tests
+"""
+import os
+import sys
+import random
+import unittest
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.recorder import MacroEvent, EventType
+from core.optimizer import MIN_DELAY, input_schedule, optimize_events
+
+
+SUB_MS = 2 ** -11  # 約 0.49 ms，短於 MIN_DELAY
+
+
+def delay(seconds: float) -> MacroEvent:
+    return MacroEvent(EventType.DELAY, 0, delay=seconds)
+
+
+def press(key: str, wait: float = 0.0) -> MacroEvent:
+    return MacroEvent(EventType.KEY_PRESS, 0, key=key, delay=wait)
+
+
+def release(key: str, wait: float = 0.0) -> MacroEvent:
+    return MacroEvent(EventType.KEY_RELEASE, 0, key=key, delay=wait)
+
+
+def scroll(dx: int, dy: int, wait: float = 0.0) -> MacroEvent:
+    return MacroEvent(EventType.MOUSE_SCROLL, 0, scroll_dx=dx, scroll_dy=dy, delay=wait)
+
+
+class OptimizerScheduleTest(unittest.TestCase):
+
+    def assert_lossless(self, events: List[MacroEvent]) -> List[MacroEvent]:
+        optimized, report = optimize_events(events)
+        self.assertEqual(input_schedule(events), input_schedule(optimized))
+        self.assertEqual(report.events_after, len(optimized))
+        return optimized
+
+    def test_merged_delays(self):
+        events = [delay(0.25), delay(0.125), press("a"), delay(0.5), delay(0.5), release("a")]
+        optimized = self.assert_lossless(events)
+        self.assertEqual([e.event_type for e in optimized],
+                         [EventType.DELAY, EventType.KEY_PRESS, EventType.DELAY, EventType.KEY_RELEASE])
+
+    def test_sub_ms_delay_carried_into_next_event(self):
+        self.assertLess(SUB_MS, MIN_DELAY)
+        events = [press("a"), delay(SUB_MS), release("a"), delay(SUB_MS)]
+        optimized = self.assert_lossless(events)
+        self.assertEqual([e.event_type for e in optimized],
+                         [EventType.KEY_PRESS, EventType.KEY_RELEASE, EventType.DELAY])
+        self.assertEqual(optimized[1].delay, SUB_MS)
+
+    def test_scroll_bursts(self):
+        events = [scroll(0, 1), scroll(0, 1), scroll(0, 2), scroll(0, -1), scroll(0, -1),
+                  scroll(0, 1, wait=0.25), scroll(1, 0)]
+        optimized = self.assert_lossless(events)
+        self.assertEqual([(e.scroll_dx, e.scroll_dy) for e in optimized], [(0, 4), (0, -2), (1, 1)])
+
+    def test_tap_folding(self):
+        events = [press("a"), release("a"), press("b"), release("b", wait=0.125), press("c"), release("d")]
+        optimized = self.assert_lossless(events)
+        self.assertEqual([e.event_type for e in optimized],
+                         [EventType.KEY_TAP, EventType.KEY_PRESS, EventType.KEY_RELEASE,
+                          EventType.KEY_PRESS, EventType.KEY_RELEASE])
+
+    def test_noop_drops(self):
+        events = [press("a"),
+                  MacroEvent(EventType.MOUSE_MOVE, 0, x=1, y=2, delay=0.25),
+                  scroll(0, 0, wait=0.125),
+                  MacroEvent(EventType.TEXT, 0, text="", delay=0.0625),
+                  MacroEvent(EventType.CALL, 0, call_id="x", count=0, delay=0.03125),
+                  MacroEvent(EventType.CALL, 0, call_id="", count=1),
+                  release("a")]
+        optimized = self.assert_lossless(events)
+        self.assertEqual([e.event_type for e in optimized], [EventType.KEY_PRESS, EventType.KEY_RELEASE])
+        self.assertEqual(optimized[1].delay, 0.25 + 0.125 + 0.0625 + 0.03125)
+
+    def test_repeat_block_with_gap(self):
+        events = [press("shift"),
+                  MacroEvent(EventType.REPEAT, 0, count=3, gap=0.25, delay=0.125),
+                  delay(0.0625), delay(0.0625), press("a"), release("a"),
+                  MacroEvent(EventType.MOUSE_MOVE, 0, delay=SUB_MS), scroll(0, 1), scroll(0, 1),
+                  MacroEvent(EventType.REPEAT_END, 0, delay=0.5),
+                  release("shift")]
+        optimized = self.assert_lossless(events)
+        self.assertEqual([e.event_type for e in optimized],
+                         [EventType.KEY_PRESS, EventType.REPEAT, EventType.DELAY, EventType.KEY_TAP,
+                          EventType.MOUSE_SCROLL, EventType.REPEAT_END, EventType.KEY_RELEASE])
+        self.assertEqual(optimized[4].scroll_dy, 2)
+
+    def test_random_sequences(self):
+        rng = random.Random(1234)
+        delays = [0.0, 0.0, 0.0, SUB_MS, 2 ** -12, 0.125, 0.25]
+
+        def random_event() -> MacroEvent:
+            wait = rng.choice(delays)
+            kind = rng.randrange(8)
+            key = rng.choice("ab")
+            if kind == 0:
+                return delay(rng.choice(delays[3:]))
+            if kind == 1:
+                return press(key, wait)
+            if kind == 2:
+                return release(key, wait)
+            if kind == 3:
+                return scroll(rng.choice((-1, 0, 1)), rng.choice((-1, 0, 1)), wait)
+            if kind == 4:
+                return MacroEvent(EventType.MOUSE_MOVE, 0, delay=wait)
+            if kind == 5:
+                return MacroEvent(EventType.TEXT, 0, text=rng.choice(("", "hi")), char_delay=2 ** -6,
+                                  delay=wait)
+            if kind == 6:
+                return MacroEvent(EventType.MOUSE_CLICK, 0, button="Button.left", delay=wait)
+            return MacroEvent(EventType.REPEAT, 0, count=rng.randrange(4), gap=rng.choice(delays),
+                              delay=wait)
+
+        for trial in range(500):
+            events = []
+            for _ in range(rng.randrange(1, 30)):
+                event = random_event()
+                events.append(event)
+                if event.event_type == EventType.REPEAT:
+                    events.extend(random_event() for _ in range(rng.randrange(4)))
+                    events.append(MacroEvent(EventType.REPEAT_END, 0, delay=rng.choice(delays)))
+            with self.subTest(trial=trial):
+                self.assert_lossless(events)
+
+
+if __name__ == "__main__":
+    unittest.main()
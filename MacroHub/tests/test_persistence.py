@@ -0,0 +1,124 @@
+"""
+背景儲存佇列測試
+
+    python -m pytest tests
+"""
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.recorder import Macro, MacroEvent, EventType
+from core.manager import MacroManager
+from core.persistence import PersistenceWorker
+
+
+class PersistenceWorkerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.worker = PersistenceWorker(debounce=10.0)
+        self.log = []
+
+    def tearDown(self):
+        self.worker.stop()
+
+    def test_superseded_job_keeps_old_removal(self):
+        self.worker.submit("B", lambda: self.log.append("write B"), replaces="A",
+                           remove_old=lambda: self.log.append("remove A"))
+        self.worker.submit("C", lambda: self.log.append("write C"), replaces="B",
+                           remove_old=lambda: self.log.append("remove B"))
+        self.assertTrue(self.worker.flush(5))
+        self.assertEqual(self.log, ["write C", "remove A", "remove B"])
+
+    def test_rename_back_does_not_remove_written_key(self):
+        self.worker.submit("B", lambda: self.log.append("write B"), replaces="A",
+                           remove_old=lambda: self.log.append("remove A"))
+        self.worker.submit("A", lambda: self.log.append("write A"), replaces="B",
+                           remove_old=lambda: self.log.append("remove B"))
+        self.assertTrue(self.worker.flush(5))
+        self.assertEqual(self.log, ["write A", "remove B"])
+
+    def test_failed_write_keeps_old_data(self):
+        def fail():
+            raise OSError("disk full")
+        results = []
+        self.worker.submit("B", fail, callback=results.append, replaces="A",
+                           remove_old=lambda: self.log.append("remove A"))
+        self.assertTrue(self.worker.flush(5))
+        self.assertEqual(results, [False])
+        self.assertEqual(self.log, [])
+
+
+class MacroManagerRenameTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_two_renames_in_one_debounce_window(self):
+        manager = MacroManager(self.dir)
+        macro = Macro("A", [MacroEvent(EventType.KEY_PRESS, 0, key="a")])
+        self.assertTrue(manager.save_macro(macro))
+        manager._persistence.debounce = 10.0  # 兩次改名都落在同一個防抖時間內
+
+        macro.name = "B"
+        manager.save_macro_async(macro, old_name="A")
+        macro.name = "C"
+        manager.save_macro_async(macro, old_name="B")
+        self.assertTrue(manager.flush(5))
+        manager.close()
+
+        self.assertEqual(sorted(os.listdir(self.dir)), ["C.json"])
+        reloaded = MacroManager(self.dir)
+        try:
+            self.assertEqual(sorted(m.name for m in reloaded.get_all_macros()), ["C"])
+        finally:
+            reloaded.close()
+
+    def test_old_name_reused_before_rename_is_written(self):
+        manager = MacroManager(self.dir)
+        macro = Macro("A", [MacroEvent(EventType.KEY_PRESS, 0, key="a")])
+        self.assertTrue(manager.save_macro(macro))
+        manager._persistence.debounce = 10.0
+
+        macro.name = "B"
+        manager.save_macro_async(macro, old_name="A")
+        manager.save_macro_async(Macro("A", [MacroEvent(EventType.KEY_PRESS, 0, key="b")]))
+        self.assertTrue(manager.flush(5))
+        manager.close()
+
+        self.assertEqual(sorted(os.listdir(self.dir)), ["A.json", "B.json"])
+
+    def test_async_rename_onto_existing_name_is_refused(self):
+        manager = MacroManager(self.dir)
+        macro_a = Macro("A", [MacroEvent(EventType.KEY_PRESS, 0, key="a")])
+        macro_b = Macro("B", [MacroEvent(EventType.KEY_PRESS, 0, key="b")])
+        self.assertTrue(manager.save_macro(macro_a))
+        self.assertTrue(manager.save_macro(macro_b))
+
+        macro_a.name = "B"
+        results = []
+        self.assertFalse(manager.save_macro_async(macro_a, old_name="A", callback=results.append))
+        self.assertFalse(manager.save_macro(macro_a, old_name="A"))
+        self.assertTrue(manager.flush(5))
+        manager.close()
+
+        self.assertEqual(results, [])
+        self.assertIs(manager.get_macro("A"), macro_a)
+        self.assertIs(manager.get_macro("B"), macro_b)
+        self.assertEqual(sorted(os.listdir(self.dir)), ["A.json", "B.json"])
+        reloaded = MacroManager(self.dir)
+        try:
+            self.assertEqual(reloaded.get_macro("B").events[0].key, "b")
+            self.assertEqual(reloaded.get_macro("A").events[0].key, "a")
+        finally:
+            reloaded.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
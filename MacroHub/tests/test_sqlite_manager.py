@@ -0,0 +1,109 @@
+"""
+SQLite 巨集管理器測試
+
+    python -m pytest tests
+"""
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.recorder import Macro, MacroEvent, EventType
+from core.sqlite_manager import SQLiteMacroManager
+
+
+def key_macro(name: str, key: str) -> Macro:
+    return Macro(name, [MacroEvent(EventType.KEY_PRESS, 0, key=key, delay=0.5)])
+
+
+class SQLiteMacroManagerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.dir, "macros.db")
+        self.manager = SQLiteMacroManager(self.db_path)
+
+    def tearDown(self):
+        self.manager.close()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def reopen(self) -> SQLiteMacroManager:
+        self.manager.close()
+        self.manager = SQLiteMacroManager(self.db_path)
+        return self.manager
+
+    def test_rename_onto_existing_name_is_rejected(self):
+        self.assertTrue(self.manager.save_macro(key_macro("A", "a")))
+        self.assertTrue(self.manager.save_macro(key_macro("B", "b")))
+
+        renamed = key_macro("A", "a")
+        renamed.id = self.manager.get_macro("A").id
+        renamed.name = "B"
+        self.assertFalse(self.manager.save_macro(renamed, old_name="A"))
+
+        manager = self.reopen()
+        self.assertEqual(sorted(i.name for i in manager.get_all_infos()), ["A", "B"])
+        self.assertEqual(manager.get_macro("B").events[0].key, "b")
+
+    def test_async_rename_onto_existing_name_keeps_library(self):
+        macro_a = key_macro("A", "a")
+        self.assertTrue(self.manager.save_macro(macro_a))
+        self.assertTrue(self.manager.save_macro(key_macro("B", "b")))
+
+        macro_a.name = "B"
+        results = []
+        self.assertFalse(self.manager.save_macro_async(macro_a, old_name="A", callback=results.append))
+        self.assertTrue(self.manager.flush(5))
+        self.assertEqual(results, [])
+        self.assertEqual(sorted(i.name for i in self.manager.get_all_infos()), ["A", "B"])
+        self.assertEqual(self.manager.get_macro("B").events[0].key, "b")
+
+        manager = self.reopen()
+        self.assertEqual(sorted(i.name for i in manager.get_all_infos()), ["A", "B"])
+        self.assertEqual(manager.get_macro("B").events[0].key, "b")
+
+    def test_two_renames_in_one_debounce_window(self):
+        macro = key_macro("A", "a")
+        self.assertTrue(self.manager.save_macro(macro))
+        self.manager._persistence.debounce = 10.0
+
+        macro.name = "B"
+        self.manager.save_macro_async(macro, old_name="A")
+        macro.name = "C"
+        self.manager.save_macro_async(macro, old_name="B")
+        self.assertTrue(self.manager.flush(5))
+
+        manager = self.reopen()
+        self.assertEqual([i.name for i in manager.get_all_infos()], ["C"])
+
+    def test_rename_back_in_one_debounce_window(self):
+        macro = key_macro("A", "a")
+        self.assertTrue(self.manager.save_macro(macro))
+        self.manager._persistence.debounce = 10.0
+
+        macro.name = "B"
+        self.manager.save_macro_async(macro, old_name="A")
+        macro.name = "A"
+        self.manager.save_macro_async(macro, old_name="B")
+        self.assertTrue(self.manager.flush(5))
+
+        manager = self.reopen()
+        self.assertEqual([i.name for i in manager.get_all_infos()], ["A"])
+
+    def test_streaming_import_totals(self):
+        path = os.path.join(self.dir, "imported.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(Macro("匯入", [MacroEvent(EventType.KEY_PRESS, 0, key="a", delay=0.25)] * 4).to_dict(), f)
+        macro = self.manager.import_macro(path)
+        self.assertIsNotNone(macro)
+        info = self.manager.get_info("匯入")
+        self.assertEqual(info.event_count, 4)
+        self.assertAlmostEqual(info.total_duration, 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()